@@ -1,5 +1,6 @@
 
-from .detector_manager import run_all, run_all_for_api, build_normal_output
+from .detector_manager import run_all, run_all_batch, run_all_for_api, build_normal_output, detector_stats
+from .registry import DetectorRegistry, get_registry
 
-__all__ = ['run_all', 'run_all_for_api', 'build_normal_output']
+__all__ = ['run_all', 'run_all_batch', 'run_all_for_api', 'build_normal_output', 'detector_stats', 'DetectorRegistry', 'get_registry']
 
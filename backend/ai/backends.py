@@ -0,0 +1,76 @@
+"""
+Inference Backends
+
+Maps a detector's configured backend (torch, onnx, openvino) and precision
+(fp32, int8) to the model artifact inside its folder. Artifacts other than
+model.pt are built by export_models.py; if one is missing or older than
+model.pt the detector falls back to the PyTorch weights.
+"""
+from pathlib import Path
+from typing import Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx", "openvino")
+PRECISIONS = ("fp32", "int8")
+
+DEFAULT_BACKEND = "torch"
+DEFAULT_PRECISION = "fp32"
+
+
+def artifact_path(base_dir: Path, backend: str, precision: str) -> Path:
+    """Where the artifact for a backend/precision lives in a detector folder."""
+    base_dir = Path(base_dir)
+    if backend == "onnx":
+        return base_dir / ("model.int8.onnx" if precision == "int8" else "model.onnx")
+    if backend == "openvino":
+        # Directory names match what ultralytics' exporter produces for model.pt
+        return base_dir / ("model_int8_openvino_model" if precision == "int8" else "model_openvino_model")
+    return base_dir / "model.pt"
+
+
+def _mtime(path: Path) -> float:
+    if path.is_dir():
+        return max((p.stat().st_mtime for p in path.iterdir()), default=path.stat().st_mtime)
+    return path.stat().st_mtime
+
+
+def resolve_model_artifact(base_dir: Path, backend: str = DEFAULT_BACKEND,
+                           precision: str = DEFAULT_PRECISION) -> Tuple[Path, str, str]:
+    """
+    Pick the model artifact a detector should load.
+
+    Returns:
+        (path, backend, precision) actually used, after any fallback to torch/fp32
+    """
+    base_dir = Path(base_dir)
+    torch_path = base_dir / "model.pt"
+    backend = (backend or DEFAULT_BACKEND).lower()
+    precision = (precision or DEFAULT_PRECISION).lower()
+
+    if backend not in BACKENDS:
+        logger.warning(f"Unknown backend '{backend}' in {base_dir}, using torch")
+        return torch_path, "torch", "fp32"
+    if precision not in PRECISIONS:
+        logger.warning(f"Unknown precision '{precision}' in {base_dir}, using fp32")
+        precision = "fp32"
+    if backend == "torch":
+        if precision != "fp32":
+            logger.warning(
+                f"{precision} needs an exported backend (onnx or openvino) in {base_dir}; "
+                f"torch runs fp32"
+            )
+        return torch_path, "torch", "fp32"
+
+    artifact = artifact_path(base_dir, backend, precision)
+    if not artifact.exists():
+        logger.warning(
+            f"{backend}/{precision} artifact not found at {artifact}, falling back to torch "
+            f"(build it with backend/ai/export_models.py)"
+        )
+        return torch_path, "torch", "fp32"
+    if torch_path.exists() and _mtime(artifact) < torch_path.stat().st_mtime:
+        logger.warning(f"{artifact} is older than {torch_path}, falling back to torch until it is re-exported")
+        return torch_path, "torch", "fp32"
+    return artifact, backend, precision
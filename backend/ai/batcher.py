@@ -0,0 +1,215 @@
+"""
+Micro-batching Inference Service
+
+Request threads submit single images; a background thread merges them into
+batches of up to ``max_batch_size`` images, waiting at most ``max_wait_ms``
+for a batch to fill, and runs them through run_all_batch so each detector
+group does one batched forward pass. Every caller gets its own Future.
+"""
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import queue
+import threading
+import time
+
+from backend.config import (
+    AI_DETECTOR_TIMEOUT,
+    AI_INFERENCE_PROCESSES,
+    AI_MICROBATCH_ENABLED,
+    AI_MICROBATCH_MAX_SIZE,
+    AI_MICROBATCH_MAX_WAIT_MS,
+)
+from .detector_manager import is_video, run_all, run_all_batch
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the batch-size histogram buckets
+_BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+class MicroBatcher:
+    """
+    Queue of pending detection requests drained by a single worker thread.
+
+    Requests are (image, confidence_threshold); requests with different
+    thresholds in the same window are run as separate batches.
+    """
+
+    def __init__(self, max_batch_size: int = AI_MICROBATCH_MAX_SIZE, max_wait_ms: float = AI_MICROBATCH_MAX_WAIT_MS):
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self.max_wait_ms = max(float(max_wait_ms), 0.0)
+        self._queue: "queue.Queue[Tuple[Any, float, Future, float]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._stats: Dict[str, Any] = {
+            "requests": 0,
+            "batches": 0,
+            "errors": 0,
+            "total_queue_wait_ms": 0.0,
+            "total_batch_ms": 0.0,
+            "batch_size_histogram": {str(b): 0 for b in _BATCH_SIZE_BUCKETS + ("+Inf",)},
+        }
+
+    def submit(self, image: Any, confidence_threshold: float = 0.9) -> Future:
+        """Queue one image and return a Future resolving to run_all's (detections, best)."""
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((image, float(confidence_threshold), future, time.perf_counter()))
+        return future
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the worker thread after it finishes the batch in progress."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """Batching configuration and counters, including the batch-size histogram."""
+        with self._stats_lock:
+            s = dict(self._stats)
+            s["batch_size_histogram"] = dict(self._stats["batch_size_histogram"])
+        batches = s["batches"] or 1
+        requests = s["requests"] or 1
+        s.update({
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "queue_depth": self._queue.qsize(),
+            "avg_batch_size": round(s["requests"] / batches, 3) if s["batches"] else 0.0,
+            "avg_queue_wait_ms": round(s["total_queue_wait_ms"] / requests, 3),
+            "avg_batch_ms": round(s["total_batch_ms"] / batches, 3),
+        })
+        return s
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped.clear()
+                self._thread = threading.Thread(target=self._loop, name="micro-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self) -> List[Tuple[Any, float, Future, float]]:
+        try:
+            first = self._queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self) -> None:
+        while not self._stopped.is_set():
+            batch = self._collect()
+            if batch:
+                self._run(batch)
+
+    def _run(self, batch: List[Tuple[Any, float, Future, float]]) -> None:
+        by_threshold: Dict[float, List[Tuple[Any, Future, float]]] = {}
+        for image, threshold, future, queued_at in batch:
+            if future.set_running_or_notify_cancel():
+                by_threshold.setdefault(threshold, []).append((image, future, queued_at))
+
+        for threshold, items in by_threshold.items():
+            started = time.perf_counter()
+            wait_ms = sum((started - queued_at) * 1000 for _, _, queued_at in items)
+            failed = False
+            try:
+                outputs = run_all_batch(
+                    [image for image, _, _ in items],
+                    confidence_threshold=threshold,
+                    batch_size=self.max_batch_size
+                )
+                for (_, future, _), out in zip(items, outputs):
+                    future.set_result(out)
+            except Exception as e:
+                logger.error(f"Micro-batch of {len(items)} failed: {e}", exc_info=True)
+                failed = True
+                for _, future, _ in items:
+                    if not future.done():
+                        future.set_exception(e)
+            self._record(len(items), wait_ms, (time.perf_counter() - started) * 1000, failed)
+
+    def _record(self, size: int, wait_ms: float, batch_ms: float, failed: bool) -> None:
+        bucket = next((str(b) for b in _BATCH_SIZE_BUCKETS if size <= b), "+Inf")
+        with self._stats_lock:
+            self._stats["requests"] += size
+            self._stats["batches"] += 1
+            self._stats["errors"] += int(failed)
+            self._stats["total_queue_wait_ms"] += wait_ms
+            self._stats["total_batch_ms"] += batch_ms
+            self._stats["batch_size_histogram"][bucket] += 1
+
+
+_batcher: Optional[MicroBatcher] = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher() -> MicroBatcher:
+    """Return the process-wide MicroBatcher, creating it on first use."""
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = MicroBatcher()
+    return _batcher
+
+
+def batcher_stats() -> Dict[str, Any]:
+    """Micro-batching metrics, or just the configuration if batching is disabled."""
+    if not AI_MICROBATCH_ENABLED:
+        return {
+            "enabled": False,
+            "max_batch_size": AI_MICROBATCH_MAX_SIZE,
+            "max_wait_ms": AI_MICROBATCH_MAX_WAIT_MS,
+        }
+    stats = get_batcher().stats()
+    stats["enabled"] = True
+    return stats
+
+
+def run_all_queued(
+    image_path: str,
+    confidence_threshold: float = 0.9,
+    complaint_type: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Drop-in replacement for run_all that goes to the inference worker
+    processes when AI_INFERENCE_PROCESSES is set, through the micro-batcher
+    when AI_MICROBATCH_ENABLED is set, and calls run_all directly otherwise.
+
+    Batched requests always run every detector, so complaint_type (which
+    only orders the run_all cascade) is ignored on that path.
+    """
+    if AI_INFERENCE_PROCESSES > 0:
+        # Imported here: the pool module is only needed when it is enabled
+        from .inference_pool import run_all_pooled
+        return run_all_pooled(image_path, confidence_threshold, complaint_type=complaint_type)
+    if not AI_MICROBATCH_ENABLED or is_video(image_path):
+        # Videos already batch their own frames; don't hold a micro-batch up behind one
+        return run_all(image_path, confidence_threshold, complaint_type=complaint_type)
+
+    future = get_batcher().submit(image_path, confidence_threshold)
+    timeout = AI_DETECTOR_TIMEOUT if AI_DETECTOR_TIMEOUT > 0 else None
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        future.cancel()
+        return [], {
+            "detected_type": None,
+            "confidence": 0.0,
+            "detector_name": None,
+            "error": f"detection timed out after {timeout:g}s"
+        }
@@ -0,0 +1,216 @@
+"""
+Inference benchmark suite.
+
+Times the detection pipeline on generated images of several resolutions:
+
+    run_all      detector_manager.run_all (decode, plan, inference, summary)
+    detect       each detector's detect() on the decoded image
+    postprocess  each detector's postprocess() on that detector's raw output
+    road         ai_engine.verify_infrastructure_damage
+
+For each case it reports the cold latency (first call), warm latency
+percentiles, warm throughput and the process's peak RSS so far. With
+--backend stub (the default) detectors run on the deterministic stub in
+stub_backend.py, so only pipeline overhead is measured and no weights are
+needed; --backend real uses the model files in the detector folders.
+--stub-shared-weights gives the stub detectors identical weights, so run_all
+takes the fused shared-forward-pass path.
+
+Run from the project root:
+    python -m backend.ai.bench --sizes 640x480 1920x1080 4000x3000
+    python -m backend.ai.bench --backend real --only run_all --json bench.json
+    python -m backend.ai.bench --only run_all --stub-latency-ms 20 --stub-shared-weights
+"""
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+COMPONENTS = ("run_all", "detect", "postprocess", "road")
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of this process, 0 if it cannot be determined."""
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    # KiB on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def make_image(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """
+    A synthetic street scene: grey noisy asphalt on the lower part, a flat
+    sky band, a few cracks and coloured blobs. Deterministic for a seed.
+    """
+    rng = np.random.default_rng(seed)
+    img = np.empty((height, width, 3), dtype=np.uint8)
+    horizon = height // 3
+    img[:horizon] = (200, 170, 120)
+    asphalt = rng.normal(110, 18, size=(height - horizon, width)).clip(0, 255).astype(np.uint8)
+    img[horizon:] = asphalt[..., None]
+    thickness = max(width // 800, 1)
+    for _ in range(12):
+        pts = rng.integers((0, horizon), (width, height), size=(4, 2)).astype(np.int32)
+        cv2.polylines(img, [pts], False, (40, 40, 40), thickness)
+    for _ in range(6):
+        center = tuple(int(v) for v in rng.integers((0, horizon), (width, height)))
+        radius = int(rng.integers(max(width // 80, 2), max(width // 20, 3)))
+        color = tuple(int(v) for v in rng.integers(0, 255, size=3))
+        cv2.circle(img, center, radius, color, -1)
+    return img
+
+
+def parse_size(text: str) -> Tuple[int, int]:
+    width, _, height = text.lower().partition("x")
+    return int(width), int(height)
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(np.ceil(q / 100.0 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def measure(fn: Callable[[], Any], iterations: int, warmup: int) -> Dict[str, Any]:
+    """Time fn: the first call is the cold one, then `warmup` untimed calls, then `iterations` timed ones."""
+    started = time.perf_counter()
+    fn()
+    cold = time.perf_counter() - started
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    total_start = time.perf_counter()
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    total = time.perf_counter() - total_start
+
+    samples.sort()
+    return {
+        "cold_ms": round(cold * 1000, 3),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p90_ms": round(percentile(samples, 90) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 3) if samples else 0.0,
+        "throughput_per_s": round(len(samples) / total, 2) if total > 0 else 0.0,
+        "iterations": len(samples),
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def _build_registry(backend: str, work_dir: Path, boxes: int, latency_ms: float,
+                    shared_weights: bool = False) -> Any:
+    from backend.ai import registry as registry_module
+
+    if backend == "stub":
+        from backend.ai.stub_backend import install_stub_backend
+        detectors_dir = install_stub_backend(work_dir, boxes=boxes, latency_ms=latency_ms,
+                                             shared_weights=shared_weights)
+    else:
+        detectors_dir = registry_module.DETECTORS_DIR
+    # run_all looks detectors up through get_registry(); point it at ours
+    registry_module._registry = registry_module.DetectorRegistry(detectors_dir)
+    return registry_module._registry
+
+
+def run_cases(args: argparse.Namespace, work_dir: Path) -> List[Dict[str, Any]]:
+    from backend import ai_engine
+    from backend.ai import detector_manager
+
+    started = time.perf_counter()
+    registry = _build_registry(args.backend, work_dir, args.stub_boxes, args.stub_latency_ms,
+                               args.stub_shared_weights)
+    detectors = registry.get_all()
+    load_ms = round((time.perf_counter() - started) * 1000, 3)
+    print(f"loaded {len(detectors)} detectors ({args.backend}) in {load_ms:.1f} ms")
+
+    rows: List[Dict[str, Any]] = [{"component": "load", "size": None, "detector": None, "cold_ms": load_ms,
+                                   "peak_rss_bytes": peak_rss_bytes()}]
+
+    def record(component: str, size: str, detector: Optional[str], fn: Callable[[], Any]) -> None:
+        row = {"component": component, "size": size, "detector": detector}
+        row.update(measure(fn, args.iterations, args.warmup))
+        rows.append(row)
+        print(_format_row(row))
+
+    print(_format_header())
+    for seed, (width, height) in enumerate(args.sizes):
+        size = f"{width}x{height}"
+        image = make_image(width, height, seed=seed)
+        path = str(work_dir / f"bench_{size}.jpg")
+        cv2.imwrite(path, image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+
+        if "run_all" in args.only:
+            record("run_all", size, None, lambda: detector_manager.run_all(
+                path, use_cache=False, cascaded=args.cascade
+            ))
+        for detector, class_name in detectors:
+            if "detect" in args.only:
+                record("detect", size, class_name, lambda: detector.detect(image))
+            if "postprocess" in args.only and hasattr(detector, "predict"):
+                raw = detector.predict(image)
+                record("postprocess", size, class_name, lambda: detector.postprocess(raw))
+        if "road" in args.only:
+            record("road", size, None, lambda: ai_engine.verify_infrastructure_damage(path))
+    return rows
+
+
+def _format_header() -> str:
+    return (f"{'component':<12}{'size':>11} {'detector':<22}{'cold ms':>10}{'p50 ms':>10}{'p90 ms':>10}"
+            f"{'p99 ms':>10}{'img/s':>9}{'peak MiB':>10}")
+
+
+def _format_row(row: Dict[str, Any]) -> str:
+    return (f"{row['component']:<12}{row['size']:>11} {(row['detector'] or '-'):<22}{row['cold_ms']:>10.2f}"
+            f"{row['p50_ms']:>10.2f}{row['p90_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['throughput_per_s']:>9.1f}"
+            f"{row['peak_rss_bytes'] / 2 ** 20:>10.1f}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark detector inference and the detection pipeline")
+    parser.add_argument("--backend", choices=("stub", "real"), default="stub",
+                        help="stub: deterministic fake model, no weights needed; real: detector model files")
+    parser.add_argument("--sizes", nargs="*", type=parse_size, default=[(640, 480), (1920, 1080), (4000, 3000)],
+                        help="image resolutions as WIDTHxHEIGHT")
+    parser.add_argument("--only", nargs="*", choices=COMPONENTS, default=list(COMPONENTS))
+    parser.add_argument("--iterations", type=int, default=20, help="timed warm calls per case")
+    parser.add_argument("--warmup", type=int, default=2, help="untimed calls after the cold one")
+    parser.add_argument("--cascade", action="store_true", help="let run_all skip detectors via the cascade")
+    parser.add_argument("--stub-boxes", type=int, default=20, help="boxes the stub model returns per image")
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0, help="simulated model time per image")
+    parser.add_argument("--stub-shared-weights", action="store_true",
+                        help="give every stub detector identical weights, so fused mode shares one forward pass")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="civiceye-bench-") as tmp:
+        rows = run_cases(args, Path(tmp))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "backend": args.backend,
+                "stub_shared_weights": args.stub_shared_weights,
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "cases": rows,
+            }, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Detection Cascade
+
+Cheap classical checks that run before any YOLO detector, and the stage
+order detectors run in afterwards. The pre-filter can reject an image
+outright (e.g. a blank or lens-capped photo) or route it, promoting or
+demoting detectors based on the road analysis in ai_engine. run_all then
+runs the stages in order (claimed complaint type first) and stops at the
+first stage where a detector reaches the confidence threshold.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import threading
+
+from backend.config import AI_CASCADE_MIN_STDDEV, AI_INFERENCE_MAX_SIDE
+from .registry import _class_name_for
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("claimed", "routed", "remaining", "demoted")
+
+
+def prefilter(source: Any) -> Dict[str, Any]:
+    """
+    Run the classical checks on a detector source (decoded array or path).
+
+    Returns:
+        {"reject": reason or None, "promote": [detector names], "demote": [detector names], ...}
+        Checks that cannot run (undecodable image, OpenCV error) neither
+        reject nor route, so the detectors decide as before.
+    """
+    route: Dict[str, Any] = {"reject": None, "promote": [], "demote": []}
+    try:
+        import cv2
+        from backend.ai_engine import analyze_road_surface
+        from .ingest import resize_for_inference
+
+        img = source
+        if isinstance(source, str):
+            img = cv2.imread(source, cv2.IMREAD_COLOR)
+            if img is None:
+                return route
+            img, _ = resize_for_inference(img, AI_INFERENCE_MAX_SIDE)
+
+        _, stddev = cv2.meanStdDev(img)
+        route["stddev"] = round(float(stddev.max()), 2)
+        if route["stddev"] < AI_CASCADE_MIN_STDDEV:
+            route["reject"] = "blank image"
+            return route
+
+        road = analyze_road_surface(img)
+        route["road_pixel_ratio"] = round(road["road_pixel_ratio"], 4)
+        route["edge_density"] = round(road["edge_density"], 4)
+        if road["damaged"]:
+            route["promote"].append("pothole")
+        elif not road["is_road"]:
+            route["demote"].append("pothole")
+    except Exception as e:
+        logger.warning(f"Pre-filter failed, running detectors unfiltered: {e}")
+    return route
+
+
+def order_stages(
+    detectors: List[Tuple[Any, str]],
+    complaint_type: Optional[str],
+    route: Dict[str, Any]
+) -> List[Tuple[str, List[int]]]:
+    """
+    Group detector indices into cascade stages, in run order.
+
+    The detector matching the claimed complaint type always runs first, even
+    if the pre-filter demoted it. Empty stages are omitted.
+    """
+    claimed = _class_name_for(complaint_type) if complaint_type else None
+    promoted = {_class_name_for(name) for name in route.get("promote", ())}
+    demoted = {_class_name_for(name) for name in route.get("demote", ())}
+
+    stages: Dict[str, List[int]] = {name: [] for name in STAGES}
+    for i, (_, class_name) in enumerate(detectors):
+        if class_name == claimed:
+            stages["claimed"].append(i)
+        elif class_name in promoted:
+            stages["routed"].append(i)
+        elif class_name in demoted:
+            stages["demoted"].append(i)
+        else:
+            stages["remaining"].append(i)
+    return [(name, stages[name]) for name in STAGES if stages[name]]
+
+
+class CascadeStats:
+    """Counts where cascaded runs stop and how much detector work they skip."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._runs = 0
+        self._exits: Dict[str, int] = {}
+        self._detectors_run = 0
+        self._detectors_skipped = 0
+
+    def record(self, exit_stage: str, ran: int, skipped: int) -> None:
+        with self._lock:
+            self._runs += 1
+            self._exits[exit_stage] = self._exits.get(exit_stage, 0) + 1
+            self._detectors_run += ran
+            self._detectors_skipped += skipped
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            runs = self._runs
+            exits = dict(self._exits)
+            ran, skipped = self._detectors_run, self._detectors_skipped
+        return {
+            "runs": runs,
+            "exits": exits,
+            "exit_rate": {stage: round(n / runs, 4) for stage, n in exits.items()} if runs else {},
+            "detectors_run": ran,
+            "detectors_skipped": skipped,
+        }
+
+
+_stats = CascadeStats()
+
+
+def record_exit(exit_stage: str, ran: int, skipped: int) -> None:
+    _stats.record(exit_stage, ran, skipped)
+
+
+def cascade_stats() -> Dict[str, Any]:
+    """How often each cascade stage short-circuited the run."""
+    return _stats.stats()
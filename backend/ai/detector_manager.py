@@ -1,70 +1,477 @@
 from pathlib import Path
-from typing import List, Dict, Any, Tuple
-import importlib.util
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from functools import partial
+from typing import List, Dict, Any, Callable, Iterator, Optional, Set, Tuple, Union
 import logging
 import os
+import threading
+import time
+import weakref
+
+from backend.config import (
+    AI_BATCH_SIZE,
+    AI_CASCADE,
+    AI_DECODE_ONCE,
+    AI_DETECTOR_TIMEOUT,
+    AI_FUSED_INFERENCE,
+    AI_MAX_WORKERS,
+    AI_PARALLEL_INFERENCE,
+    AI_RESULT_CACHE,
+    VIDEO_EXTENSIONS,
+)
+from backend.metrics import DETECTOR_ERRORS, DETECTOR_SECONDS, timed
+from .registry import detector_fingerprint, get_registry
+from . import cascade
+from .ingest import PreparedImage, load_image, restore_boxes
+from .result_cache import detector_cache_key, get_result_cache, image_fingerprint
 
 logger = logging.getLogger(__name__)
 
-# Absolute path to ai/
-AI_DIR = Path(__file__).resolve().parent
-DETECTORS_DIR = AI_DIR / "detectors"
-
 
 def _load_detector(detector_name: str):
-    det_dir = DETECTORS_DIR / detector_name
-    module_path = det_dir / "detector.py"
-
-    if not module_path.exists():
-        logger.error(f"detector.py missing for {detector_name}")
-        return None, None
-
-    spec = importlib.util.spec_from_file_location(
-        f"{detector_name}_detector",
-        str(module_path)
-    )
-    module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(module)
-
-    class_name = "".join(p.capitalize() for p in detector_name.split("_")) + "Detector"
-    cls = getattr(module, class_name, None)
+    return get_registry().get(detector_name)
+
+
+def is_video(path: Any) -> bool:
+    """True for paths whose extension is a video container (see VIDEO_EXTENSIONS)."""
+    if not isinstance(path, (str, Path)):
+        return False
+    return Path(path).suffix.lower().lstrip(".") in VIDEO_EXTENSIONS
+
+
+class DetectorTimeout(Exception):
+    """Raised in place of a detector result when it misses its deadline."""
+
+    def __init__(self, timeout: float):
+        super().__init__(f"detector timed out after {timeout:g}s")
+        self.timeout = timeout
+
+
+class _Abandoned(Exception):
+    """Raised in a unit whose request stopped waiting for it; nobody reads its result."""
+
+
+class _UnitRun:
+    """When a unit submitted to the thread pool got to run its model, and whether its request gave up on it."""
+
+    __slots__ = ("started", "started_at", "abandoned")
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.started_at = 0.0
+        self.abandoned = threading.Event()
+
+    def start(self) -> None:
+        if not self.started.is_set():
+            self.started_at = time.monotonic()
+            self.started.set()
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_inference_locks: "weakref.WeakKeyDictionary[Any, threading.Lock]" = weakref.WeakKeyDictionary()
+_inference_locks_guard = threading.Lock()
+# The _UnitRun of the unit an executor thread is running
+_unit_context = threading.local()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=AI_MAX_WORKERS,
+                    thread_name_prefix="detector"
+                )
+    return _executor
+
+
+def _inference_lock(detector: Any) -> threading.Lock:
+    """
+    Per-instance lock around model calls. Registry instances are shared across
+    request threads and YOLO predictors are not safe for concurrent use.
+    """
+    with _inference_locks_guard:
+        lock = _inference_locks.get(detector)
+        if lock is None:
+            lock = threading.Lock()
+            _inference_locks[detector] = lock
+        return lock
+
+
+@contextmanager
+def _model_call(detector: Any) -> Iterator[None]:
+    """
+    Hold the detector's inference lock for one model call. A unit its
+    request already gave up on (see _execute) is dropped rather than queued
+    behind the lock, so one slow image does not time out later requests too.
+    """
+    run = getattr(_unit_context, "run", None)
+    if run is not None and run.abandoned.is_set():
+        raise _Abandoned()
+    with _inference_lock(detector):
+        if run is not None:
+            if run.abandoned.is_set():
+                raise _Abandoned()
+            run.start()
+        yield
+
+
+def _detect_one(detector: Any, source: Any) -> List[Any]:
+    try:
+        if getattr(detector, "model", None) is not None and hasattr(detector, "predict") \
+                and hasattr(detector, "postprocess"):
+            # Only the forward pass needs the lock
+            with _model_call(detector):
+                raw = detector.predict(source)
+            return [detector.postprocess(raw) or {}]
+        with _model_call(detector):
+            return [detector.detect(source) or {}]
+    except Exception as e:
+        return [e]
+
+
+def _detect_group(members: List[Any], source: Any, leader_name: str) -> List[Any]:
+    """
+    Run one YOLO forward pass for a group of detectors sharing weights and
+    thresholds, and fan the raw results out to each member's postprocess().
+    """
+    leader = members[0]
+    try:
+        with _model_call(leader):
+            raw = leader.predict(source)
+    except _Abandoned:
+        raise
+    except Exception as e:
+        logger.error(f"Shared inference failed for {leader_name}: {e}", exc_info=True)
+        return [d.error_result(str(e)) for d in members]
+
+    results: List[Any] = []
+    for d in members:
+        try:
+            results.append(d.postprocess(raw) or {})
+        except Exception as e:
+            results.append(e)
+    return results
 
-    if cls is None:
-        logger.error(f"Class {class_name} not found in {module_path}")
-        return None, None
 
-    return cls(det_dir), class_name
+def _detect_batch_one(detector: Any, sources: List[Any], batch_size: int) -> List[Any]:
+    try:
+        with _model_call(detector):
+            if hasattr(detector, "detect_batch"):
+                return detector.detect_batch(sources, batch_size=batch_size)
+            return [detector.detect(src) or {} for src in sources]
+    except Exception as e:
+        return [e] * len(sources)
 
 
-def run_all(
-    image_path: str,
-    confidence_threshold: float = 0.9
-) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+def _detect_batch_group(members: List[Any], sources: List[Any], batch_size: int) -> List[List[Any]]:
+    """Batched counterpart of _detect_group: one result list per member."""
+    leader = members[0]
+    batch_size = max(int(batch_size), 1)
+    results: List[List[Any]] = [[] for _ in members]
 
-    if not os.path.exists(image_path):
-        return [], {
-            "detected_type": None,
-            "confidence": 0.0,
-            "detector_name": None,
-            "error": "image not found"
-        }
+    for start in range(0, len(sources), batch_size):
+        chunk = sources[start:start + batch_size]
+        try:
+            with _model_call(leader):
+                raw = leader.predict(chunk, batch=len(chunk))
+            if len(raw) != len(chunk):
+                raise RuntimeError(f"expected {len(chunk)} results, got {len(raw)}")
+        except Exception as e:
+            logger.warning(f"Batched shared inference failed ({e}), retrying per image")
+            for src in chunk:
+                for m, res in enumerate(_detect_group(members, src, type(leader).__name__)):
+                    results[m].append(res)
+            continue
+        for m, d in enumerate(members):
+            for r in raw:
+                try:
+                    results[m].append(d.postprocess([r]) or {})
+                except Exception as e:
+                    results[m].append(e)
+
+    return results
+
+
+def _plan(
+    detectors: List[Tuple[Any, str]],
+    source: Any,
+    fused: bool
+) -> List[Tuple[List[int], Callable[[], List[Any]]]]:
+    """
+    Split the detectors into independent units of work.
+
+    Each unit is (detector indices, callable returning one result per index).
+    In fused mode detectors with equal fingerprints share a unit; detectors
+    without a fingerprint (e.g. model missing) or without a predict/postprocess
+    split always run their own detect().
+    """
+    units: List[Tuple[List[int], Callable[[], List[Any]]]] = []
+    groups: Dict[Any, List[int]] = {}
+
+    for i, (detector, class_name) in enumerate(detectors):
+        key = None
+        if fused and hasattr(detector, "predict") and hasattr(detector, "postprocess"):
+            try:
+                key = detector_fingerprint(detector)
+            except Exception as e:
+                logger.warning(f"Could not fingerprint {class_name}: {e}")
+        if key is None:
+            units.append(([i], partial(_detect_one, detector, source)))
+        else:
+            groups.setdefault(key, []).append(i)
+
+    for members in groups.values():
+        units.append((
+            members,
+            partial(_detect_group, [detectors[i][0] for i in members], source, detectors[members[0]][1])
+        ))
+
+    return units
+
+
+def _timed_unit(fn: Callable[[], List[Any]], run: Optional[_UnitRun] = None) -> Tuple[List[Any], float]:
+    _unit_context.run = run
+    started = time.perf_counter()
+    try:
+        out = fn()
+    finally:
+        _unit_context.run = None
+        if run is not None:
+            # Units that never reached a model call count as started once they are done
+            run.start()
+    return out, time.perf_counter() - started
+
+
+def _execute(
+    units: List[Tuple[List[int], Callable[[], List[Any]]]],
+    count: int,
+    parallel: bool,
+    timeout: float,
+    latencies: Optional[Dict[int, float]] = None
+) -> List[Any]:
+    """
+    Run planned units and return one result (dict or exception) per detector.
+
+    In parallel mode units run on the shared bounded thread pool. Each may
+    wait up to `timeout` seconds for a free thread and its detector's
+    inference lock, then has `timeout` seconds from when its model call
+    starts. A unit that misses either deadline yields DetectorTimeout for its
+    detectors and is abandoned: one still queued is cancelled or skips its
+    model call once it gets the lock (see _model_call); one already in a
+    model call finishes it in the background. Later requests for that
+    detector wait for that single call at most, within their own queueing
+    allowance.
+
+    If `latencies` is given, it receives each detector's run time in seconds
+    by position; detectors in a shared unit all get the unit's time.
+    """
+    results: List[Any] = [None] * count
+    if latencies is None:
+        latencies = {}
+
+    if not parallel or (len(units) <= 1 and timeout <= 0):
+        for members, fn in units:
+            out, elapsed = _timed_unit(fn)
+            for i, res in zip(members, out):
+                results[i] = res
+                latencies[i] = elapsed
+        return results
+
+    executor = _get_executor()
+    submitted = []
+    for members, fn in units:
+        run = _UnitRun()
+        submitted.append((members, executor.submit(_timed_unit, fn, run), run, time.monotonic()))
+
+    for members, future, run, submitted_at in submitted:
+        elapsed = None
+        try:
+            remaining = None
+            if timeout > 0:
+                queued = max(submitted_at + timeout - time.monotonic(), 0.0)
+                if not run.started.wait(queued):
+                    future.cancel()
+                    raise FutureTimeout()
+                remaining = max(run.started_at + timeout - time.monotonic(), 0.0)
+            out, elapsed = future.result(timeout=remaining)
+        except FutureTimeout:
+            run.abandoned.set()
+            out, elapsed = [DetectorTimeout(timeout)] * len(members), timeout
+        except Exception as e:
+            out = [e] * len(members)
+        for i, res in zip(members, out):
+            results[i] = res
+            if elapsed is not None:
+                latencies[i] = elapsed
 
-    detector_names = ["garbage", "pothole", "water_leakage"]
-    detectors = []
+    return results
 
-    for name in detector_names:
-        inst, cls_name = _load_detector(name)
-        if inst:
-            detectors.append((inst, cls_name))
 
-    if not detectors:
-        return [], {
-            "detected_type": None,
-            "confidence": 0.0,
-            "detector_name": None,
-            "error": "no detectors loaded"
-        }
+def _as_source(image: Any) -> Tuple[Any, float, Any]:
+    """
+    Decode an image once for all detectors.
 
+    Returns:
+        (what to pass to the detectors, inference scale, identity for the result cache)
+    """
+    if isinstance(image, PreparedImage):
+        return image.array, image.scale, image
+    if AI_DECODE_ONCE and isinstance(image, (str, Path)):
+        try:
+            prepared = load_image(str(image))
+        except Exception as e:
+            logger.warning(f"Could not decode {image} once, detectors will read it: {e}")
+            prepared = None
+        if prepared is not None:
+            return prepared.array, prepared.scale, prepared
+    return (str(image) if isinstance(image, Path) else image), 1.0, image
+
+
+def _cache_lookup(detectors: List[Tuple[Any, str]], image: Any) -> Tuple[Dict[int, Any], Dict[int, str]]:
+    """
+    Look up each detector's cached raw result for an image.
+
+    Returns:
+        (hits by detector index, cache keys by detector index for cacheable detectors)
+    """
+    hits: Dict[int, Any] = {}
+    keys: Dict[int, str] = {}
+    try:
+        image_hash = image_fingerprint(image)
+        if image_hash is None:
+            return hits, keys
+        cache = get_result_cache()
+        for i, (detector, class_name) in enumerate(detectors):
+            detector_key = detector_cache_key(detector, class_name)
+            if detector_key is None:
+                continue
+            keys[i] = cache.make_key(image_hash, detector_key)
+            res = cache.get(keys[i])
+            if res is not None:
+                hits[i] = res
+    except Exception as e:
+        logger.warning(f"Result cache lookup failed: {e}")
+    return hits, keys
+
+
+def _cache_store(keys: Dict[int, str], raw_results: List[Any], skip: Dict[int, Any]) -> None:
+    """Store successful raw results; errors, timeouts and existing hits are skipped."""
+    try:
+        cache = get_result_cache()
+        for i, key in keys.items():
+            res = raw_results[i]
+            if i in skip or not isinstance(res, dict) or res.get("error"):
+                continue
+            cache.put(key, res)
+    except Exception as e:
+        logger.warning(f"Result cache store failed: {e}")
+
+
+def _confidence(res: Any) -> float:
+    """A raw detector result's confidence, whatever key the detector used."""
+    if not isinstance(res, dict):
+        return 0.0
+    return float(res.get("confidence") or res.get("conf") or res.get("score") or 0.0)
+
+
+def _with_shared_passes(detectors: List[Tuple[Any, str]], indices: List[int], pending: List[int]) -> List[int]:
+    """
+    Add the pending detectors that share a forward pass with `indices`.
+    Their postprocess() is nearly free once the shared pass has run.
+    """
+    keys = {}
+    for i in pending:
+        try:
+            keys[i] = detector_fingerprint(detectors[i][0])
+        except Exception:
+            keys[i] = None
+    wanted = {keys.get(i) for i in indices} - {None}
+    return sorted(set(indices) | {i for i in pending if keys[i] is not None and keys[i] in wanted})
+
+
+def _run_cascade(
+    detectors: List[Tuple[Any, str]],
+    source: Any,
+    scale: float,
+    hits: Dict[int, Any],
+    confidence_threshold: float,
+    complaint_type: Optional[str],
+    fused: bool,
+    parallel: bool,
+    timeout: float,
+    latencies: Optional[Dict[int, float]] = None
+) -> Tuple[List[Any], Set[int], str]:
+    """
+    Run detectors stage by stage, stopping once one reaches confidence_threshold.
+
+    Cached results count first, then the pre-filter may reject the image,
+    then the cascade.order_stages() stages run in order; detectors within a
+    stage run like a normal run_all.
+
+    Returns:
+        (one raw result per detector, indices that did not run, stage the run stopped at);
+        run times of the detectors that ran go into `latencies` by index
+    """
+    if latencies is None:
+        latencies = {}
+    raw_results: List[Any] = [hits.get(i) for i in range(len(detectors))]
+    pending = [i for i in range(len(detectors)) if i not in hits]
+
+    def finish(stage: str) -> Tuple[List[Any], Set[int], str]:
+        skipped = set(pending)
+        for i in skipped:
+            raw_results[i] = {"skipped": True, "reason": f"cascade stopped at {stage}"}
+        cascade.record_exit(stage, len(detectors) - len(hits) - len(skipped), len(skipped))
+        return raw_results, skipped, stage
+
+    if any(_confidence(res) >= confidence_threshold for res in hits.values()):
+        return finish("cache")
+    if not pending:
+        return finish("completed")
+
+    route = cascade.prefilter(source)
+    if route["reject"]:
+        logger.info(f"Pre-filter rejected image ({route['reject']}), skipping detectors")
+        return finish("prefilter")
+
+    for stage, indices in cascade.order_stages(detectors, complaint_type, route):
+        todo = [i for i in indices if i in pending]
+        if not todo:
+            continue
+        if fused:
+            todo = _with_shared_passes(detectors, todo, pending)
+        to_run = [detectors[i] for i in todo]
+        stage_latencies: Dict[int, float] = {}
+        results = _execute(_plan(to_run, source, fused), len(to_run), parallel, timeout, stage_latencies)
+        for pos, (i, res) in enumerate(zip(todo, results)):
+            raw_results[i] = restore_boxes(res, scale)
+            if pos in stage_latencies:
+                latencies[i] = stage_latencies[pos]
+        pending = [i for i in pending if i not in todo]
+        if any(_confidence(raw_results[i]) >= confidence_threshold for i in todo):
+            return finish(stage)
+
+    return finish("completed")
+
+
+def _summarize(
+    detectors: List[Tuple[Any, str]],
+    raw_results: List[Any],
+    confidence_threshold: float,
+    latencies: Optional[Dict[int, float]] = None
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Turn one raw result (dict or exception) per detector into run_all's output.
+
+    `latencies` holds the run time in seconds of each detector (by index)
+    that actually ran; it is reported as latency_ms and recorded in the
+    detector latency histogram. Cache hits and skipped detectors have none.
+    """
+    latencies = latencies or {}
     detections: List[Dict[str, Any]] = []
     best = {
         "detected_type": None,
@@ -72,9 +479,15 @@ def run_all(
         "detector_name": None
     }
 
-    for detector, class_name in detectors:
+    for i, ((detector, class_name), res) in enumerate(zip(detectors, raw_results)):
+        # The instance that produced the result, even if a reload replaced it since
+        version = getattr(detector, "model_version", None)
+        latency_ms = round(latencies[i] * 1000, 2) if i in latencies else None
+        if i in latencies:
+            DETECTOR_SECONDS.observe(latencies[i], detector=class_name)
         try:
-            res = detector.detect(image_path) or {}
+            if isinstance(res, Exception):
+                raise res
 
             det_type = (
                 res.get("type")
@@ -82,13 +495,9 @@ def run_all(
                 or res.get("class")
             )
 
-            conf = (
-                res.get("confidence")
-                or res.get("conf")
-                or res.get("score")
-                or 0.0
-            )
-            conf = float(conf)
+            if res.get("error"):
+                DETECTOR_ERRORS.inc(detector=class_name, kind="error")
+            conf = _confidence(res)
 
             detected_type = det_type if conf >= confidence_threshold else None
 
@@ -96,6 +505,8 @@ def run_all(
                 "detected_type": detected_type,
                 "confidence": conf,
                 "detector_name": class_name,
+                "model_version": version,
+                "latency_ms": latency_ms,
                 "raw": res
             }
             detections.append(record)
@@ -104,14 +515,30 @@ def run_all(
                 best = {
                     "detected_type": detected_type,
                     "confidence": conf,
-                    "detector_name": class_name
+                    "detector_name": class_name,
+                    "model_version": version
                 }
 
+        except DetectorTimeout as e:
+            logger.warning(f"{class_name} missed its {e.timeout:g}s deadline")
+            DETECTOR_ERRORS.inc(detector=class_name, kind="timeout")
+            detections.append({
+                "detected_type": None,
+                "confidence": 0.0,
+                "detector_name": class_name,
+                "model_version": version,
+                "latency_ms": latency_ms,
+                "raw": {"error": str(e), "timed_out": True, "timeout_s": e.timeout}
+            })
+
         except Exception as e:
+            DETECTOR_ERRORS.inc(detector=class_name, kind="error")
             detections.append({
                 "detected_type": None,
                 "confidence": 0.0,
                 "detector_name": class_name,
+                "model_version": version,
+                "latency_ms": latency_ms,
                 "raw": {"error": str(e)}
             })
 
@@ -125,6 +552,246 @@ def run_all(
     return detections, best
 
 
+def run_all(
+    image_path: Union[str, PreparedImage],
+    confidence_threshold: float = 0.9,
+    fused: Optional[bool] = None,
+    parallel: Optional[bool] = None,
+    timeout: Optional[float] = None,
+    use_cache: Optional[bool] = None,
+    complaint_type: Optional[str] = None,
+    cascaded: Optional[bool] = None
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Run every registered detector on an image.
+
+    Args:
+        image_path: Absolute path to the image, or an already decoded PreparedImage.
+            Paths are decoded once and the pixels shared by every detector.
+        confidence_threshold: Minimum confidence for a detector's type to count
+        fused: Share one forward pass between detectors with identical weights
+            and thresholds. Defaults to AI_FUSED_INFERENCE.
+        parallel: Run detectors (or fused groups) concurrently on a bounded
+            thread pool. Defaults to AI_PARALLEL_INFERENCE.
+        timeout: Per-detector deadline in seconds for parallel mode, counted
+            from when the detector starts running; a detector that misses it
+            is reported with raw.error and raw.timed_out. Defaults to
+            AI_DETECTOR_TIMEOUT, 0 disables it.
+        use_cache: Reuse raw results cached for the same image bytes, weights
+            and config. Defaults to AI_RESULT_CACHE.
+        complaint_type: Type the user claimed; its detector runs first when cascaded
+        cascaded: Pre-filter the image and run detectors in stages, stopping
+            at the first stage with a detector at confidence_threshold.
+            Detectors that did not run are reported with raw.skipped and the
+            final decision carries the stage in "cascade". Defaults to AI_CASCADE.
+
+    Each detection carries latency_ms (None for cache hits and skipped
+    detectors) and the final decision carries timings_ms, the time spent in
+    each stage (decode, cache_lookup, inference, cache_store, summarize)
+    and in total.
+    """
+    if fused is None:
+        fused = AI_FUSED_INFERENCE
+    if parallel is None:
+        parallel = AI_PARALLEL_INFERENCE
+    if timeout is None:
+        timeout = AI_DETECTOR_TIMEOUT
+    if use_cache is None:
+        use_cache = AI_RESULT_CACHE
+    if cascaded is None:
+        cascaded = AI_CASCADE
+
+    if is_video(image_path):
+        # Imported here: video builds on this module
+        from .video import run_all_video
+        if not os.path.exists(image_path):
+            return [], {
+                "detected_type": None,
+                "confidence": 0.0,
+                "detector_name": None,
+                "error": "image not found"
+            }
+        timings: Dict[str, float] = {}
+        with timed("video", timings):
+            detections, best = run_all_video(str(image_path), confidence_threshold)
+        best["timings_ms"] = {**timings, "total": timings["video"]}
+        return detections, best
+
+    if not isinstance(image_path, PreparedImage) and not os.path.exists(image_path):
+        return [], {
+            "detected_type": None,
+            "confidence": 0.0,
+            "detector_name": None,
+            "error": "image not found"
+        }
+
+    detectors = get_registry().get_all()
+
+    if not detectors:
+        return [], {
+            "detected_type": None,
+            "confidence": 0.0,
+            "detector_name": None,
+            "error": "no detectors loaded"
+        }
+
+    started = time.perf_counter()
+    timings: Dict[str, float] = {}
+    latencies: Dict[int, float] = {}
+
+    with timed("decode", timings):
+        source, scale, identity = _as_source(image_path)
+    with timed("cache_lookup", timings):
+        hits, cache_keys = _cache_lookup(detectors, identity) if use_cache else ({}, {})
+
+    stage = None
+    if cascaded:
+        with timed("inference", timings):
+            raw_results, skipped, stage = _run_cascade(
+                detectors, source, scale, hits, confidence_threshold, complaint_type, fused, parallel, timeout,
+                latencies
+            )
+        if cache_keys:
+            with timed("cache_store", timings):
+                _cache_store(cache_keys, raw_results, {**hits, **{i: None for i in skipped}})
+    else:
+        pending = [i for i in range(len(detectors)) if i not in hits]
+
+        raw_results: List[Any] = [hits.get(i) for i in range(len(detectors))]
+        if pending:
+            to_run = [detectors[i] for i in pending]
+            run_latencies: Dict[int, float] = {}
+            with timed("inference", timings):
+                units = _plan(to_run, source, fused)
+                results = _execute(units, len(to_run), parallel, timeout, run_latencies)
+                for pos, (i, res) in enumerate(zip(pending, results)):
+                    raw_results[i] = restore_boxes(res, scale)
+                    if pos in run_latencies:
+                        latencies[i] = run_latencies[pos]
+            if cache_keys:
+                with timed("cache_store", timings):
+                    _cache_store(cache_keys, raw_results, hits)
+
+    with timed("summarize", timings):
+        detections, best = _summarize(detectors, raw_results, confidence_threshold, latencies)
+    if stage is not None:
+        best["cascade"] = stage
+    timings["total"] = round((time.perf_counter() - started) * 1000, 3)
+    best["timings_ms"] = timings
+    return detections, best
+
+
+def run_all_batch(
+    images: List[Any],
+    confidence_threshold: float = 0.9,
+    batch_size: int = AI_BATCH_SIZE,
+    fused: Optional[bool] = None,
+    use_cache: Optional[bool] = None
+) -> List[Tuple[List[Dict[str, Any]], Dict[str, Any]]]:
+    """
+    Run every registered detector over many images with batched forward passes.
+
+    Args:
+        images: Image paths, PreparedImages or decoded BGR arrays
+        confidence_threshold: Same meaning as in run_all
+        batch_size: Maximum number of images per forward pass
+        fused: Share forward passes between detectors with identical weights
+            and thresholds. Defaults to AI_FUSED_INFERENCE.
+        use_cache: Reuse cached raw results; images whose every detector hits
+            the cache skip inference entirely. Defaults to AI_RESULT_CACHE.
+
+    Returns:
+        One (detections, best) pair per image, in order, like run_all's except
+        that best has no timings_ms and each latency_ms is the detector's
+        batch time split evenly over the images
+    """
+    if fused is None:
+        fused = AI_FUSED_INFERENCE
+    if use_cache is None:
+        use_cache = AI_RESULT_CACHE
+
+    images = list(images)
+    outputs: List[Optional[Tuple[List[Dict[str, Any]], Dict[str, Any]]]] = [None] * len(images)
+    valid: List[int] = []
+    for n, img in enumerate(images):
+        if is_video(img):
+            # Videos are sampled and batched on their own
+            outputs[n] = run_all(img, confidence_threshold)
+        elif isinstance(img, (str, Path)) and not os.path.exists(img):
+            outputs[n] = ([], {
+                "detected_type": None,
+                "confidence": 0.0,
+                "detector_name": None,
+                "error": "image not found"
+            })
+        else:
+            valid.append(n)
+
+    detectors = get_registry().get_all()
+
+    if not detectors:
+        for n in valid:
+            outputs[n] = ([], {
+                "detected_type": None,
+                "confidence": 0.0,
+                "detector_name": None,
+                "error": "no detectors loaded"
+            })
+        return outputs
+
+    prepared = {n: _as_source(images[n]) for n in valid}
+    cache_keys: Dict[int, Dict[int, str]] = {}
+    if use_cache:
+        misses = []
+        for n in valid:
+            hits, keys = _cache_lookup(detectors, prepared[n][2])
+            if keys and len(hits) == len(keys) == len(detectors):
+                outputs[n] = _summarize(detectors, [hits[i] for i in range(len(detectors))], confidence_threshold)
+            else:
+                cache_keys[n] = keys
+                misses.append(n)
+        valid = misses
+        if not valid:
+            return outputs
+
+    sources = [prepared[n][0] for n in valid]
+    # per_detector[i][k]: result of detector i on sources[k]
+    per_detector: List[List[Any]] = [[] for _ in detectors]
+    # Batch time per image of each detector; a batch's cost is shared evenly
+    latencies: Dict[int, float] = {}
+    groups: Dict[Any, List[int]] = {}
+
+    for i, (detector, class_name) in enumerate(detectors):
+        key = None
+        if fused and hasattr(detector, "predict") and hasattr(detector, "postprocess"):
+            try:
+                key = detector_fingerprint(detector)
+            except Exception as e:
+                logger.warning(f"Could not fingerprint {class_name}: {e}")
+        if key is None:
+            started = time.perf_counter()
+            per_detector[i] = _detect_batch_one(detector, sources, batch_size)
+            latencies[i] = (time.perf_counter() - started) / len(sources)
+        else:
+            groups.setdefault(key, []).append(i)
+
+    for members in groups.values():
+        started = time.perf_counter()
+        member_results = _detect_batch_group([detectors[i][0] for i in members], sources, batch_size)
+        elapsed = (time.perf_counter() - started) / len(sources)
+        for i, res in zip(members, member_results):
+            per_detector[i] = res
+            latencies[i] = elapsed
+
+    for k, n in enumerate(valid):
+        raw_results = [restore_boxes(res[k], prepared[n][1]) for res in per_detector]
+        if cache_keys.get(n):
+            _cache_store(cache_keys[n], raw_results, {})
+        outputs[n] = _summarize(detectors, raw_results, confidence_threshold, latencies)
+
+    return outputs
+
+
 def build_normal_output(detections: List[Dict[str, Any]]) -> Dict[str, Any]:
     result = {
         "garbage": False,
@@ -151,3 +818,24 @@ def run_all_for_api(image_path: str) -> Dict[str, Any]:
         "final": final,
         "result": build_normal_output(detections)
     }
+
+
+def detector_stats() -> Dict[str, Dict[str, Any]]:
+    """Load time and memory statistics for every detector loaded so far."""
+    return get_registry().stats()
+
+
+def cascade_stats() -> Dict[str, Any]:
+    """Where cascaded runs stopped and how many detector runs they skipped."""
+    stats = cascade.cascade_stats()
+    stats["enabled"] = AI_CASCADE
+    return stats
+
+
+def result_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters and size of the detection result cache."""
+    if not AI_RESULT_CACHE:
+        return {"enabled": False}
+    stats = get_result_cache().stats()
+    stats["enabled"] = True
+    return stats
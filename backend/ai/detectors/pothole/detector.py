@@ -5,10 +5,12 @@ Uses YOLO object detection to identify potholes in road images.
 """
 from pathlib import Path
 from typing import Dict, Any, List, Optional
-from ultralytics import YOLO
 import yaml
 import logging
 
+from backend.ai.backends import DEFAULT_BACKEND, DEFAULT_PRECISION, resolve_model_artifact
+from backend.ai.postprocess import flatten_results, select_best
+
 logger = logging.getLogger(__name__)
 
 
@@ -22,6 +24,7 @@ class PotholeDetector:
     
     DEFAULT_CONF_THRESHOLD = 0.05
     DEFAULT_IOU_THRESHOLD = 0.45
+    DEFAULT_BATCH_SIZE = 16
     
     def __init__(self, base_dir: Path):
         """
@@ -34,21 +37,28 @@ class PotholeDetector:
         self.model_path = self.base_dir / "model.pt"
         self.config_path = self.base_dir / "config.yaml"
         self.model = None
+        self.backend = DEFAULT_BACKEND
+        self.precision = DEFAULT_PRECISION
         self.conf_threshold = self.DEFAULT_CONF_THRESHOLD
         self.iou_threshold = self.DEFAULT_IOU_THRESHOLD
         
         # Load configuration
         self._load_config()
         
-        # Load model
-        if self.model_path.exists():
+        # Load model (an exported ONNX/OpenVINO artifact if configured and built)
+        self.weights_path, self.backend, self.precision = resolve_model_artifact(
+            self.base_dir, self.backend, self.precision
+        )
+        if self.weights_path.exists():
             try:
-                self.model = YOLO(str(self.model_path))
-                logger.info(f"PotholeDetector: Model loaded from {self.model_path}")
+                # Imported here: postprocess() alone (e.g. re-scoring) must not pull in ultralytics and torch
+                from ultralytics import YOLO
+                self.model = YOLO(str(self.weights_path), task="detect")
+                logger.info(f"PotholeDetector: Model loaded from {self.weights_path} ({self.backend}/{self.precision})")
             except Exception as e:
                 logger.error(f"PotholeDetector: Failed to load model: {e}")
         else:
-            logger.warning(f"PotholeDetector: Model file not found at {self.model_path}")
+            logger.warning(f"PotholeDetector: Model file not found at {self.weights_path}")
     
     def _load_config(self) -> None:
         """Load configuration from config.yaml if it exists."""
@@ -59,18 +69,91 @@ class PotholeDetector:
                     if config:
                         self.conf_threshold = config.get('conf_threshold', self.DEFAULT_CONF_THRESHOLD)
                         self.iou_threshold = config.get('iou_threshold', self.DEFAULT_IOU_THRESHOLD)
+                        self.backend = config.get('backend', DEFAULT_BACKEND)
+                        self.precision = config.get('precision', DEFAULT_PRECISION)
                         logger.info(f"PotholeDetector: Config loaded from {self.config_path}")
             except Exception as e:
                 logger.warning(f"PotholeDetector: Failed to load config: {e}, using defaults")
         else:
             logger.debug(f"PotholeDetector: Config file not found at {self.config_path}, using defaults")
     
+    def predict(self, source: Any, batch: int = 1) -> List[Any]:
+        """
+        Run the YOLO model on the given source with this detector's thresholds.
+        
+        Args:
+            source: Image path, array, or a list of them for batched inference
+            batch: Number of images per forward pass when source is a list
+            
+        Returns:
+            List of raw YOLO result objects, one per image
+        """
+        return self.model.predict(
+            source=source,
+            conf=self.conf_threshold,
+            iou=self.iou_threshold,
+            batch=batch,
+            verbose=False
+        )
+    
+    def error_result(self, error: str) -> Dict[str, Any]:
+        """Build the empty detection result returned when detection cannot run."""
+        return {
+            "type": "pothole",
+            "detected": False,
+            "confidence": 0.0,
+            "boxes": [],
+            "label": None,
+            "error": error
+        }
+    
+    def postprocess(self, results: List[Any]) -> Dict[str, Any]:
+        """
+        Score raw YOLO results for potholes.
+        
+        Results may come from this detector's own predict() or from a forward
+        pass shared with other detectors using the same weights and thresholds.
+        
+        Args:
+            results: Raw YOLO result objects for a single image
+            
+        Returns:
+            Detection result dictionary (see detect())
+        """
+        # Process detection results
+        # For base YOLO models, look for objects that might indicate road/pothole
+        road_indicators = ["road", "street", "pavement", "asphalt", "car", "truck", "bus", "motorcycle"]
+        # Potholes might appear as dark spots/holes - hard to detect with base YOLO
+        # We'll use any detection on road-like surfaces as potential pothole indicator
+        
+        # One host transfer per result; indicator labels matched per class, not per box
+        flat = flatten_results(results, road_indicators)
+        boxes = flat.boxes
+        
+        # Road-related objects score conf * 0.7 as base models don't detect potholes directly.
+        # Until one is seen, any detection above 0.4 scores conf * 0.4.
+        best_conf, best_i = select_best(flat.conf, flat.related, 0.7, fallback_min=0.4, fallback_factor=0.4)
+        best_label = flat.label(best_i) if best_i is not None else None
+        
+        detected = best_conf > 0.0
+        
+        return {
+            "type": "pothole",
+            "detected": detected,
+            "confidence": round(best_conf, 4),
+            "boxes": boxes,
+            "label": (best_label or None),
+            "raw_detections": len(boxes),  # Total number of detections
+            # Per-box scores and classes, stored so decisions can be re-scored without inference
+            **flat.raw_output()
+        }
+    
     def detect(self, image_path: str) -> Dict[str, Any]:
         """
         Detect potholes in the given image.
         
         Args:
-            image_path: Path to the image file to analyze
+            image_path: Path to the image file, or a decoded BGR array, to analyze
             
         Returns:
             Dictionary containing detection results:
@@ -80,75 +163,48 @@ class PotholeDetector:
                 "confidence": float (0.0-1.0),
                 "boxes": List[List[float]],  # Bounding boxes [x1, y1, x2, y2]
                 "label": Optional[str],
+                "box_scores": List[float],  # Per box, in the order of boxes
+                "box_classes": List[int],  # Per box, an index into class_labels
+                "class_labels": List[str],
                 "error": Optional[str]
             }
         """
         if self.model is None:
-            return {
-                "type": "pothole",
-                "detected": False,
-                "confidence": 0.0,
-                "boxes": [],
-                "label": None,
-                "error": "model missing"
-            }
+            return self.error_result("model missing")
         
         try:
             # Run YOLO prediction with configurable thresholds
-            results = self.model.predict(
-                source=image_path,
-                conf=self.conf_threshold,
-                iou=self.iou_threshold,
-                verbose=False
-            )
-            
-            boxes: List[List[float]] = []
-            best_conf = 0.0
-            best_label = None
-            
-            # Process detection results
-            # For base YOLO models, look for objects that might indicate road/pothole
-            road_indicators = ["road", "street", "pavement", "asphalt", "car", "truck", "bus", "motorcycle"]
-            # Potholes might appear as dark spots/holes - hard to detect with base YOLO
-            # We'll use any detection on road-like surfaces as potential pothole indicator
-            
-            for r in results:
-                for box in r.boxes:
-                    bbox = box.xyxy[0].cpu().numpy().tolist()
-                    conf = float(box.conf[0].cpu().numpy())
-                    cls_id = int(box.cls[0].cpu().numpy())
-                    label = r.names[cls_id].lower()
-                    boxes.append(bbox)
-                    
-                    # Check if detected object might be road-related
-                    is_road_related = any(indicator in label for indicator in road_indicators)
-                    
-                    # For pothole detection, any detection on road surface might indicate damage
-                    if is_road_related and conf > best_conf:
-                        best_conf = conf * 0.7  # Reduce confidence as base models don't detect potholes directly
-                        best_label = label
-                    elif best_conf == 0.0 and conf > 0.4:
-                        # If no road-related objects, use any high-confidence detection
-                        best_conf = conf * 0.4
-                        best_label = label
-            
-            detected = best_conf > 0.0
-            
-            return {
-                "type": "pothole",
-                "detected": detected,
-                "confidence": round(best_conf, 4),
-                "boxes": boxes,
-                "label": (best_label or None),
-                "raw_detections": len(boxes)  # Total number of detections
-            }
+            return self.postprocess(self.predict(image_path))
         except Exception as e:
             logger.error(f"PotholeDetector: Error during detection: {e}", exc_info=True)
-            return {
-                "type": "pothole",
-                "detected": False,
-                "confidence": 0.0,
-                "boxes": [],
-                "label": None,
-                "error": str(e)
-            }
+            return self.error_result(str(e))
+    
+    def detect_batch(self, sources: List[Any], batch_size: int = DEFAULT_BATCH_SIZE) -> List[Dict[str, Any]]:
+        """
+        Detect potholes in several images using batched forward passes.
+        
+        Args:
+            sources: Image paths or decoded BGR arrays
+            batch_size: Maximum number of images per forward pass
+            
+        Returns:
+            One detection result per source, in order, identical to detect()
+        """
+        sources = list(sources)
+        if self.model is None:
+            return [self.error_result("model missing") for _ in sources]
+        
+        batch_size = max(int(batch_size), 1)
+        output: List[Dict[str, Any]] = []
+        for start in range(0, len(sources), batch_size):
+            chunk = sources[start:start + batch_size]
+            try:
+                results = self.predict(chunk, batch=len(chunk))
+                if len(results) != len(chunk):
+                    raise RuntimeError(f"expected {len(chunk)} results, got {len(results)}")
+                output.extend([self.postprocess([r]) for r in results])
+            except Exception as e:
+                # Isolate the failing image(s) by falling back to one-at-a-time
+                logger.warning(f"PotholeDetector: Batched detection failed ({e}), retrying per image")
+                output.extend(self.detect(src) for src in chunk)
+        return output
@@ -0,0 +1,215 @@
+"""
+Export detector models to ONNX / OpenVINO, optionally INT8-quantized.
+
+Artifacts are written next to each detector's model.pt under the names
+backends.artifact_path() expects, and are only rebuilt when model.pt is
+newer (or with --force). Select one per detector with the `backend` and
+`precision` keys in its config.yaml.
+
+Run from the project root:
+    python -m backend.ai.export_models --backends onnx openvino --int8
+    python -m backend.ai.export_models --check --images uploads/
+"""
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import logging
+import shutil
+import sys
+
+from backend.ai.backends import BACKENDS, artifact_path
+from backend.ai.registry import DETECTORS_DIR, load_detector
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+# Maximum allowed |confidence difference| against the torch model per precision
+PARITY_TOLERANCE = {"fp32": 0.02, "int8": 0.10}
+
+
+def _is_fresh(artifact: Path, model_path: Path) -> bool:
+    if not artifact.exists():
+        return False
+    stamp = artifact.stat().st_mtime
+    if artifact.is_dir():
+        stamp = min((p.stat().st_mtime for p in artifact.iterdir()), default=0.0)
+    return stamp >= model_path.stat().st_mtime
+
+
+def _export_onnx(model_path: Path, imgsz: int) -> Path:
+    from ultralytics import YOLO
+
+    # Dynamic axes so detect_batch can send several images per forward pass
+    exported = YOLO(str(model_path)).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+    return Path(exported)
+
+
+def _quantize_onnx(fp32_path: Path, int8_path: Path) -> Path:
+    # onnxruntime is only needed for exporting and running ONNX models
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QUInt8)
+    return int8_path
+
+
+def _export_openvino(model_path: Path, imgsz: int, int8: bool, data: str) -> Path:
+    from ultralytics import YOLO
+
+    kwargs: Dict[str, Any] = {"format": "openvino", "imgsz": imgsz, "dynamic": True}
+    if int8:
+        # NNCF post-training quantization needs a calibration dataset
+        kwargs.update(int8=True, data=data)
+    return Path(YOLO(str(model_path)).export(**kwargs))
+
+
+def export_detector(detector_dir: Path, backend: str, int8: bool = False, imgsz: int = 640,
+                    data: str = "coco8.yaml", force: bool = False) -> Optional[Path]:
+    """
+    Build one backend/precision artifact for a detector.
+
+    Returns:
+        Path of the artifact, or None if model.pt is missing or the export failed
+    """
+    model_path = detector_dir / "model.pt"
+    precision = "int8" if int8 else "fp32"
+    target = artifact_path(detector_dir, backend, precision)
+
+    if not model_path.exists():
+        logger.error(f"✗ {detector_dir.name}: model.pt not found, run setup_models.py first")
+        return None
+    if not force and _is_fresh(target, model_path):
+        logger.info(f"✓ {detector_dir.name}: {backend}/{precision} up to date ({target.name})")
+        return target
+
+    logger.info(f"Exporting {detector_dir.name} to {backend}/{precision}...")
+    try:
+        if backend == "onnx":
+            fp32_path = artifact_path(detector_dir, "onnx", "fp32")
+            if force or not _is_fresh(fp32_path, model_path):
+                produced = _export_onnx(model_path, imgsz)
+                if produced != fp32_path:
+                    shutil.move(str(produced), str(fp32_path))
+            if int8:
+                _quantize_onnx(fp32_path, target)
+        elif backend == "openvino":
+            produced = _export_openvino(model_path, imgsz, int8, data)
+            if produced != target:
+                if target.exists():
+                    shutil.rmtree(target)
+                shutil.move(str(produced), str(target))
+        else:
+            logger.error(f"✗ Cannot export to backend '{backend}'")
+            return None
+    except Exception as e:
+        logger.error(f"✗ Failed to export {detector_dir.name} to {backend}/{precision}: {e}")
+        return None
+
+    logger.info(f"✓ {detector_dir.name}: {backend}/{precision} written to {target}")
+    return target
+
+
+def _load_variant(detector_dir: Path, backend: str, precision: str) -> Tuple[Optional[Any], str]:
+    """Load a detector and point it at the given artifact, regardless of its config.yaml."""
+    from ultralytics import YOLO
+
+    detector, class_name = load_detector(detector_dir)
+    if detector is None:
+        return None, detector_dir.name
+    path = artifact_path(detector_dir, backend, precision)
+    if not path.exists():
+        return None, class_name
+    detector.model = YOLO(str(path), task="detect")
+    detector.weights_path, detector.backend, detector.precision = path, backend, precision
+    return detector, class_name
+
+
+def _images(folder: Path, limit: int) -> List[Path]:
+    found = sorted(p for p in folder.rglob("*") if p.suffix.lower() in IMAGE_EXTENSIONS)
+    return found[:limit]
+
+
+def check_parity(detector_dir: Path, backend: str, precision: str, images: List[Path]) -> bool:
+    """
+    Compare detect() of an exported artifact against the torch model.
+
+    A pair of results matches when the detected flag and label agree and the
+    confidences differ by at most PARITY_TOLERANCE[precision]. A missing
+    model.pt or artifact fails the check: nothing was compared.
+    """
+    reference, class_name = _load_variant(detector_dir, "torch", "fp32")
+    candidate, _ = _load_variant(detector_dir, backend, precision)
+    if reference is None or candidate is None:
+        missing = "model.pt" if reference is None else f"{backend}/{precision} artifact"
+        logger.error(f"✗ {detector_dir.name} {backend}/{precision}: {missing} not available, nothing compared")
+        return False
+
+    tolerance = PARITY_TOLERANCE[precision]
+    worst = 0.0
+    mismatches = 0
+    for image in images:
+        expected = reference.detect(str(image))
+        actual = candidate.detect(str(image))
+        diff = abs(float(expected.get("confidence", 0.0)) - float(actual.get("confidence", 0.0)))
+        worst = max(worst, diff)
+        if (expected.get("detected") != actual.get("detected") or expected.get("label") != actual.get("label")
+                or diff > tolerance or actual.get("error")):
+            mismatches += 1
+            logger.warning(
+                f"  {image.name}: torch={expected.get('label')}@{expected.get('confidence')} "
+                f"{backend}/{precision}={actual.get('label')}@{actual.get('confidence')} {actual.get('error') or ''}"
+            )
+
+    ok = mismatches == 0
+    status = "✓" if ok else "✗"
+    logger.info(
+        f"{status} {class_name} {backend}/{precision}: {len(images) - mismatches}/{len(images)} match, "
+        f"max confidence diff {worst:.4f} (tolerance {tolerance})"
+    )
+    return ok
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export CivicEye detector models to ONNX / OpenVINO")
+    parser.add_argument("--detectors", nargs="*", help="detector folders to process (default: all)")
+    parser.add_argument("--backends", nargs="*", default=["onnx"], choices=[b for b in BACKENDS if b != "torch"])
+    parser.add_argument("--int8", action="store_true", help="also build INT8-quantized artifacts")
+    parser.add_argument("--imgsz", type=int, default=640, help="export input size")
+    parser.add_argument("--data", default="coco8.yaml", help="calibration dataset yaml for OpenVINO INT8")
+    parser.add_argument("--force", action="store_true", help="rebuild artifacts even if up to date")
+    parser.add_argument("--check", action="store_true", help="compare existing artifacts against torch instead of exporting")
+    parser.add_argument("--images", default="uploads", help="image folder for --check")
+    parser.add_argument("--limit", type=int, default=50, help="maximum images per detector for --check")
+    args = parser.parse_args(argv)
+
+    names = args.detectors or sorted(
+        p.name for p in DETECTORS_DIR.iterdir() if p.is_dir() and (p / "detector.py").exists()
+    )
+    precisions = ["fp32", "int8"] if args.int8 else ["fp32"]
+
+    if args.check:
+        images = _images(Path(args.images), args.limit)
+        if not images:
+            logger.error(f"No images found in {args.images}")
+            return 2
+        results = [
+            check_parity(DETECTORS_DIR / name, backend, precision, images)
+            for name in names for backend in args.backends for precision in precisions
+        ]
+        return 0 if all(results) else 1
+
+    failed = [
+        (name, backend, precision)
+        for name in names for backend in args.backends for precision in precisions
+        if export_detector(DETECTORS_DIR / name, backend, precision == "int8", args.imgsz, args.data, args.force) is None
+    ]
+    if failed:
+        logger.warning(f"⚠ {len(failed)} export(s) failed: {failed}")
+        return 1
+    logger.info("✓ All exports complete. Set `backend`/`precision` in a detector's config.yaml to use them.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
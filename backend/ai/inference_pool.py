@@ -0,0 +1,458 @@
+"""
+Multiprocess Inference Pool
+
+Runs run_all in dedicated worker processes, each with its own detector
+registry, so inference and its Python-side pre/post-processing are not
+serialized behind the web process's GIL. Each worker gets a fixed torch /
+OpenCV thread count and, optionally, its own CPU cores.
+
+Decoded images are handed to workers through multiprocessing.shared_memory:
+the request thread copies the pixels into a shared block once and only the
+block's name and shape travel through the task queue. Results (plain dicts)
+come back on a shared result queue. A worker that dies is replaced; the
+requests it was running are retried once on a live worker, waiting for the
+replacement if every worker is down.
+"""
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import atexit
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from backend.config import (
+    AI_DECODE_ONCE,
+    AI_DETECTOR_TIMEOUT,
+    AI_INFERENCE_PIN_CPUS,
+    AI_INFERENCE_PROCESSES,
+    AI_INFERENCE_START_TIMEOUT,
+    AI_INFERENCE_TORCH_THREADS,
+)
+from .detector_manager import is_video
+from .ingest import PreparedImage, load_image
+
+logger = logging.getLogger(__name__)
+
+# A request is retried once if its worker dies under it
+_MAX_ATTEMPTS = 2
+
+
+def cpus_for_worker(index: int, threads: int, cpu_count: Optional[int] = None) -> List[int]:
+    """The `threads` consecutive CPUs worker `index` is pinned to, wrapping around."""
+    cpu_count = cpu_count or os.cpu_count() or 1
+    return sorted({(index * threads + k) % cpu_count for k in range(threads)})
+
+
+def configure_process(threads: int, cpus: Optional[List[int]]) -> None:
+    """Thread counts and CPU affinity for a worker; must run before torch is imported."""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    if cpus and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, cpus)
+        except OSError as e:
+            logger.warning(f"Could not pin inference worker to CPUs {cpus}: {e}")
+    try:
+        import cv2
+        cv2.setNumThreads(threads)
+    except ImportError:
+        pass
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    except (ImportError, RuntimeError):
+        pass
+
+
+def _attach(payload: Dict[str, Any]) -> Tuple[Any, Optional[shared_memory.SharedMemory]]:
+    """Rebuild the image a task refers to: a PreparedImage over shared memory, or a path."""
+    if "shm" not in payload:
+        return payload["path"], None
+    shm = shared_memory.SharedMemory(name=payload["shm"])
+    array = np.ndarray(payload["shape"], dtype=np.dtype(payload["dtype"]), buffer=shm.buf)
+    image = PreparedImage(
+        array=array,
+        scale=payload["scale"],
+        original_shape=tuple(payload["original_shape"]),
+        sha256=payload["sha256"],
+        path=payload["path"]
+    )
+    return image, shm
+
+
+def _close_blocks(blocks: List[shared_memory.SharedMemory]) -> List[shared_memory.SharedMemory]:
+    """Close attached blocks; ones still referenced by a lingering array are kept for later."""
+    still_open = []
+    for shm in blocks:
+        try:
+            shm.close()
+        except BufferError:
+            still_open.append(shm)
+    return still_open
+
+
+def _worker_main(index: int, tasks: Any, results: Any, threads: int, cpus: Optional[List[int]]) -> None:
+    """Entry point of a worker process: load and warm the detectors, then serve tasks until told to stop."""
+    configure_process(threads, cpus)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    # Detectors (and torch) load only now, after the thread settings above
+    from .detector_manager import run_all
+    from .registry import get_registry, warm_detector
+
+    started = time.perf_counter()
+    detectors = get_registry().get_all()
+    errors = {}
+    for detector, class_name in detectors:
+        if getattr(detector, "model", None) is not None:
+            error = warm_detector(detector)
+            if error:
+                errors[class_name] = error
+    results.put(("ready", index, None, {
+        "pid": os.getpid(),
+        "detectors": len(detectors),
+        "warmup_errors": errors,
+        "load_ms": round((time.perf_counter() - started) * 1000, 2),
+    }))
+
+    blocks: List[shared_memory.SharedMemory] = []
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, payload, kwargs = task
+        try:
+            image, shm = _attach(payload)
+            if shm is not None:
+                blocks.append(shm)
+            out = run_all(image, **kwargs)
+            del image
+            results.put(("done", index, task_id, out))
+        except Exception as e:
+            logger.error(f"Inference worker {index} failed on task {task_id}: {e}", exc_info=True)
+            results.put(("error", index, task_id, str(e)))
+        blocks = _close_blocks(blocks)
+
+
+class _Task:
+    __slots__ = ("task_id", "payload", "kwargs", "future", "shm", "attempts", "worker")
+
+    def __init__(self, task_id: int, payload: Dict[str, Any], kwargs: Dict[str, Any],
+                 shm: Optional[shared_memory.SharedMemory]):
+        self.task_id = task_id
+        self.payload = payload
+        self.kwargs = kwargs
+        self.future: Future = Future()
+        self.shm = shm
+        self.attempts = 0
+        self.worker: Optional[int] = None
+
+
+class _Worker:
+    __slots__ = ("index", "process", "tasks", "inflight", "ready", "info", "died_at")
+
+    def __init__(self, index: int, process: Any, tasks: Any):
+        self.index = index
+        self.process = process
+        self.tasks = tasks
+        self.inflight: Dict[int, _Task] = {}
+        self.ready = False
+        self.info: Dict[str, Any] = {}
+        self.died_at: Optional[float] = None
+
+
+class InferencePool:
+    """
+    Pool of inference worker processes.
+
+    Tasks go to the live worker with the fewest requests in flight, or wait
+    in a pending list while no worker is alive. A monitor thread replaces
+    dead workers (after restart_delay if one died before it finished
+    loading); their in-flight requests are retried on a live worker, or fail
+    after _MAX_ATTEMPTS. Only hand-offs to a live process count as attempts.
+    """
+
+    def __init__(self, processes: int = AI_INFERENCE_PROCESSES, threads: int = AI_INFERENCE_TORCH_THREADS,
+                 pin_cpus: bool = AI_INFERENCE_PIN_CPUS, monitor_interval: float = 0.5,
+                 restart_delay: float = 5.0):
+        self.processes = max(int(processes), 1)
+        cpu_count = os.cpu_count() or 1
+        self.threads = threads if threads > 0 else max(cpu_count // self.processes, 1)
+        self.pin_cpus = pin_cpus
+        self.monitor_interval = monitor_interval
+        self.restart_delay = restart_delay
+        # spawn, not fork: the web process has threads (and maybe torch) that must not be forked
+        self._ctx = multiprocessing.get_context("spawn")
+        self._results = self._ctx.Queue()
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._ids = itertools.count()
+        self._workers: List[_Worker] = []
+        # Tasks waiting for a live worker
+        self._pending: List[_Task] = []
+        self._stopped = threading.Event()
+        self._stats = {"requests": 0, "errors": 0, "retries": 0, "restarts": 0}
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> "InferencePool":
+        with self._lock:
+            if self._workers:
+                return self
+            self._workers = [self._spawn(i) for i in range(self.processes)]
+        for target, name in ((self._collect, "inference-results"), (self._monitor, "inference-monitor")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {self.processes} inference workers, {self.threads} threads each"
+                    f"{' (pinned)' if self.pin_cpus else ''}")
+        return self
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until every worker has loaded its detectors. Returns whether they all did."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._ready:
+            while not all(w.ready for w in self._workers):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._ready.wait(remaining)
+            return True
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return bool(self._workers) and all(w.ready for w in self._workers)
+
+    def submit(self, image: Any, **kwargs: Any) -> Future:
+        """
+        Queue run_all(image, **kwargs) on a worker. image is a PreparedImage
+        (handed over through shared memory) or a path the worker reads itself.
+        """
+        task = self._task(image, kwargs)
+        with self._lock:
+            self._stats["requests"] += 1
+            self._dispatch(task)
+        return task.future
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["workers"] = [{
+                "index": w.index,
+                "alive": w.process.is_alive(),
+                "ready": w.ready,
+                "inflight": len(w.inflight),
+                **w.info,
+            } for w in self._workers]
+            stats["pending"] = len(self._pending)
+        stats.update({"processes": self.processes, "threads": self.threads, "pin_cpus": self.pin_cpus})
+        stats["queue_depth"] = stats["pending"] + sum(w["inflight"] for w in stats["workers"])
+        return stats
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Stop every worker and fail whatever is still in flight."""
+        self._stopped.set()
+        with self._lock:
+            workers, self._workers = self._workers, []
+            pending, self._pending = self._pending, []
+        for task in pending:
+            self._finish(task, error="inference pool shut down")
+        for w in workers:
+            try:
+                w.tasks.put(None)
+            except (OSError, ValueError):
+                pass
+        for w in workers:
+            w.process.join(timeout)
+            if w.process.is_alive():
+                w.process.terminate()
+            for task in w.inflight.values():
+                self._finish(task, error="inference pool shut down")
+
+    def _task(self, image: Any, kwargs: Dict[str, Any]) -> _Task:
+        shm = None
+        if isinstance(image, PreparedImage):
+            array = np.ascontiguousarray(image.array)
+            shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+            payload = {
+                "shm": shm.name,
+                "shape": array.shape,
+                "dtype": array.dtype.str,
+                "scale": image.scale,
+                "original_shape": tuple(image.original_shape),
+                "sha256": image.sha256,
+                "path": image.path,
+            }
+        else:
+            payload = {"path": str(image)}
+        return _Task(next(self._ids), payload, kwargs, shm)
+
+    def _spawn(self, index: int) -> _Worker:
+        tasks = self._ctx.Queue()
+        cpus = cpus_for_worker(index, self.threads) if self.pin_cpus else None
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(index, tasks, self._results, self.threads, cpus),
+            name=f"inference-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        return _Worker(index, process, tasks)
+
+    def _dispatch(self, task: _Task) -> None:
+        """Hand a task to the least busy live worker, or park it until one is back; caller holds the lock."""
+        if not self._workers:
+            self._finish(task, error="inference pool is not running")
+            return
+        live = [w for w in self._workers if w.process.is_alive()]
+        if not live:
+            # Every worker is down; the monitor dispatches it once a replacement is up
+            self._pending.append(task)
+            return
+        worker = min(live, key=lambda w: (not w.ready, len(w.inflight)))
+        task.attempts += 1
+        task.worker = worker.index
+        worker.inflight[task.task_id] = task
+        worker.tasks.put((task.task_id, task.payload, task.kwargs))
+
+    def _finish(self, task: _Task, result: Any = None, error: Optional[str] = None) -> None:
+        if task.shm is not None:
+            task.shm.close()
+            task.shm.unlink()
+            task.shm = None
+        if task.future.done():
+            return
+        if error is None:
+            task.future.set_result(result)
+        else:
+            task.future.set_result(([], {
+                "detected_type": None,
+                "confidence": 0.0,
+                "detector_name": None,
+                "error": error
+            }))
+
+    def _collect(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                kind, index, task_id, value = self._results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            with self._lock:
+                worker = next((w for w in self._workers if w.index == index), None)
+                if worker is None:
+                    continue
+                if kind == "ready":
+                    worker.ready = True
+                    worker.info = value
+                    self._ready.notify_all()
+                    continue
+                task = worker.inflight.pop(task_id, None)
+                if task is None:
+                    continue
+                if kind == "error":
+                    self._stats["errors"] += 1
+                    self._finish(task, error=value)
+                else:
+                    self._finish(task, result=value)
+
+    def _monitor(self) -> None:
+        while not self._stopped.wait(self.monitor_interval):
+            with self._lock:
+                orphaned: List[_Task] = []
+                for n, worker in enumerate(self._workers):
+                    if worker.process.is_alive():
+                        continue
+                    if worker.died_at is None:
+                        worker.died_at = time.monotonic()
+                        logger.error(f"Inference worker {worker.index} (pid {worker.process.pid}) died with exit "
+                                     f"code {worker.process.exitcode}")
+                        orphaned.extend(worker.inflight.values())
+                        worker.inflight.clear()
+                    # One that died while starting will likely die again; don't respawn it in a tight loop
+                    if not worker.ready and time.monotonic() - worker.died_at < self.restart_delay:
+                        continue
+                    self._stats["restarts"] += 1
+                    self._workers[n] = self._spawn(worker.index)
+                # Only now, so a pool whose every worker died retries on the replacements
+                self._requeue(orphaned)
+                pending, self._pending = self._pending, []
+                for task in pending:
+                    self._dispatch(task)
+
+    def _requeue(self, tasks: List[_Task]) -> None:
+        """Retry a dead worker's in-flight tasks on a live one, or fail them; caller holds the lock."""
+        for task in tasks:
+            if task.attempts < _MAX_ATTEMPTS:
+                self._stats["retries"] += 1
+                self._dispatch(task)
+            else:
+                self._stats["errors"] += 1
+                self._finish(task, error="inference worker crashed")
+
+
+_pool: Optional[InferencePool] = None
+_pool_lock = threading.Lock()
+
+
+def get_inference_pool() -> InferencePool:
+    """Return the process-wide InferencePool, starting it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = InferencePool().start()
+                atexit.register(_pool.shutdown)
+    return _pool
+
+
+def inference_pool_stats() -> Dict[str, Any]:
+    """Worker process states and counters, or just the configuration if the pool is disabled."""
+    if AI_INFERENCE_PROCESSES <= 0:
+        return {"enabled": False, "processes": 0}
+    stats = get_inference_pool().stats()
+    stats["enabled"] = True
+    return stats
+
+
+def run_all_pooled(
+    image: Any,
+    confidence_threshold: float = 0.9,
+    complaint_type: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    run_all on the inference pool. Image paths are decoded here, in the
+    request thread, and handed over through shared memory; videos and files
+    that cannot be decoded are passed by path for the worker to read.
+    """
+    if isinstance(image, (str, Path)) and AI_DECODE_ONCE and not is_video(image):
+        image = load_image(str(image)) or image
+
+    pool = get_inference_pool()
+    if not pool.wait_ready(AI_INFERENCE_START_TIMEOUT):
+        logger.warning(f"Inference workers not ready after {AI_INFERENCE_START_TIMEOUT:g}s, queueing anyway")
+    future = pool.submit(image, confidence_threshold=confidence_threshold, complaint_type=complaint_type)
+    timeout = AI_DETECTOR_TIMEOUT if AI_DETECTOR_TIMEOUT > 0 else None
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        return [], {
+            "detected_type": None,
+            "confidence": 0.0,
+            "detector_name": None,
+            "error": f"detection timed out after {timeout:g}s"
+        }
@@ -0,0 +1,93 @@
+"""
+Image Ingest
+
+Decodes an image once into a BGR array, downscaled to the inference size,
+so every detector works from the same pixels instead of each YOLO predict
+re-reading and re-decoding the file.
+"""
+from pathlib import Path
+from typing import Any, Optional, Tuple
+import hashlib
+import logging
+
+import cv2
+import numpy as np
+
+from backend.config import AI_INFERENCE_MAX_SIDE
+
+logger = logging.getLogger(__name__)
+
+
+class PreparedImage:
+    """
+    A decoded image ready for inference.
+
+    Attributes:
+        array: BGR uint8 array, longest side at most max_side
+        scale: array size divided by original size (1.0 if not resized)
+        original_shape: (height, width) of the decoded original
+        sha256: hash of the original encoded bytes (same as the file's hash)
+        path: where the original is (or will be) stored, if known
+    """
+
+    __slots__ = ("array", "scale", "original_shape", "sha256", "path")
+
+    def __init__(self, array: np.ndarray, scale: float, original_shape: Tuple[int, int],
+                 sha256: str, path: Optional[str] = None):
+        self.array = array
+        self.scale = scale
+        self.original_shape = original_shape
+        self.sha256 = sha256
+        self.path = path
+
+
+def resize_for_inference(img: np.ndarray, max_side: int = AI_INFERENCE_MAX_SIDE) -> Tuple[np.ndarray, float]:
+    """
+    Shrink an image so its longest side is at most max_side.
+
+    YOLO letterboxes to its input size anyway; doing the resize once here
+    leaves it only the padding. Images are never upscaled.
+    """
+    h, w = img.shape[:2]
+    longest = max(h, w)
+    if max_side <= 0 or longest <= max_side:
+        return img, 1.0
+    scale = max_side / float(longest)
+    size = (max(int(round(w * scale)), 1), max(int(round(h * scale)), 1))
+    return cv2.resize(img, size, interpolation=cv2.INTER_AREA), scale
+
+
+def decode_image_bytes(data: bytes, path: Optional[str] = None,
+                       max_side: int = AI_INFERENCE_MAX_SIDE) -> Optional[PreparedImage]:
+    """Decode encoded image bytes once. Returns None if they are not a decodable image."""
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return None
+    array, scale = resize_for_inference(img, max_side)
+    return PreparedImage(
+        array=np.ascontiguousarray(array),
+        scale=scale,
+        original_shape=img.shape[:2],
+        sha256=hashlib.sha256(data).hexdigest(),
+        path=path
+    )
+
+
+def load_image(path: str, max_side: int = AI_INFERENCE_MAX_SIDE) -> Optional[PreparedImage]:
+    """Read and decode an image file once. Returns None if it is missing or not an image."""
+    try:
+        data = Path(path).read_bytes()
+    except OSError as e:
+        logger.warning(f"Could not read image {path}: {e}")
+        return None
+    return decode_image_bytes(data, path=str(path), max_side=max_side)
+
+
+def restore_boxes(result: Any, scale: float) -> Any:
+    """Map a detector result's boxes from inference-array coordinates back to the original image."""
+    if scale == 1.0 or not isinstance(result, dict) or not result.get("boxes"):
+        return result
+    inv = 1.0 / scale
+    restored = dict(result)
+    restored["boxes"] = [[float(v) * inv for v in box] for box in result["boxes"]]
+    return restored
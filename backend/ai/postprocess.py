@@ -0,0 +1,160 @@
+"""
+Vectorized YOLO Post-processing
+
+Helpers the detectors' postprocess() use instead of walking r.boxes one box
+at a time. Each result's boxes are moved off the device in a single
+transfer, indicator labels are matched once per class table instead of once
+per box, and the best-score scan runs on arrays.
+"""
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Keys FlatDetections.raw_output() adds to a detector result
+RAW_OUTPUT_KEYS = ("box_scores", "box_classes", "class_labels")
+
+
+class FlatDetections:
+    """
+    All boxes of one image's YOLO results as flat arrays.
+
+    Attributes:
+        boxes: [x1, y1, x2, y2] per box as Python floats, in result order
+        conf: float64 confidences
+        related: True where the box's class label contains an indicator
+    """
+
+    __slots__ = ("boxes", "conf", "related", "_cls", "_offsets", "_names")
+
+    def __init__(self, boxes: List[List[float]], conf: np.ndarray, related: np.ndarray,
+                 cls: np.ndarray, offsets: List[int], names: List[Dict[int, str]]):
+        self.boxes = boxes
+        self.conf = conf
+        self.related = related
+        self._cls = cls
+        self._offsets = offsets
+        self._names = names
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    def label(self, i: int) -> str:
+        """Lower-cased class label of box i."""
+        names = self._names[bisect_right(self._offsets, i) - 1]
+        return names[int(self._cls[i])].lower()
+
+    def raw_output(self) -> Dict[str, Any]:
+        """
+        Per-box scores and classes, JSON-safe, to keep next to the boxes in a
+        detector result (see RAW_OUTPUT_KEYS). box_classes index class_labels,
+        which holds only the labels that occur, so results from models with
+        different class tables can be mixed.
+        """
+        index: Dict[str, int] = {}
+        classes = np.zeros(len(self.boxes), dtype=np.int64)
+        ends = self._offsets[1:] + [len(self.boxes)]
+        for start, end, names in zip(self._offsets, ends, self._names):
+            ids, inverse = np.unique(self._cls[start:end], return_inverse=True)
+            remap = np.array([index.setdefault(names[int(c)].lower(), len(index)) for c in ids], dtype=np.int64)
+            classes[start:end] = remap[inverse]
+        return {
+            "box_scores": self.conf.tolist(),
+            "box_classes": classes.tolist(),
+            "class_labels": list(index),
+        }
+
+
+@lru_cache(maxsize=64)
+def _indicator_mask(names: Tuple[Tuple[int, str], ...], indicators: Tuple[str, ...]) -> np.ndarray:
+    size = max((k for k, _ in names), default=-1) + 1
+    mask = np.zeros(size, dtype=bool)
+    for cls_id, label in names:
+        label = label.lower()
+        mask[cls_id] = any(indicator in label for indicator in indicators)
+    return mask
+
+
+def indicator_mask(names: Dict[int, str], indicators: Sequence[str]) -> np.ndarray:
+    """Boolean lookup table over class ids: True where the label contains any indicator."""
+    return _indicator_mask(tuple(sorted(names.items())), tuple(indicators))
+
+
+def flatten_results(results: List[Any], indicators: Sequence[str]) -> FlatDetections:
+    """Move every box of `results` to host memory once and tag indicator classes."""
+    boxes: List[List[float]] = []
+    confs: List[np.ndarray] = []
+    related: List[np.ndarray] = []
+    classes: List[np.ndarray] = []
+    offsets: List[int] = []
+    names: List[Dict[int, str]] = []
+
+    for r in results:
+        # Boxes.data is (n, 6) [x1, y1, x2, y2, conf, cls], or (n, 7) with a track id
+        data = r.boxes.data.cpu().numpy()
+        if not len(data):
+            continue
+        cls = data[:, -1].astype(np.int64)
+        mask = indicator_mask(r.names, indicators)
+        offsets.append(len(boxes))
+        names.append(r.names)
+        boxes.extend(data[:, :4].tolist())
+        # float64 of the float32 scores, exactly what float(box.conf[0]) gives
+        confs.append(data[:, -2].astype(np.float64))
+        related.append(mask[cls])
+        classes.append(cls)
+
+    if not boxes:
+        return FlatDetections([], np.zeros(0), np.zeros(0, dtype=bool), np.zeros(0, dtype=np.int64), [], [])
+    return FlatDetections(
+        boxes, np.concatenate(confs), np.concatenate(related), np.concatenate(classes), offsets, names
+    )
+
+
+def select_best(conf: np.ndarray, related: np.ndarray, related_factor: float,
+                fallback_min: float, fallback_factor: float) -> Tuple[float, Optional[int]]:
+    """
+    Vectorized form of the detectors' sequential best-score scan:
+
+        for each box in order:
+            if related and conf > best:                 best = conf * related_factor
+            elif best == 0 and not related and conf > fallback_min:
+                                                        best = conf * fallback_factor
+
+    Returns:
+        (best score, index of the box that set it or None)
+    """
+    best, best_i, start = 0.0, None, 0
+
+    related_hits = np.flatnonzero(related & (conf > 0.0))
+    first_related = related_hits[0] if related_hits.size else len(conf)
+    fallback = np.flatnonzero(~related[:first_related] & (conf[:first_related] > fallback_min))
+    if fallback.size:
+        best_i = int(fallback[0])
+        best = float(conf[best_i]) * fallback_factor
+        start = best_i + 1
+
+    candidates = related_hits[related_hits >= start]
+    if related_factor == 1.0:
+        # Plain running maximum: the first occurrence of the largest score wins
+        if candidates.size:
+            k = int(np.argmax(conf[candidates]))
+            if conf[candidates[k]] > best:
+                best_i = int(candidates[k])
+                best = float(conf[best_i])
+        return best, best_i
+
+    # A scaled score can be beaten by a lower raw score, so follow the chain of
+    # updates; each step jumps straight to the next box that beats the current best
+    scores = conf[candidates]
+    pos = 0
+    while pos < len(scores):
+        beats = np.flatnonzero(scores[pos:] > best)
+        if not beats.size:
+            break
+        pos += int(beats[0])
+        best_i = int(candidates[pos])
+        best = float(scores[pos]) * related_factor
+        pos += 1
+    return best, best_i
@@ -0,0 +1,201 @@
+"""
+Raw Detection Store
+
+Packs what every detector of a run saw (each box with its score and class)
+into one compact blob stored with the run's final decision, and re-scores
+stored runs without inference: the boxes are handed back to each detector's
+postprocess() as if they came from YOLO, so changed scoring heuristics or a
+new confidence threshold take effect in milliseconds per complaint instead
+of a full backfill.
+
+Blob layout (little-endian):
+
+    b"CEr1" | uint32 header length | header JSON | float32 [n, 6] rows
+
+Each row is [x1, y1, x2, y2, score, class], boxes in the coordinates of the
+image detection ran on and class an index into the detector's labels. The
+header lists the detectors in run order with their row count, labels and
+stored result; detectors that failed, were skipped by the cascade or keep
+no per-box scores (e.g. video aggregates) are stored by their result only
+and re-score to it unchanged.
+
+Only boxes above a detector's own conf_threshold are stored, so re-scoring
+can make detection stricter but never sees boxes YOLO already dropped.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import logging
+import struct
+
+import numpy as np
+
+from .postprocess import RAW_OUTPUT_KEYS
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"CEr1"
+_HEADER = struct.Struct("<4sI")
+_ROW_WIDTH = 6
+
+# Result fields kept in the header, enough to rebuild a detection without its boxes
+_RESULT_KEYS = ("type", "label", "confidence", "detected", "error", "timed_out", "skipped", "reason")
+
+
+def _has_raw_output(raw: Dict[str, Any]) -> bool:
+    if not all(isinstance(raw.get(key), list) for key in RAW_OUTPUT_KEYS):
+        return False
+    return len(raw["box_scores"]) == len(raw["box_classes"]) == len(raw.get("boxes") or [])
+
+
+def pack(detections: List[Dict[str, Any]]) -> Optional[bytes]:
+    """
+    Pack the detections of one run_all call.
+
+    Returns:
+        The blob, or None if there is nothing to store
+    """
+    entries: List[Dict[str, Any]] = []
+    rows: List[np.ndarray] = []
+    for d in detections:
+        raw = d.get("raw")
+        if not d.get("detector_name") or not isinstance(raw, dict):
+            continue
+        entry: Dict[str, Any] = {
+            "detector": d["detector_name"],
+            "model_version": d.get("model_version"),
+            "result": {k: raw[k] for k in _RESULT_KEYS if raw.get(k) is not None},
+            "rows": 0,
+        }
+        if not raw.get("error") and _has_raw_output(raw):
+            n = len(raw["boxes"])
+            block = np.empty((n, _ROW_WIDTH), dtype="<f4")
+            if n:
+                block[:, :4] = np.asarray(raw["boxes"], dtype=np.float64)[:, :4]
+                block[:, 4] = raw["box_scores"]
+                block[:, 5] = raw["box_classes"]
+            entry["rows"] = n
+            entry["labels"] = raw["class_labels"]
+            rows.append(block)
+        entries.append(entry)
+
+    if not entries:
+        return None
+    header = json.dumps({"detectors": entries}, separators=(",", ":")).encode("utf-8")
+    data = np.concatenate(rows) if rows else np.empty((0, _ROW_WIDTH), dtype="<f4")
+    return _HEADER.pack(_MAGIC, len(header)) + header + data.tobytes()
+
+
+def unpack(blob: bytes) -> List[Dict[str, Any]]:
+    """
+    The detector entries of a packed run, in run order. Entries with stored
+    boxes carry them as "data", a float32 [n, 6] array.
+
+    Raises:
+        ValueError: If blob is not a packed run
+    """
+    blob = bytes(blob)
+    if len(blob) < _HEADER.size:
+        raise ValueError("raw detection blob is truncated")
+    magic, header_len = _HEADER.unpack_from(blob)
+    if magic != _MAGIC:
+        raise ValueError(f"unknown raw detection format {magic!r}")
+    start = _HEADER.size + header_len
+    entries = json.loads(blob[_HEADER.size:start].decode("utf-8"))["detectors"]
+    data = np.frombuffer(blob, dtype="<f4", offset=start).reshape(-1, _ROW_WIDTH)
+
+    offset = 0
+    for entry in entries:
+        if "labels" in entry:
+            entry["data"] = data[offset:offset + entry["rows"]]
+            offset += entry["rows"]
+    if offset != len(data):
+        raise ValueError(f"raw detection blob holds {len(data)} rows, header lists {offset}")
+    return entries
+
+
+class _HostArray:
+    """Array already in host memory, with the .cpu().numpy() of a tensor."""
+
+    __slots__ = ("array",)
+
+    def __init__(self, array: np.ndarray):
+        self.array = array
+
+    def cpu(self) -> "_HostArray":
+        return self
+
+    def numpy(self) -> np.ndarray:
+        return self.array
+
+
+class _StoredBoxes:
+    __slots__ = ("data",)
+
+    def __init__(self, data: np.ndarray):
+        self.data = _HostArray(data)
+
+
+class StoredResult:
+    """A stored detector entry in the shape postprocess() reads from a YOLO result: .boxes.data and .names."""
+
+    __slots__ = ("boxes", "names")
+
+    def __init__(self, data: np.ndarray, labels: List[str]):
+        self.boxes = _StoredBoxes(data)
+        self.names = dict(enumerate(labels))
+
+
+class _StoredDetector:
+    """Stands in for the detector instance in run_all's summary, carrying the stored model_version."""
+
+    __slots__ = ("model_version",)
+
+    def __init__(self, model_version: Optional[str]):
+        self.model_version = model_version
+
+
+def load_scorers() -> Dict[str, Any]:
+    """A postprocess-only instance of every detector, by class name (see registry.load_scorer)."""
+    from .registry import DETECTORS_DIR, DetectorRegistry, load_scorer
+
+    scorers: Dict[str, Any] = {}
+    for name in DetectorRegistry(DETECTORS_DIR).discover():
+        try:
+            inst, class_name = load_scorer(DETECTORS_DIR / name)
+        except Exception as e:
+            logger.error(f"Could not load {name} for re-scoring: {e}", exc_info=True)
+            continue
+        if inst is not None and hasattr(inst, "postprocess"):
+            scorers[class_name] = inst
+    return scorers
+
+
+def _rescore_entry(entry: Dict[str, Any], scorers: Dict[str, Any]) -> Any:
+    scorer = scorers.get(entry["detector"])
+    if "data" not in entry or scorer is None:
+        return dict(entry["result"])
+    try:
+        return scorer.postprocess([StoredResult(entry["data"], entry["labels"])]) or {}
+    except Exception as e:
+        return e
+
+
+def rescore(blob: bytes, scorers: Dict[str, Any],
+            confidence_threshold: float = 0.9) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Re-run the scoring of a packed run with the current postprocess() code.
+
+    Args:
+        blob: A run packed by pack()
+        scorers: Detector instances by class name, from load_scorers()
+        confidence_threshold: Same meaning as in run_all
+
+    Returns:
+        (detections, best) like run_all's, without latencies or timings
+    """
+    from .detector_manager import _summarize
+
+    entries = unpack(blob)
+    detectors = [(_StoredDetector(e.get("model_version")), e["detector"]) for e in entries]
+    raw_results = [_rescore_entry(e, scorers) for e in entries]
+    return _summarize(detectors, raw_results, confidence_threshold)
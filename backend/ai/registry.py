@@ -0,0 +1,445 @@
+"""
+Detector Registry
+
+Process-wide cache of detector instances. Each detector folder under
+DETECTORS_DIR is imported and its model constructed once, then shared by
+every caller of run_all / run_all_for_api until its files change and it is
+hot reloaded.
+"""
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import importlib.util
+import logging
+import os
+import threading
+import time
+
+from backend.config import AI_HOT_RELOAD, AI_HOT_RELOAD_INTERVAL, AI_INFERENCE_MAX_SIDE
+
+logger = logging.getLogger(__name__)
+
+# Absolute path to ai/
+AI_DIR = Path(__file__).resolve().parent
+DETECTORS_DIR = AI_DIR / "detectors"
+
+
+def _class_name_for(detector_name: str) -> str:
+    return "".join(p.capitalize() for p in detector_name.split("_")) + "Detector"
+
+
+def _current_rss_bytes() -> int:
+    """Resident set size of this process, 0 if it cannot be determined."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is the peak, in KiB on Linux and bytes on macOS
+        return int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss) * 1024
+    except Exception:
+        return 0
+
+
+def _count_parameters(instance: Any) -> int:
+    model = getattr(instance, "model", None)
+    torch_model = getattr(model, "model", None)
+    if torch_model is None or not hasattr(torch_model, "parameters"):
+        return 0
+    try:
+        return int(sum(p.numel() for p in torch_model.parameters()))
+    except Exception:
+        return 0
+
+
+_fingerprint_cache: Dict[str, Tuple[Tuple[int, int], str]] = {}
+_fingerprint_lock = threading.Lock()
+
+
+def file_fingerprint(path: Path) -> Optional[str]:
+    """
+    SHA-256 of a file's contents, or None if the file does not exist.
+
+    Hashes are cached per path and recomputed only when the file's size or
+    modification time changes.
+    """
+    path = Path(path)
+    if path.is_dir():
+        # Exported model directories (OpenVINO): hash of the member hashes
+        parts = [f"{p.name}:{file_fingerprint(p)}" for p in sorted(path.iterdir()) if p.is_file()]
+        return hashlib.sha256("|".join(parts).encode()).hexdigest() if parts else None
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    key = str(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _fingerprint_lock:
+        cached = _fingerprint_cache.get(key)
+        if cached and cached[0] == stamp:
+            return cached[1]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    value = digest.hexdigest()
+    with _fingerprint_lock:
+        _fingerprint_cache[key] = (stamp, value)
+    return value
+
+
+def weights_path(detector: Any) -> Path:
+    """The model file (or exported model directory) a detector actually loaded."""
+    return Path(getattr(detector, "weights_path", None) or getattr(detector, "model_path", ""))
+
+
+def loaded_model_hash(detector: Any) -> Optional[str]:
+    """
+    Hash of the weights a detector loaded, as recorded by the registry at load
+    time; falls back to hashing the file now for detectors built elsewhere.
+    A hot reload can replace the file while an old instance is still in use,
+    so the recorded hash is the one that describes the instance.
+    """
+    return getattr(detector, "model_hash", None) or file_fingerprint(weights_path(detector))
+
+
+def model_version(model_hash: Optional[str], config_hash: Optional[str], backend: str = "torch",
+                  precision: str = "fp32") -> Optional[str]:
+    """Short, human-readable model version: weights hash, config hash and non-default backend."""
+    if model_hash is None:
+        return None
+    version = f"{model_hash[:12]}.{(config_hash or 'noconfig')[:8]}"
+    if backend != "torch" or precision != "fp32":
+        version += f".{backend}-{precision}"
+    return version
+
+
+def file_stamp(detector_dir: Path) -> Tuple[Tuple[str, int, int], ...]:
+    """
+    (name, mtime_ns, size) of config.yaml and every model* file or exported
+    model directory's files in a detector folder; changes when any of them do.
+    """
+    entries = []
+    try:
+        children = sorted(Path(detector_dir).iterdir())
+    except OSError:
+        return ()
+    for child in children:
+        if child.name != "config.yaml" and not child.name.startswith("model"):
+            continue
+        files = sorted(child.iterdir()) if child.is_dir() else [child]
+        for f in files:
+            try:
+                st = f.stat()
+            except OSError:
+                continue
+            entries.append((str(f.relative_to(detector_dir)), st.st_mtime_ns, st.st_size))
+    return tuple(entries)
+
+
+def warm_detector(detector: Any, side: int = AI_INFERENCE_MAX_SIDE) -> Optional[str]:
+    """Run one detect() on a blank frame. Returns the error, or None if it worked."""
+    import numpy as np
+
+    try:
+        result = detector.detect(np.zeros((side, side, 3), dtype=np.uint8)) or {}
+        return result.get("error")
+    except Exception as e:
+        return str(e)
+
+
+def detector_fingerprint(detector: Any) -> Optional[Tuple[str, float, float]]:
+    """
+    Identify what a detector's forward pass depends on: weights and thresholds.
+
+    Two detectors with equal fingerprints produce identical raw YOLO results for
+    the same image. Returns None for detectors without a loaded model.
+    """
+    if getattr(detector, "model", None) is None:
+        return None
+    model_hash = loaded_model_hash(detector)
+    if model_hash is None:
+        return None
+    return (
+        model_hash,
+        float(getattr(detector, "conf_threshold", 0.0)),
+        float(getattr(detector, "iou_threshold", 0.0)),
+    )
+
+
+def _detector_class(detector_dir: Path) -> Tuple[Optional[Any], Optional[str]]:
+    """Import detector.py from a detector folder. Returns (class, class_name) or (None, None)."""
+    detector_dir = Path(detector_dir)
+    detector_name = detector_dir.name
+    module_path = detector_dir / "detector.py"
+
+    if not module_path.exists():
+        logger.error(f"detector.py missing for {detector_name}")
+        return None, None
+
+    spec = importlib.util.spec_from_file_location(
+        f"{detector_name}_detector",
+        str(module_path)
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    class_name = _class_name_for(detector_name)
+    cls = getattr(module, class_name, None)
+
+    if cls is None:
+        logger.error(f"Class {class_name} not found in {module_path}")
+        return None, None
+
+    return cls, class_name
+
+
+def load_detector(detector_dir: Path) -> Tuple[Optional[Any], Optional[str]]:
+    """
+    Import detector.py from a detector folder and instantiate its detector class.
+
+    Returns:
+        (instance, class_name), or (None, None) if the module or class is missing
+    """
+    cls, class_name = _detector_class(detector_dir)
+    if cls is None:
+        return None, None
+    return cls(Path(detector_dir)), class_name
+
+
+def load_scorer(detector_dir: Path) -> Tuple[Optional[Any], Optional[str]]:
+    """
+    Like load_detector, but skips the class's __init__ and its model loading:
+    the instance is only good for postprocess(), which needs neither.
+    """
+    cls, class_name = _detector_class(detector_dir)
+    if cls is None:
+        return None, None
+    return cls.__new__(cls), class_name
+
+
+class DetectorRegistry:
+    """
+    Thread-safe registry that loads every detector exactly once per process.
+
+    Detector folders are discovered lazily from ``detectors_dir``; a folder
+    counts as a detector when it contains a ``detector.py``.
+
+    Loaded detectors can be hot reloaded: a replacement instance is built
+    and warmed without holding the registry lock, then swapped in. Callers
+    that already hold the old instance finish with it.
+    """
+
+    def __init__(self, detectors_dir: Path = DETECTORS_DIR):
+        self.detectors_dir = Path(detectors_dir)
+        self._lock = threading.RLock()
+        self._names: Optional[List[str]] = None
+        self._instances: Dict[str, Tuple[Optional[Any], Optional[str]]] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._stamps: Dict[str, Tuple[Tuple[str, int, int], ...]] = {}
+        self._changed: Dict[str, Tuple[Tuple[str, int, int], ...]] = {}
+        self._watcher: Optional[threading.Thread] = None
+        self._watcher_stop = threading.Event()
+
+    def discover(self) -> List[str]:
+        """Return detector names found under detectors_dir, sorted by name."""
+        with self._lock:
+            if self._names is None:
+                if self.detectors_dir.is_dir():
+                    self._names = sorted(
+                        p.name for p in self.detectors_dir.iterdir()
+                        if p.is_dir() and (p / "detector.py").exists()
+                    )
+                else:
+                    logger.error(f"Detectors directory not found: {self.detectors_dir}")
+                    self._names = []
+            return list(self._names)
+
+    def get(self, name: str) -> Tuple[Optional[Any], Optional[str]]:
+        """Return the shared (instance, class_name) for a detector, loading it on first use."""
+        with self._lock:
+            if name not in self._instances:
+                self._instances[name] = self._load(name)
+            return self._instances[name]
+
+    def get_all(self) -> List[Tuple[Any, str]]:
+        """Return (instance, class_name) for every detector that loaded successfully."""
+        loaded = []
+        for name in self.discover():
+            inst, class_name = self.get(name)
+            if inst is not None:
+                loaded.append((inst, class_name))
+        return loaded
+
+    def reload(self, name: str, warm: bool = True) -> Tuple[Optional[Any], Optional[str]]:
+        """
+        Build a fresh instance of a detector and swap it in.
+
+        The old instance stays in place if the new one fails to load, has no
+        model where the old one had, or (with warm) fails its dummy inference.
+        Returns the instance in use afterwards.
+        """
+        stamp = file_stamp(self.detectors_dir / name)
+        inst, class_name, stats = self._build(name)
+        error = stats["error"]
+        with self._lock:
+            old, _ = self._instances.get(name, (None, None))
+        if error is None and inst is None:
+            error = "detector class not found"
+        if error is None and getattr(inst, "model", None) is None and getattr(old, "model", None) is not None:
+            error = "new instance has no model"
+        if error is None and warm and getattr(inst, "model", None) is not None:
+            started = time.perf_counter()
+            error = warm_detector(inst)
+            stats["warmup_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+        with self._lock:
+            previous = self._stats.get(name, {})
+            if error is not None and name in self._instances:
+                logger.error(f"Reload of detector {name} failed, keeping the loaded instance: {error}")
+                previous["last_reload_error"] = error
+                # Don't retry until the files change again
+                self._stamps[name] = stamp
+                return self._instances[name]
+            stats["reloads"] = previous.get("reloads", 0) + (1 if name in self._instances else 0)
+            stats["last_reload_error"] = None
+            self._instances[name] = (inst, class_name)
+            self._stats[name] = stats
+            self._stamps[name] = stamp
+            self._changed.pop(name, None)
+        logger.info(f"Detector {name} reloaded as version {stats.get('model_version')}")
+        return inst, class_name
+
+    def check_for_updates(self) -> List[str]:
+        """
+        Reload loaded detectors whose model or config files changed.
+
+        A change must look the same on two consecutive checks before it is
+        picked up, so a model.pt still being copied is not loaded half-written.
+        Returns the names that were reloaded.
+        """
+        with self._lock:
+            loaded = {name: self._stamps.get(name) for name in self._instances}
+        reloaded = []
+        for name, loaded_stamp in loaded.items():
+            stamp = file_stamp(self.detectors_dir / name)
+            if stamp == loaded_stamp:
+                self._changed.pop(name, None)
+                continue
+            if self._changed.get(name) != stamp:
+                self._changed[name] = stamp
+                continue
+            logger.info(f"Detector {name} files changed, reloading")
+            self.reload(name)
+            reloaded.append(name)
+        return reloaded
+
+    def start_watcher(self, interval: float) -> None:
+        """Poll for changed detector files every `interval` seconds in a daemon thread."""
+        with self._lock:
+            if self._watcher is not None or interval <= 0:
+                return
+            self._watcher = threading.Thread(
+                target=self._watch, args=(interval,), name="detector-watcher", daemon=True
+            )
+            self._watcher.start()
+
+    def stop_watcher(self) -> None:
+        self._watcher_stop.set()
+
+    def _watch(self, interval: float) -> None:
+        while not self._watcher_stop.wait(interval):
+            try:
+                self.check_for_updates()
+            except Exception as e:
+                logger.error(f"Detector watcher error: {e}", exc_info=True)
+
+    def clear(self) -> None:
+        """Forget all cached detectors and rediscover on next access."""
+        with self._lock:
+            self._names = None
+            self._instances.clear()
+            self._stats.clear()
+            self._stamps.clear()
+            self._changed.clear()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-detector load statistics (load time, memory, model size, version)."""
+        with self._lock:
+            return {name: dict(s) for name, s in self._stats.items()}
+
+    def _load(self, name: str) -> Tuple[Optional[Any], Optional[str]]:
+        stamp = file_stamp(self.detectors_dir / name)
+        inst, class_name, stats = self._build(name)
+        stats["reloads"] = 0
+        stats["last_reload_error"] = None
+        self._stats[name] = stats
+        self._stamps[name] = stamp
+        return inst, class_name
+
+    def _build(self, name: str) -> Tuple[Optional[Any], Optional[str], Dict[str, Any]]:
+        """Construct a detector instance and its load statistics without touching registry state."""
+        det_dir = self.detectors_dir / name
+        model_path = det_dir / "model.pt"
+        rss_before = _current_rss_bytes()
+        started = time.perf_counter()
+        inst, class_name, error = None, None, None
+
+        try:
+            inst, class_name = load_detector(det_dir)
+            if inst is None:
+                error = "detector class not found"
+        except Exception as e:
+            logger.error(f"Failed to load detector {name}: {e}", exc_info=True)
+            error = str(e)
+
+        load_time = time.perf_counter() - started
+        rss_after = _current_rss_bytes()
+
+        version = None
+        if inst is not None and getattr(inst, "model", None) is not None:
+            # Pin what this instance was built from; the files may change later
+            inst.model_hash = file_fingerprint(weights_path(inst))
+            inst.config_hash = file_fingerprint(getattr(inst, "config_path", det_dir / "config.yaml"))
+            version = model_version(
+                inst.model_hash, inst.config_hash,
+                getattr(inst, "backend", "torch"), getattr(inst, "precision", "fp32")
+            )
+            inst.model_version = version
+
+        stats = {
+            "class_name": class_name,
+            "loaded": inst is not None,
+            "model_loaded": getattr(inst, "model", None) is not None,
+            "model_version": version,
+            "load_time_ms": round(load_time * 1000, 2),
+            "rss_delta_bytes": max(rss_after - rss_before, 0),
+            "model_file_bytes": model_path.stat().st_size if model_path.exists() else 0,
+            "backend": getattr(inst, "backend", "torch"),
+            "precision": getattr(inst, "precision", "fp32"),
+            "parameters": _count_parameters(inst),
+            "loaded_at": time.time(),
+            "error": error,
+        }
+        logger.info(f"Detector {name} loaded in {load_time * 1000:.1f} ms")
+        return inst, class_name, stats
+
+
+_registry: Optional[DetectorRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> DetectorRegistry:
+    """Return the process-wide DetectorRegistry, creating it on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                registry = DetectorRegistry()
+                if AI_HOT_RELOAD:
+                    registry.start_watcher(AI_HOT_RELOAD_INTERVAL)
+                _registry = registry
+    return _registry
@@ -0,0 +1,262 @@
+"""
+Detection Result Cache
+
+Persistent, content-addressed cache of per-detector raw results. An entry is
+keyed by the SHA-256 of the image bytes together with the detector's
+fingerprint (class, loaded model hash and backend, config.yaml hash and
+loaded thresholds), so changing weights or config produces new keys and stale
+entries simply age out under LRU / size-based eviction.
+"""
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from backend.config import (
+    AI_DECODE_ONCE,
+    AI_INFERENCE_MAX_SIDE,
+    AI_RESULT_CACHE_MAX_BYTES,
+    AI_RESULT_CACHE_MAX_ENTRIES,
+    AI_RESULT_CACHE_PATH,
+)
+from .registry import file_fingerprint, loaded_model_hash
+
+logger = logging.getLogger(__name__)
+
+
+def image_fingerprint(image: Any) -> Optional[str]:
+    """SHA-256 identifying an image path's contents or a decoded array's pixels."""
+    prepared_hash = getattr(image, "sha256", None)
+    if isinstance(prepared_hash, str):
+        # PreparedImage: hash of the original bytes, equal to the file's hash
+        return prepared_hash
+    if isinstance(image, (str, Path)):
+        return file_fingerprint(Path(image))
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(image).hexdigest()
+    tobytes = getattr(image, "tobytes", None)
+    if tobytes is None:
+        return None
+    digest = hashlib.sha256()
+    digest.update(f"{getattr(image, 'shape', '')}:{getattr(image, 'dtype', '')}".encode())
+    digest.update(tobytes())
+    return digest.hexdigest()
+
+
+def detector_cache_key(detector: Any, class_name: str) -> Optional[str]:
+    """
+    Fingerprint of everything a detector's output depends on besides the image.
+    Returns None for detectors without a loaded model, which are never cached.
+    """
+    if getattr(detector, "model", None) is None:
+        return None
+    model_hash = loaded_model_hash(detector)
+    if model_hash is None:
+        return None
+    config_hash = getattr(detector, "config_hash", None) or file_fingerprint(getattr(detector, "config_path", ""))
+    parts = [
+        class_name,
+        model_hash,
+        f"{getattr(detector, 'backend', 'torch')}/{getattr(detector, 'precision', 'fp32')}",
+        config_hash or "",
+        repr(getattr(detector, "conf_threshold", None)),
+        repr(getattr(detector, "iou_threshold", None)),
+        # Shared decode downscales before inference, which can shift scores slightly
+        f"max_side={AI_INFERENCE_MAX_SIDE if AI_DECODE_ONCE else 0}",
+    ]
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    SQLite-backed LRU cache mapping (image hash, detector key) to a raw result.
+
+    Eviction removes least recently used entries once either max_entries or
+    max_bytes (total size of the stored JSON) is exceeded. The entry count and
+    byte total are kept in a one-row table by triggers, so checking them on
+    every put costs one row read however large the cache grows, and stays
+    right when several processes share the file.
+    """
+
+    def __init__(self, path: str = AI_RESULT_CACHE_PATH, max_entries: int = AI_RESULT_CACHE_MAX_ENTRIES,
+                 max_bytes: int = AI_RESULT_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_entries = int(max_entries)
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "errors": 0}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(
+                """
+                BEGIN IMMEDIATE;
+                CREATE TABLE IF NOT EXISTS detection_cache (
+                    key TEXT PRIMARY KEY,
+                    result TEXT NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS idx_detection_cache_lru ON detection_cache(last_access);
+                CREATE TABLE IF NOT EXISTS detection_cache_totals (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    entries INTEGER NOT NULL,
+                    bytes INTEGER NOT NULL
+                );
+                -- Caches created before the totals table are counted once here
+                INSERT OR IGNORE INTO detection_cache_totals (id, entries, bytes)
+                    SELECT 1, COUNT(*), COALESCE(SUM(size_bytes), 0) FROM detection_cache;
+                CREATE TRIGGER IF NOT EXISTS detection_cache_totals_insert AFTER INSERT ON detection_cache
+                BEGIN
+                    UPDATE detection_cache_totals SET entries = entries + 1, bytes = bytes + NEW.size_bytes;
+                END;
+                CREATE TRIGGER IF NOT EXISTS detection_cache_totals_delete AFTER DELETE ON detection_cache
+                BEGIN
+                    UPDATE detection_cache_totals SET entries = entries - 1, bytes = bytes - OLD.size_bytes;
+                END;
+                CREATE TRIGGER IF NOT EXISTS detection_cache_totals_update AFTER UPDATE OF size_bytes ON detection_cache
+                BEGIN
+                    UPDATE detection_cache_totals SET bytes = bytes - OLD.size_bytes + NEW.size_bytes;
+                END;
+                COMMIT;
+                """
+            )
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def make_key(image_hash: str, detector_key: str) -> str:
+        return f"{image_hash}:{detector_key}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute("SELECT result FROM detection_cache WHERE key = ?", (key,)).fetchone()
+                if row:
+                    conn.execute(
+                        "UPDATE detection_cache SET last_access = ?, hits = hits + 1 WHERE key = ?",
+                        (time.time(), key),
+                    )
+                    conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Result cache read failed: {e}")
+            self._count("errors")
+            return None
+
+        self._count("hits" if row else "misses")
+        return json.loads(row["result"]) if row else None
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        try:
+            payload = json.dumps(result, default=float)
+        except (TypeError, ValueError) as e:
+            logger.debug(f"Result not cacheable: {e}")
+            return
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                try:
+                    # An upsert, not INSERT OR REPLACE: REPLACE's implicit delete skips the totals trigger
+                    conn.execute(
+                        """INSERT INTO detection_cache
+                           (key, result, size_bytes, created_at, last_access, hits)
+                           VALUES (?, ?, ?, ?, ?, 0)
+                           ON CONFLICT(key) DO UPDATE SET
+                               result = excluded.result, size_bytes = excluded.size_bytes,
+                               created_at = excluded.created_at, last_access = excluded.last_access, hits = 0""",
+                        (key, payload, len(payload), now, now),
+                    )
+                    evicted = self._evict(conn)
+                    conn.commit()
+                finally:
+                    conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Result cache write failed: {e}")
+            self._count("errors")
+            return
+        self._count("stores")
+        if evicted:
+            self._count("evictions", evicted)
+
+    @staticmethod
+    def _totals(conn: sqlite3.Connection) -> Tuple[int, int]:
+        """(entries, bytes) of the cache, from the trigger-maintained totals row."""
+        row = conn.execute("SELECT entries, bytes FROM detection_cache_totals WHERE id = 1").fetchone()
+        return (row["entries"], row["bytes"]) if row else (0, 0)
+
+    def _evict(self, conn: sqlite3.Connection) -> int:
+        count, total = self._totals(conn)
+        evicted = 0
+        if count <= self.max_entries and total <= self.max_bytes:
+            return 0
+        cur = conn.execute("SELECT key, size_bytes FROM detection_cache ORDER BY last_access ASC")
+        victims = []
+        for r in cur:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            victims.append((r["key"],))
+            count -= 1
+            total -= r["size_bytes"]
+            evicted += 1
+        conn.executemany("DELETE FROM detection_cache WHERE key = ?", victims)
+        return evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM detection_cache")
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += n
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            s = dict(self._counters)
+        lookups = s["hits"] + s["misses"]
+        s["hit_rate"] = round(s["hits"] / lookups, 4) if lookups else 0.0
+        try:
+            conn = self._connect()
+            try:
+                s["entries"], s["bytes"] = self._totals(conn)
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            s["entries"], s["bytes"] = None, None
+        s["max_entries"] = self.max_entries
+        s["max_bytes"] = self.max_bytes
+        return s
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Return the process-wide ResultCache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResultCache()
+    return _cache
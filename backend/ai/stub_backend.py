@@ -0,0 +1,187 @@
+"""
+Stub Detector Backend
+
+A deterministic stand-in for ultralytics.YOLO, so the detection pipeline can
+be benchmarked (or exercised) without model weights, torch or network
+access. The stub returns the same boxes every time for the same image and
+can sleep to simulate model latency; everything around the model call
+(decoding, planning, post-processing, summarizing) runs for real.
+
+    detectors_dir = install_stub_backend(work_dir, boxes=20, latency_ms=5)
+    registry = DetectorRegistry(detectors_dir)
+
+The fake YOLO results it returns (FakeResult, over COCO_NAMES) are also what
+the post-processing benchmarks feed the detectors.
+"""
+from pathlib import Path
+from typing import Any, List, Optional
+import shutil
+import sys
+import time
+import types
+import zlib
+
+import numpy as np
+
+from backend.ai.registry import DETECTORS_DIR
+
+# COCO class names, as in the base YOLO models setup_models.py installs
+COCO_NAMES = [
+    "person", "bicycle", "car", "motorcycle", "airplane", "bus", "train", "truck", "boat", "traffic light",
+    "fire hydrant", "stop sign", "parking meter", "bench", "bird", "cat", "dog", "horse", "sheep", "cow",
+    "elephant", "bear", "zebra", "giraffe", "backpack", "umbrella", "handbag", "tie", "suitcase", "frisbee",
+    "skis", "snowboard", "sports ball", "kite", "baseball bat", "baseball glove", "skateboard", "surfboard",
+    "tennis racket", "bottle", "wine glass", "cup", "fork", "knife", "spoon", "bowl", "banana", "apple",
+    "sandwich", "orange", "broccoli", "carrot", "hot dog", "pizza", "donut", "cake", "chair", "couch",
+    "potted plant", "bed", "dining table", "toilet", "tv", "laptop", "mouse", "remote", "keyboard",
+    "cell phone", "microwave", "oven", "toaster", "sink", "refrigerator", "book", "clock", "vase",
+    "scissors", "teddy bear", "hair drier", "toothbrush",
+]
+
+
+def _tensor(array: np.ndarray) -> Any:
+    try:
+        import torch
+        return torch.from_numpy(array)
+    except ImportError:
+        return array.view(_HostArray)
+
+
+class _HostArray(np.ndarray):
+    """numpy stand-in for a CPU tensor: supports .cpu() and .numpy()."""
+
+    def __getitem__(self, key: Any) -> "_HostArray":
+        # Keep 0-d results as arrays, like indexing a tensor does
+        return np.asarray(super().__getitem__(key)).view(_HostArray)
+
+    def cpu(self) -> "_HostArray":
+        return self
+
+    def numpy(self) -> np.ndarray:
+        return self.view(np.ndarray)
+
+
+class FakeBoxes:
+    """Mimics ultralytics Boxes: .data, .xyxy, .conf, .cls and per-box iteration."""
+
+    def __init__(self, data: Any):
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __iter__(self):
+        for i in range(len(self.data)):
+            yield FakeBoxes(self.data[i:i + 1])
+
+    @property
+    def xyxy(self) -> Any:
+        return self.data[:, :4]
+
+    @property
+    def conf(self) -> Any:
+        return self.data[:, -2]
+
+    @property
+    def cls(self) -> Any:
+        return self.data[:, -1]
+
+
+class FakeResult:
+    """Mimics an ultralytics Results object: .boxes over [n, 6] data and .names."""
+
+    names = dict(enumerate(COCO_NAMES))
+
+    def __init__(self, data: np.ndarray):
+        self.boxes = FakeBoxes(_tensor(data))
+
+
+class StubYOLO:
+    """
+    Mimics the part of ultralytics.YOLO the detectors use: YOLO(path, task=...)
+    and predict(source, conf, iou, batch, verbose).
+
+    Boxes are drawn from a RNG seeded by the weights file's contents and a
+    sample of the image, so results are reproducible across runs and machines
+    and detectors with identical weights see identical boxes, like the real
+    model.
+    """
+
+    boxes = 20
+    latency_ms = 0.0
+
+    def __init__(self, model: str, task: Optional[str] = None, **kwargs: Any):
+        self.model_path = str(model)
+        self.task = task
+        weights = Path(self.model_path)
+        self._seed = zlib.crc32(weights.read_bytes() if weights.is_file() else self.model_path.encode())
+
+    def predict(self, source: Any = None, conf: float = 0.25, iou: float = 0.45, batch: int = 1,
+                verbose: bool = False, **kwargs: Any) -> List[FakeResult]:
+        sources = source if isinstance(source, list) else [source]
+        if self.latency_ms:
+            time.sleep(self.latency_ms * len(sources) / 1000.0)
+        return [self._result(src, conf) for src in sources]
+
+    def _result(self, source: Any, conf: float) -> FakeResult:
+        rng = np.random.default_rng([self._seed, _source_seed(source)])
+        height, width = _source_shape(source)
+        n = self.boxes
+        xy = rng.uniform(0, 1, size=(n, 2)) * (width, height)
+        wh = rng.uniform(0.02, 0.3, size=(n, 2)) * (width, height)
+        data = np.empty((n, 6), dtype=np.float32)
+        data[:, :2] = xy
+        data[:, 2:4] = np.minimum(xy + wh, (width, height))
+        data[:, 4] = rng.uniform(0.05, 1.0, size=n)
+        data[:, 5] = rng.integers(0, len(COCO_NAMES), size=n)
+        # Like the real model, nothing under the confidence threshold comes back
+        return FakeResult(data[data[:, 4] >= conf])
+
+
+def _source_seed(source: Any) -> int:
+    if isinstance(source, np.ndarray):
+        # A strided sample is enough to tell images apart and costs nothing
+        return zlib.crc32(np.ascontiguousarray(source[::17, ::17]).tobytes())
+    return zlib.crc32(str(source).encode())
+
+
+def _source_shape(source: Any) -> tuple:
+    if isinstance(source, np.ndarray):
+        return source.shape[:2]
+    return 640, 640
+
+
+def install_stub_backend(work_dir: Path, boxes: int = 20, latency_ms: float = 0.0,
+                         detectors_dir: Path = DETECTORS_DIR, shared_weights: bool = False) -> Path:
+    """
+    Make `from ultralytics import YOLO` return StubYOLO and copy the detector
+    folders (code and config, no weights) into work_dir with placeholder
+    model.pt files, so every detector loads a model.
+
+    The placeholders differ per detector unless shared_weights is set, in
+    which case they are identical and detectors with equal thresholds share
+    one forward pass in fused mode.
+
+    Returns:
+        The detectors directory to build a DetectorRegistry on.
+    """
+    StubYOLO.boxes = int(boxes)
+    StubYOLO.latency_ms = float(latency_ms)
+    module = types.ModuleType("ultralytics")
+    module.YOLO = StubYOLO
+    sys.modules["ultralytics"] = module
+
+    target = Path(work_dir) / "detectors"
+    shutil.rmtree(target, ignore_errors=True)
+    for det_dir in sorted(Path(detectors_dir).iterdir()):
+        if not (det_dir / "detector.py").exists():
+            continue
+        dest = target / det_dir.name
+        dest.mkdir(parents=True)
+        shutil.copy2(det_dir / "detector.py", dest / "detector.py")
+        if (det_dir / "config.yaml").exists():
+            shutil.copy2(det_dir / "config.yaml", dest / "config.yaml")
+        # Contents decide both the fused-mode grouping and the stub's boxes
+        weights = "shared" if shared_weights else det_dir.name
+        (dest / "model.pt").write_text(f"stub weights for {weights}\n")
+    return target
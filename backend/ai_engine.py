@@ -1,47 +1,152 @@
+from concurrent.futures import ProcessPoolExecutor
+import io
+import os
+import threading
+
 import cv2
 import numpy as np
+from PIL import Image
 
-def verify_infrastructure_damage(image_file):
+# if < 30% of the pixels look like road, it is not a road
+ROAD_PIXEL_RATIO_MIN = 0.3
+# if road has enough cracks/edges it counts as damaged
+EDGE_DENSITY_MIN = 0.015
+# all checks run on a working image with at most this longest side,
+# so the cost (and the edge density scale) is the same for any photo size
+ANALYSIS_MAX_SIDE = 512
+
+
+def working_image(img):
+    """Shrink a decoded image so its longest side is at most ANALYSIS_MAX_SIDE."""
+    h, w = img.shape[:2]
+    scale = ANALYSIS_MAX_SIDE / float(max(h, w))
+    if scale >= 1.0:
+        return img
+    size = (max(int(round(w * scale)), 1), max(int(round(h * scale)), 1))
+    return cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+
+
+def load_working_image(image_file):
+    """
+    Decode a path or file object straight to a small RGB working image.
+
+    JPEGs are decoded at reduced scale by the decoder itself (PIL draft mode),
+    so a 12 MP photo is never expanded to full resolution, and the stream is
+    read by the decoder instead of copied into memory first.
+    Returns None if it is not a decodable image.
+    """
     try:
-        # 1. load image
-        file_bytes = np.frombuffer(image_file.read(), np.uint8)
-        img = cv2.imdecode(file_bytes, cv2.IMREAD_COLOR)
-        if img is None: return False, 0
+        with Image.open(image_file) as im:
+            im.draft("RGB", (ANALYSIS_MAX_SIDE, ANALYSIS_MAX_SIDE))
+            img = np.asarray(im.convert("RGB"))
+    except (OSError, ValueError):
+        return None
+    return working_image(img)
 
-        # 2. validation of road
-        # texture
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-        
-        # road will mostly be gray
-        lower_gray = np.array([0, 0, 50])
-        upper_gray = np.array([180, 50, 200])
-        mask = cv2.inRange(hsv, lower_gray, upper_gray)
-        road_pixel_ratio = np.sum(mask > 0) / mask.size
-
-        # if < 30% , road rejected
-        if road_pixel_ratio < 0.3:
-            print(f"REJECTED: Not a road. Road Pixel Ratio: {road_pixel_ratio:.2f}")
-            return False, 0
 
-        # 3. analyze the damage on road
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        blur = cv2.GaussianBlur(gray, (5, 5), 0)
-        edges = cv2.Canny(blur, 40, 120)
+def analyze_road_surface(img, rgb=False):
+    """
+    Road check on an already decoded image (BGR, or RGB with rgb=True).
+
+    Returns a dict with road_pixel_ratio, edge_density, confidence,
+    is_road and damaged.
+    """
+    img = working_image(img)
+
+    # 1. validation of road
+    # texture
+    hsv = cv2.cvtColor(img, cv2.COLOR_RGB2HSV if rgb else cv2.COLOR_BGR2HSV)
+
+    # road will mostly be gray
+    lower_gray = np.array([0, 0, 50])
+    upper_gray = np.array([180, 50, 200])
+    mask = cv2.inRange(hsv, lower_gray, upper_gray)
+    road_pixels = cv2.countNonZero(mask)
+    road_pixel_ratio = road_pixels / mask.size
+
+    result = {
+        "road_pixel_ratio": float(road_pixel_ratio),
+        "edge_density": 0.0,
+        "confidence": 0.0,
+        "is_road": bool(road_pixel_ratio >= ROAD_PIXEL_RATIO_MIN),
+        "damaged": False,
+    }
+    if not result["is_road"]:
+        return result
+
+    # 2. analyze the damage on road
+    gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY if rgb else cv2.COLOR_BGR2GRAY)
+    blur = cv2.GaussianBlur(gray, (5, 5), 0)
+    edges = cv2.Canny(blur, 40, 120)
+
+    # only focus on the road part for edges
+    road_edges = cv2.bitwise_and(edges, mask)
+    edge_density = cv2.countNonZero(road_edges) / road_pixels
+
+    # 3. Final Score
+    # Confidence score on how much messy texture on road
+    result["edge_density"] = float(edge_density)
+    result["confidence"] = float(min(edge_density * 15, 0.98))
+    result["damaged"] = bool(edge_density > EDGE_DENSITY_MIN)
+    return result
 
-        # only focus on the road part for edges
-        road_edges = cv2.bitwise_and(edges, mask)
-        edge_density = np.sum(road_edges > 0) / np.sum(mask > 0)
 
-        # 4. Final Score
-        # Confidence score on how much messy texture on road
-        confidence = min(edge_density * 15, 0.98)
+def verify_infrastructure_damage(image_file):
+    """Returns (damaged, confidence) for an image path or file object."""
+    try:
+        # load image
+        img = load_working_image(image_file)
+        if img is None: return False, 0
+
+        analysis = analyze_road_surface(img, rgb=True)
+        if not analysis["is_road"]:
+            print(f"REJECTED: Not a road. Road Pixel Ratio: {analysis['road_pixel_ratio']:.2f}")
+            return False, 0
 
-        # if road has enough cracks/edges then accept it
-        if edge_density > 0.015:
-            return True, confidence
-        else:
-            return False, confidence
+        return analysis["damaged"], analysis["confidence"]
 
     except Exception as e:
         print(f"AI Error: {e}")
         return False, 0
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_pool_worker():
+    # one OpenCV thread per process; the pool provides the parallelism
+    cv2.setNumThreads(1)
+
+
+def _get_pool(workers=None):
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=workers or os.cpu_count() or 1,
+                    initializer=_init_pool_worker
+                )
+    return _pool
+
+
+def _verify_source(source):
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    return verify_infrastructure_damage(source)
+
+
+def verify_infrastructure_damage_batch(sources, workers=None, chunksize=4):
+    """
+    verify_infrastructure_damage over many images on a process pool.
+
+    sources are paths or encoded bytes; file objects are read here since
+    they cannot be sent to another process. workers only sizes the pool
+    when it is first created. Returns one (damaged, confidence) per source,
+    in order.
+    """
+    sources = [s.read() if hasattr(s, "read") else s for s in sources]
+    if len(sources) <= 1:
+        return [_verify_source(s) for s in sources]
+    return list(_get_pool(workers).map(_verify_source, sources, chunksize=chunksize))
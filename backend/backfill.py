@@ -0,0 +1,318 @@
+"""
+Detection Backfill
+
+Re-runs detection over every complaint with an image, e.g. after new weights
+or thresholds. Complaint ids are streamed from the database in keyset order
+and cut into chunks; each chunk runs through run_all_batch (batched forward
+passes) in a pool of worker processes, and this process writes each chunk's
+results in one transaction.
+
+Complaints an admin already approved or rejected are skipped: saving a new
+run resets a complaint to an AI decision pending review, which would wipe the
+admin's verdict. Pass --include-reviewed to re-run those too, on purpose.
+
+Progress is checkpointed to a JSON file after every chunk: the highest id up
+to which every complaint has been written. An interrupted run (Ctrl-C, a
+crash, a dead worker) picks up from there when started again; use --restart
+to start over.
+
+Run from the project root:
+    python -m backend.backfill --processes 4
+    python -m backend.backfill --threshold 0.8 --restart
+    python -m backend.backfill --include-reviewed --restart
+"""
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+from backend import model, utils
+from backend.config import (
+    AI_BATCH_SIZE,
+    AI_INFERENCE_PROCESSES,
+    AI_INFERENCE_TORCH_THREADS,
+    BASE_DIR,
+)
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent.parent
+
+DEFAULT_CHECKPOINT = os.path.join(BASE_DIR, "database", "backfill_checkpoint.json")
+
+# Complaint ids read from the database per keyset page
+_PAGE_SIZE = 1000
+
+
+def _init_worker(threads: int) -> None:
+    """Pool initializer: thread settings first, then load the detectors once per process."""
+    from backend.ai.inference_pool import configure_process
+    configure_process(threads, None)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    from backend.ai.registry import get_registry
+    get_registry().get_all()
+
+
+def detect_chunk(complaints: List[Dict[str, Any]], confidence_threshold: float, batch_size: int,
+                 use_cache: bool) -> Tuple[List[Dict[str, Any]], List[int]]:
+    """
+    Run detection on a chunk of complaints (rows from get_complaints_with_images).
+
+    Returns:
+        (runs ready for model.save_ai_runs, ids of complaints whose image could not be processed)
+    """
+    from backend.ai.detector_manager import run_all_batch
+    from backend.worker import detection_boxes, detection_raw_output, format_ai_result_text
+
+    paths = [str(ROOT_DIR / utils.inference_image_path(c["image_path"])) for c in complaints]
+    outputs = run_all_batch(paths, confidence_threshold, batch_size=batch_size, use_cache=use_cache)
+
+    runs: List[Dict[str, Any]] = []
+    failed: List[int] = []
+    for complaint, (dets, final) in zip(complaints, outputs):
+        if final.get("error") and not dets:
+            # Missing image or no detectors: keep the complaint's earlier result
+            failed.append(complaint["id"])
+            continue
+        label = final.get("detected_type") or "unknown"
+        confidence = float(final.get("confidence", 0.0) or 0.0)
+        runs.append({
+            "complaint_id": complaint["id"],
+            # Same rows as the job worker stores: detectors that found something, then the decision
+            "detections": [
+                {
+                    "detected_type": d.get("detected_type"),
+                    "confidence": d.get("confidence", 0.0),
+                    "model_name": d.get("detector_name"),
+                    "model_version": d.get("model_version"),
+                    "latency_ms": d.get("latency_ms"),
+                }
+                for d in dets if d.get("detected_type") or d.get("confidence", 0.0) > 0
+            ],
+            "final": {
+                "detected_type": label if label != "unknown" else None,
+                "confidence": confidence if label != "unknown" else 0.0,
+                "model_name": final.get("detector_name"),
+                "model_version": final.get("model_version"),
+                "ai_result_text": format_ai_result_text(final),
+                "boxes": detection_boxes(dets),
+                "raw_output": detection_raw_output(dets),
+            },
+        })
+    return runs, failed
+
+
+def iter_chunks(after_id: int, chunk_size: int, limit: Optional[int] = None,
+                include_reviewed: bool = False) -> Iterator[List[Dict[str, Any]]]:
+    """Complaints with an image after `after_id`, in id order, `chunk_size` at a time."""
+    remaining = limit
+    chunk: List[Dict[str, Any]] = []
+    while remaining is None or remaining > 0:
+        page_size = _PAGE_SIZE if remaining is None else min(_PAGE_SIZE, remaining)
+        page = model.get_complaints_with_images(after_id, page_size, include_reviewed)
+        if not page:
+            break
+        after_id = page[-1]["id"]
+        if remaining is not None:
+            remaining -= len(page)
+        for row in page:
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def load_checkpoint(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_checkpoint(path: str, state: Dict[str, Any]) -> None:
+    """Write the checkpoint atomically, so an interruption never leaves a torn file."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".part"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(max(seconds, 0))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+
+class Progress:
+    """Throughput and ETA of the current session, logged at most every `interval` seconds."""
+
+    def __init__(self, total: int, interval: float = 10.0):
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.failed = 0
+        self.started = time.perf_counter()
+        self._last_report = self.started
+
+    def add(self, done: int, failed: int) -> None:
+        self.done += done
+        self.failed += failed
+        now = time.perf_counter()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            logger.info(self.line())
+
+    def line(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        processed = self.done + self.failed
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        pct = 100.0 * processed / self.total if self.total else 100.0
+        eta = format_duration((self.total - processed) / rate) if rate > 0 else "?"
+        return (f"{processed}/{self.total} complaints ({pct:.1f}%), {self.failed} failed, "
+                f"{rate:.2f} img/s, elapsed {format_duration(elapsed)}, ETA {eta}")
+
+
+def backfill(processes: int, chunk_size: int, batch_size: int, confidence_threshold: float, checkpoint: str,
+             restart: bool = False, limit: Optional[int] = None, use_cache: bool = True,
+             progress_interval: float = 10.0, include_reviewed: bool = False) -> int:
+    """
+    Re-run detection for every complaint with an image after the checkpoint,
+    leaving out those an admin decided on unless include_reviewed.
+
+    Returns:
+        Process exit code: 0 when everything was processed, 1 if a chunk
+        failed, 130 if interrupted (re-run to resume in both cases)
+    """
+    state = {} if restart else load_checkpoint(checkpoint)
+    if state.get("confidence_threshold", confidence_threshold) != confidence_threshold:
+        logger.warning(f"Resuming a backfill started with threshold {state['confidence_threshold']} "
+                       f"using {confidence_threshold}; pass --restart to re-score everything")
+    if state.get("include_reviewed", include_reviewed) != include_reviewed:
+        logger.warning(f"Resuming a backfill started with include_reviewed={state['include_reviewed']} "
+                       f"using {include_reviewed}; pass --restart to apply it from the first id")
+    state.setdefault("started_at", time.strftime("%Y-%m-%dT%H:%M:%S"))
+    state.setdefault("last_id", 0)
+    state.setdefault("processed", 0)
+    state.setdefault("failed_ids", [])
+    state["confidence_threshold"] = confidence_threshold
+    state["include_reviewed"] = include_reviewed
+
+    total = model.count_complaints_with_images(state["last_id"], include_reviewed)
+    if limit is not None:
+        total = min(total, limit)
+    logger.info(f"Backfilling {total} complaints after id {state['last_id']} "
+                f"({processes or 'no'} worker processes, chunks of {chunk_size})")
+    progress = Progress(total, progress_interval)
+
+    # Chunks in id order; the checkpoint advances over the completed prefix
+    in_flight: Deque[Tuple[int, Future]] = deque()
+
+    def commit_ready() -> None:
+        while in_flight and in_flight[0][1].done():
+            last_id, future = in_flight.popleft()
+            runs, failed = future.result()
+            model.save_ai_runs(runs)
+            state["last_id"] = last_id
+            state["processed"] += len(runs)
+            state["failed_ids"].extend(failed)
+            state["updated_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+            save_checkpoint(checkpoint, state)
+            progress.add(len(runs), len(failed))
+
+    executor = None
+    if processes > 0:
+        threads = AI_INFERENCE_TORCH_THREADS or max((os.cpu_count() or 1) // processes, 1)
+        executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(threads,)
+        )
+    code = 0
+    try:
+        for chunk in iter_chunks(state["last_id"], chunk_size, limit, include_reviewed):
+            last_id = chunk[-1]["id"]
+            if executor is None:
+                future: Future = Future()
+                future.set_result(detect_chunk(chunk, confidence_threshold, batch_size, use_cache))
+            else:
+                # Keep every worker busy with one chunk queued behind it, no more
+                while len(in_flight) >= 2 * processes:
+                    wait([f for _, f in in_flight], return_when=FIRST_COMPLETED)
+                    commit_ready()
+                future = executor.submit(detect_chunk, chunk, confidence_threshold, batch_size, use_cache)
+            in_flight.append((last_id, future))
+            commit_ready()
+        while in_flight:
+            wait([f for _, f in in_flight], return_when=FIRST_COMPLETED)
+            commit_ready()
+    except KeyboardInterrupt:
+        logger.warning(f"Interrupted; resume from id {state['last_id']} by running the backfill again")
+        code = 130
+    except Exception as e:
+        logger.error(f"Backfill stopped at id {state['last_id']}: {e}", exc_info=True)
+        code = 1
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=code == 0, cancel_futures=True)
+
+    logger.info(progress.line())
+    if state["failed_ids"]:
+        logger.warning(f"{len(state['failed_ids'])} complaints could not be processed; their ids are in {checkpoint}")
+    return code
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Re-run AI detection over all complaints with an image")
+    parser.add_argument("--processes", type=int, default=max(AI_INFERENCE_PROCESSES, 1),
+                        help="inference worker processes (0 = run in this process)")
+    parser.add_argument("--chunk-size", type=int, default=64, help="complaints per task sent to a worker")
+    parser.add_argument("--batch-size", type=int, default=AI_BATCH_SIZE, help="images per forward pass")
+    parser.add_argument("--threshold", type=float, default=0.9, help="confidence threshold for a detection")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="progress file used to resume")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the first id")
+    parser.add_argument("--limit", type=int, help="process at most this many complaints")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="run every model even if the result cache has the image (e.g. after code changes)")
+    parser.add_argument("--progress-interval", type=float, default=10.0, help="seconds between progress lines")
+    parser.add_argument("--include-reviewed", action="store_true",
+                        help="also re-run complaints an admin decided on (resets them to pending)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    model.init_db()
+    model.migrate_db()
+    return backfill(
+        processes=max(args.processes, 0),
+        chunk_size=max(args.chunk_size, 1),
+        batch_size=max(args.batch_size, 1),
+        confidence_threshold=args.threshold,
+        checkpoint=args.checkpoint,
+        restart=args.restart,
+        limit=args.limit,
+        use_cache=not args.no_cache,
+        progress_interval=args.progress_interval,
+        include_reviewed=args.include_reviewed
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""
+Database query benchmark.
+
+Builds a synthetic database with millions of detection rows, then times the
+complaint lookups the admin pages make on every view:
+
+    detail       get_complaint_with_ai_result, with the correlated-subquery
+                 form it replaced (legacy) and the current single lookup
+    user_list    get_user_complaints (a user's complaints, newest first)
+    admin_list   get_all_complaints' ordering, first 50 rows
+
+Each is timed before the indexes exist (the schema as it was) and again after
+model.migrate_db() has added them, and the legacy and current detail queries
+are checked to return the same rows.
+
+Run from the project root:
+    python -m backend.bench_db --complaints 500000 --detections 4
+    python -m backend.bench_db --db /tmp/bench.db --keep
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from backend import model
+
+# get_complaint_with_ai_result before the single-lookup rewrite
+LEGACY_DETAIL_QUERY = """
+    SELECT c.*,
+           (SELECT detected_type FROM ai_detections d WHERE d.complaint_id = c.id ORDER BY d.created_at DESC LIMIT 1) AS last_detected_type,
+           (SELECT confidence FROM ai_detections d WHERE d.complaint_id = c.id ORDER BY d.created_at DESC LIMIT 1) AS last_confidence,
+           (SELECT model_name FROM ai_detections d WHERE d.complaint_id = c.id ORDER BY d.created_at DESC LIMIT 1) AS last_model_name,
+           (SELECT model_version FROM ai_detections d WHERE d.complaint_id = c.id ORDER BY d.created_at DESC LIMIT 1) AS last_model_version,
+           (SELECT created_at FROM ai_detections d WHERE d.complaint_id = c.id ORDER BY d.created_at DESC LIMIT 1) AS last_detection_at
+      FROM complaints c
+     WHERE c.id = ?
+"""
+
+# Indexes migrate_db adds that the schema used to lack
+BENCH_INDEXES = ("idx_ai_detections_complaint_created", "idx_complaints_user_created", "idx_complaints_created")
+
+DETECTORS = ("GarbageDetector", "PotholeDetector", "WaterLeakageDetector")
+TYPES = ("garbage", "pothole", "water_leakage", None)
+
+
+def build_database(path: str, complaints: int, detections: float, users: int, seed: int = 0) -> Dict[str, Any]:
+    """
+    Create the schema at `path` without BENCH_INDEXES and fill it: `users`
+    users, `complaints` complaints spread over them and on average
+    `detections` ai_detections rows per complaint (per-detector rows plus a
+    final decision, with distinct created_at per complaint).
+    """
+    rng = random.Random(seed)
+    model.init_db()
+    conn = sqlite3.connect(path)
+    try:
+        for name in BENCH_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+        conn.execute("PRAGMA synchronous = OFF")
+        started = time.perf_counter()
+        conn.executemany(
+            "INSERT INTO users (id, name, email, password_hash) VALUES (?, ?, ?, 'x')",
+            ((u, f"user {u}", f"user{u}@example.com") for u in range(1, users + 1)),
+        )
+        base = 1_600_000_000
+
+        def complaint_rows():
+            for cid in range(1, complaints + 1):
+                t = base + cid * 60
+                yield (cid, rng.randint(1, users), rng.choice(TYPES[:3]), f"frontend/uploads/{cid}.jpg",
+                       time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(t)))
+
+        conn.executemany(
+            """INSERT INTO complaints (id, user_id, complaint_type, image_path, created_at, status)
+               VALUES (?, ?, ?, ?, ?, 'pending')""",
+            complaint_rows(),
+        )
+
+        def detection_rows():
+            for cid in range(1, complaints + 1):
+                t = base + cid * 60
+                for k in range(max(round(rng.expovariate(1.0 / detections)), 1)):
+                    yield (cid, rng.choice(TYPES), round(rng.random(), 4), rng.choice(DETECTORS), "v1",
+                           time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(t + k)))
+
+        conn.executemany(
+            """INSERT INTO ai_detections (complaint_id, detected_type, confidence, model_name, model_version,
+                                          created_at)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            detection_rows(),
+        )
+        conn.commit()
+        rows = conn.execute("SELECT COUNT(*) FROM ai_detections").fetchone()[0]
+    finally:
+        conn.close()
+    return {"build_s": round(time.perf_counter() - started, 2), "detection_rows": rows}
+
+
+def _time(fn: Callable[[int], Any], ids: List[int]) -> Dict[str, float]:
+    samples = []
+    for i in ids:
+        started = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - started) * 1e6)
+    samples.sort()
+    return {
+        "n": len(samples),
+        "mean_us": round(statistics.fmean(samples), 1),
+        "p50_us": round(samples[len(samples) // 2], 1),
+        "p95_us": round(samples[min(int(len(samples) * 0.95), len(samples) - 1)], 1),
+    }
+
+
+def _legacy_detail(complaint_id: int) -> Optional[Dict[str, Any]]:
+    conn = model.get_connection()
+    try:
+        row = conn.execute(LEGACY_DETAIL_QUERY, (complaint_id,)).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+
+def _admin_first_page(_: int) -> None:
+    conn = model.get_connection()
+    try:
+        conn.execute("SELECT * FROM complaints ORDER BY created_at DESC LIMIT 50").fetchall()
+    finally:
+        conn.close()
+
+
+def run_queries(complaints: int, users: int, lookups: int, slow_lookups: int, indexed: bool,
+                seed: int = 1) -> List[Tuple[str, Dict[str, float]]]:
+    rng = random.Random(seed)
+    # Unindexed lookups scan the whole detection table; a few samples are enough
+    n = lookups if indexed else slow_lookups
+    complaint_ids = [rng.randint(1, complaints) for _ in range(n)]
+    user_ids = [rng.randint(1, users) for _ in range(n)]
+    cases = [
+        ("detail legacy", _time(_legacy_detail, complaint_ids)),
+        ("detail", _time(model.get_complaint_with_ai_result, complaint_ids)),
+        ("user_list", _time(model.get_user_complaints, user_ids)),
+        ("admin_list", _time(_admin_first_page, complaint_ids[:max(n // 10, 1)])),
+    ]
+    return cases
+
+
+def check_parity(complaints: int, samples: int = 200, seed: int = 2) -> int:
+    """Number of sampled complaints where the legacy and current detail queries disagree."""
+    rng = random.Random(seed)
+    return sum(
+        1 for cid in (rng.randint(1, complaints) for _ in range(samples))
+        if _legacy_detail(cid) != model.get_complaint_with_ai_result(cid)
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark complaint queries on a large synthetic database")
+    parser.add_argument("--complaints", type=int, default=500000)
+    parser.add_argument("--detections", type=float, default=4.0, help="average ai_detections rows per complaint")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--lookups", type=int, default=2000, help="timed lookups per query with indexes")
+    parser.add_argument("--slow-lookups", type=int, default=10, help="timed lookups per query without indexes")
+    parser.add_argument("--db", help="database file to build (default: a temporary file)")
+    parser.add_argument("--keep", action="store_true", help="keep the database file afterwards")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    tmp_dir = None
+    path = args.db
+    if path is None:
+        tmp_dir = tempfile.mkdtemp(prefix="civiceye-bench-db-")
+        path = os.path.join(tmp_dir, "bench.db")
+    elif os.path.exists(path):
+        os.remove(path)
+    model.SQLITE_DB_PATH = path
+
+    results: Dict[str, Any] = {"complaints": args.complaints, "users": args.users}
+    try:
+        results.update(build_database(path, args.complaints, args.detections, args.users))
+        print(f"built {args.complaints} complaints, {results['detection_rows']} detections "
+              f"in {results['build_s']}s ({path})")
+
+        results["before"] = run_queries(args.complaints, args.users, args.lookups, args.slow_lookups, False)
+        started = time.perf_counter()
+        model.migrate_db()
+        results["migrate_s"] = round(time.perf_counter() - started, 2)
+        print(f"migrate_db (index build) took {results['migrate_s']}s")
+        results["after"] = run_queries(args.complaints, args.users, args.lookups, args.slow_lookups, True)
+        results["parity_mismatches"] = check_parity(args.complaints)
+        print(f"parity: {results['parity_mismatches']} mismatching detail rows out of 200")
+
+        baseline = dict(results["before"])
+        print(f"{'query':<15}{'indexes':>9}{'n':>7}{'mean us':>12}{'p50 us':>12}{'p95 us':>12}{'speedup':>10}")
+        for state in ("before", "after"):
+            for name, stats in results[state]:
+                speedup = baseline["detail legacy" if name.startswith("detail") else name]["mean_us"] / stats["mean_us"]
+                print(f"{name:<15}{'yes' if state == 'after' else 'no':>9}{stats['n']:>7}{stats['mean_us']:>12.1f}"
+                      f"{stats['p50_us']:>12.1f}{stats['p95_us']:>12.1f}{speedup:>9.1f}x")
+    finally:
+        model.close_connection()
+        if not args.keep:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            if tmp_dir:
+                os.rmdir(tmp_dir)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 1 if results.get("parity_mismatches") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
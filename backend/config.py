@@ -5,3 +5,93 @@ SQLITE_DB_PATH = os.path.join(BASE_DIR, "database", "civic_eye.db")
 UPLOAD_FOLDER = os.path.join(BASE_DIR, "frontend", "uploads")
 SECRET_KEY = os.environ.get("CIVICEYE_SECRET_KEY", "change-this-in-prod")
 POTHOLE_MODEL_PATH = os.environ.get("CIVICEYE_POTHOLE_MODEL")
+
+# Run a single YOLO forward pass per group of detectors sharing weights and thresholds
+AI_FUSED_INFERENCE = os.environ.get("CIVICEYE_AI_FUSED_INFERENCE", "1") == "1"
+
+# Run detectors concurrently on a bounded thread pool with a per-detector deadline (seconds, 0 = none)
+AI_PARALLEL_INFERENCE = os.environ.get("CIVICEYE_AI_PARALLEL_INFERENCE", "1") == "1"
+AI_MAX_WORKERS = int(os.environ.get("CIVICEYE_AI_MAX_WORKERS", "4"))
+AI_DETECTOR_TIMEOUT = float(os.environ.get("CIVICEYE_AI_DETECTOR_TIMEOUT", "30"))
+
+# Maximum images per forward pass for batched detection (run_all_batch)
+AI_BATCH_SIZE = int(os.environ.get("CIVICEYE_AI_BATCH_SIZE", "16"))
+
+# Merge concurrent single-image requests into batches (max images, max wait in ms)
+AI_MICROBATCH_ENABLED = os.environ.get("CIVICEYE_AI_MICROBATCH", "0") == "1"
+AI_MICROBATCH_MAX_SIZE = int(os.environ.get("CIVICEYE_AI_MICROBATCH_MAX_SIZE", "8"))
+AI_MICROBATCH_MAX_WAIT_MS = float(os.environ.get("CIVICEYE_AI_MICROBATCH_MAX_WAIT_MS", "10"))
+
+# Asynchronous AI detection: submissions enqueue an ai_jobs row that workers claim under a lease
+AI_ASYNC_JOBS = os.environ.get("CIVICEYE_AI_ASYNC_JOBS", "1") == "1"
+AI_EMBEDDED_WORKERS = int(os.environ.get("CIVICEYE_AI_EMBEDDED_WORKERS", "1"))
+AI_JOB_MAX_ATTEMPTS = int(os.environ.get("CIVICEYE_AI_JOB_MAX_ATTEMPTS", "3"))
+AI_JOB_LEASE_SECONDS = int(os.environ.get("CIVICEYE_AI_JOB_LEASE_SECONDS", "120"))
+AI_JOB_RETRY_DELAY = int(os.environ.get("CIVICEYE_AI_JOB_RETRY_DELAY", "30"))
+AI_JOB_POLL_INTERVAL = float(os.environ.get("CIVICEYE_AI_JOB_POLL_INTERVAL", "1.0"))
+
+# Persistent cache of detector results keyed by image hash, weights and config
+AI_RESULT_CACHE = os.environ.get("CIVICEYE_AI_RESULT_CACHE", "1") == "1"
+AI_RESULT_CACHE_PATH = os.environ.get("CIVICEYE_AI_RESULT_CACHE_PATH", os.path.join(BASE_DIR, "database", "ai_cache.db"))
+AI_RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("CIVICEYE_AI_RESULT_CACHE_MAX_ENTRIES", "20000"))
+AI_RESULT_CACHE_MAX_BYTES = int(os.environ.get("CIVICEYE_AI_RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Near-duplicate uploads: max Hamming distance between 64-bit dHashes to reuse an earlier AI result
+AI_DUPLICATE_DETECTION = os.environ.get("CIVICEYE_AI_DUPLICATE_DETECTION", "1") == "1"
+AI_DUPLICATE_MAX_DISTANCE = int(os.environ.get("CIVICEYE_AI_DUPLICATE_MAX_DISTANCE", "6"))
+
+# Decode each image once and share the pixels, downscaled to this longest side, with all detectors
+AI_DECODE_ONCE = os.environ.get("CIVICEYE_AI_DECODE_ONCE", "1") == "1"
+AI_INFERENCE_MAX_SIDE = int(os.environ.get("CIVICEYE_AI_INFERENCE_MAX_SIDE", "640"))
+
+# Staged detection: cheap OpenCV pre-filters, claimed complaint type first, stop at the first confident detector
+AI_CASCADE = os.environ.get("CIVICEYE_AI_CASCADE", "1") == "1"
+AI_CASCADE_MIN_STDDEV = float(os.environ.get("CIVICEYE_AI_CASCADE_MIN_STDDEV", "4.0"))
+
+# Video complaints: container extensions handled as video, and how frames are picked from them:
+# frames sampled per second ("rate"), or sampled frames kept only on scene change ("scene")
+VIDEO_EXTENSIONS = {"mp4", "mov", "avi", "mkv", "webm"}
+AI_VIDEO_SAMPLING = os.environ.get("CIVICEYE_AI_VIDEO_SAMPLING", "rate")
+AI_VIDEO_SAMPLE_FPS = float(os.environ.get("CIVICEYE_AI_VIDEO_SAMPLE_FPS", "1.0"))
+AI_VIDEO_SCENE_THRESHOLD = float(os.environ.get("CIVICEYE_AI_VIDEO_SCENE_THRESHOLD", "0.12"))
+AI_VIDEO_MAX_FRAMES = int(os.environ.get("CIVICEYE_AI_VIDEO_MAX_FRAMES", "120"))
+AI_VIDEO_TOP_K = int(os.environ.get("CIVICEYE_AI_VIDEO_TOP_K", "3"))
+
+# Load detectors and run a dummy inference in the background at startup; /readyz reports 503 until done
+AI_WARMUP = os.environ.get("CIVICEYE_AI_WARMUP", "1") == "1"
+
+# Watch detector model/config files and swap in a freshly built, warmed instance when they change
+AI_HOT_RELOAD = os.environ.get("CIVICEYE_AI_HOT_RELOAD", "1") == "1"
+AI_HOT_RELOAD_INTERVAL = float(os.environ.get("CIVICEYE_AI_HOT_RELOAD_INTERVAL", "5"))
+
+# Run detection in dedicated worker processes (0 = in the calling process), with
+# torch threads per worker (0 = CPUs / processes) and optional CPU pinning
+AI_INFERENCE_PROCESSES = int(os.environ.get("CIVICEYE_AI_INFERENCE_PROCESSES", "0"))
+AI_INFERENCE_TORCH_THREADS = int(os.environ.get("CIVICEYE_AI_INFERENCE_TORCH_THREADS", "0"))
+AI_INFERENCE_PIN_CPUS = os.environ.get("CIVICEYE_AI_INFERENCE_PIN_CPUS", "0") == "1"
+AI_INFERENCE_START_TIMEOUT = float(os.environ.get("CIVICEYE_AI_INFERENCE_START_TIMEOUT", "120"))
+
+# Requests slower than this are logged with their per-stage timings
+SLOW_REQUEST_MS = float(os.environ.get("CIVICEYE_SLOW_REQUEST_MS", "1000"))
+
+# Upload ingest: largest accepted image/video (bytes), decompression-bomb guard (decoded pixels), and the
+# longest side of the upright inference derivative and thumbnail stored next to each original image
+UPLOAD_MAX_BYTES = int(os.environ.get("CIVICEYE_UPLOAD_MAX_BYTES", str(25 * 1024 * 1024)))
+UPLOAD_MAX_VIDEO_BYTES = int(os.environ.get("CIVICEYE_UPLOAD_MAX_VIDEO_BYTES", str(200 * 1024 * 1024)))
+UPLOAD_MAX_PIXELS = int(os.environ.get("CIVICEYE_UPLOAD_MAX_PIXELS", "50000000"))
+UPLOAD_DERIVATIVE_SIDE = int(os.environ.get("CIVICEYE_UPLOAD_DERIVATIVE_SIDE", str(max(AI_INFERENCE_MAX_SIDE, 1280))))
+UPLOAD_THUMBNAIL_SIDE = int(os.environ.get("CIVICEYE_UPLOAD_THUMBNAIL_SIDE", "320"))
+
+# Thumbnails and detection overlays generated on first request, kept in a size-bounded LRU disk cache
+DERIVATIVE_CACHE_DIR = os.environ.get("CIVICEYE_DERIVATIVE_CACHE_DIR", os.path.join(BASE_DIR, "database", "derivatives"))
+DERIVATIVE_CACHE_MAX_BYTES = int(os.environ.get("CIVICEYE_DERIVATIVE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# SQLite connections (one reused per thread, see model.get_connection): write-ahead logging so readers never
+# block the writer, synchronous level, lock wait (ms), page cache (KiB), memory-mapped I/O (bytes) and the
+# number of prepared statements kept per connection
+SQLITE_WAL = os.environ.get("CIVICEYE_SQLITE_WAL", "1") == "1"
+SQLITE_SYNCHRONOUS = os.environ.get("CIVICEYE_SQLITE_SYNCHRONOUS", "NORMAL").upper()
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("CIVICEYE_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.environ.get("CIVICEYE_SQLITE_CACHE_SIZE_KB", "16384"))
+SQLITE_MMAP_SIZE = int(os.environ.get("CIVICEYE_SQLITE_MMAP_SIZE", str(128 * 1024 * 1024)))
+SQLITE_STATEMENT_CACHE = int(os.environ.get("CIVICEYE_SQLITE_STATEMENT_CACHE", "256"))
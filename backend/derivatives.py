@@ -0,0 +1,308 @@
+"""
+Image Derivatives
+
+Thumbnails and detection overlays (the image with each detector's stored
+boxes drawn on it) for the admin pages, generated on first request and kept
+in an on-disk cache. Cache entries are named after everything they depend
+on (source file version, size and, for overlays, the detection row), so a
+new upload or detection run gets a new name and a new URL instead of
+invalidating anything; old entries fall out under size-bounded LRU eviction.
+Because a name never changes content, versioned URLs can be cached by the
+browser forever.
+"""
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import logging
+import os
+import threading
+import uuid
+
+from backend import utils
+from backend.config import (
+    BASE_DIR,
+    DERIVATIVE_CACHE_DIR,
+    DERIVATIVE_CACHE_MAX_BYTES,
+    UPLOAD_DERIVATIVE_SIDE,
+    UPLOAD_THUMBNAIL_SIDE,
+    VIDEO_EXTENSIONS,
+)
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("thumbnail", "overlay")
+
+# Requested sizes are rounded up to one of these, so the cache holds few variants per image
+SIZES = (80, 160, 320, 640, 1280, 1920)
+
+# Box colours (RGB) per detector; others are drawn in red
+DETECTOR_COLORS: Dict[str, Tuple[int, int, int]] = {
+    "GarbageDetector": (46, 204, 113),
+    "PotholeDetector": (230, 126, 34),
+    "WaterLeakageDetector": (52, 152, 219),
+}
+_DEFAULT_COLOR = (231, 76, 60)
+
+
+class Derivative:
+    """
+    A generated image ready to serve.
+
+    Attributes:
+        path: File to send
+        etag: Version of the content; also the `v` query parameter of its URL
+    """
+
+    __slots__ = ("path", "etag")
+
+    def __init__(self, path: Path, etag: str):
+        self.path = path
+        self.etag = etag
+
+
+class DerivativeCache:
+    """
+    Directory of generated JPEGs, evicted least recently used first once their
+    total size exceeds max_bytes.
+
+    Recency is kept in memory and mirrored in file mtimes, so it survives
+    restarts. Processes sharing the directory each track their own index; a
+    file another process evicted is simply treated as a miss.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._entries: Optional["OrderedDict[str, int]"] = None
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _index(self) -> "OrderedDict[str, int]":
+        """Entries (name -> size) from least to most recently used; scanned from disk on first use."""
+        if self._entries is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            found = []
+            for path in self.root.glob("*.jpg"):
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue
+                found.append((st.st_mtime, path.name, st.st_size))
+            found.sort()
+            self._entries = OrderedDict((name, size) for _, name, size in found)
+            self._bytes = sum(self._entries.values())
+        return self._entries
+
+    def get(self, name: str) -> Optional[Path]:
+        with self._lock:
+            entries = self._index()
+            if name not in entries:
+                self.misses += 1
+                return None
+            entries.move_to_end(name)
+        path = self.root / name
+        try:
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._bytes -= self._index().pop(name, 0)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def put(self, name: str, data: bytes) -> Path:
+        """Store data under name (atomically) and evict old entries if over budget."""
+        with self._lock:
+            self._index()
+        path = self.root / name
+        tmp_path = self.root / f"{name}.{uuid.uuid4().hex}.part"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        evicted: List[str] = []
+        with self._lock:
+            entries = self._index()
+            self._bytes += len(data) - entries.pop(name, 0)
+            entries[name] = len(data)
+            # Never evict the entry just written
+            while self._bytes > self.max_bytes and len(entries) > 1:
+                old, size = entries.popitem(last=False)
+                self._bytes -= size
+                self.evictions += 1
+                evicted.append(old)
+        for old in evicted:
+            try:
+                (self.root / old).unlink()
+            except OSError:
+                pass
+        return path
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = len(self._entries) if self._entries is not None else None
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "bytes": self._bytes if self._entries is not None else None,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+_cache: Optional[DerivativeCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> DerivativeCache:
+    """The process-wide DerivativeCache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DerivativeCache(DERIVATIVE_CACHE_DIR, DERIVATIVE_CACHE_MAX_BYTES)
+        return _cache
+
+
+def snap_size(size: Optional[int], default: int) -> int:
+    """The smallest of SIZES that covers `size` (or `default`), capped at the largest."""
+    wanted = size if size and size > 0 else default
+    for candidate in SIZES:
+        if candidate >= wanted:
+            return candidate
+    return SIZES[-1]
+
+
+def _default_size(kind: str) -> int:
+    return UPLOAD_THUMBNAIL_SIDE if kind == "thumbnail" else UPLOAD_DERIVATIVE_SIDE
+
+
+def _is_video(image_path: str) -> bool:
+    return image_path.rsplit(".", 1)[-1].lower() in VIDEO_EXTENSIONS
+
+
+def _source(kind: str, image_path: str, size: int) -> str:
+    """
+    Relative path of the file a derivative is drawn from. Overlays use the
+    file detection ran on, so the stored boxes line up with it; thumbnails use
+    the inference derivative when it is large enough, as it is much cheaper
+    to decode than the original.
+    """
+    if kind == "overlay" or (not _is_video(image_path) and size <= UPLOAD_DERIVATIVE_SIDE):
+        return utils.inference_image_path(image_path)
+    return image_path
+
+
+def _version(kind: str, source: str, size: int, detection: Optional[Tuple[int, Any]]) -> Optional[str]:
+    """Name of the derivative's current content, or None if its source is missing."""
+    try:
+        st = os.stat(os.path.join(BASE_DIR, source))
+    except OSError:
+        return None
+    parts = [kind, source, f"{st.st_mtime_ns:x}", f"{st.st_size:x}", str(size)]
+    if kind == "overlay":
+        parts.append(str(detection[0]) if detection else "-")
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:20]
+
+
+def media_url(complaint_id: int, kind: str, image_path: Optional[str], size: Optional[int] = None,
+              detection: Optional[Tuple[int, Any]] = None) -> Optional[str]:
+    """
+    Versioned URL of a complaint's derivative, or None if it has no usable image.
+    Only stats the source file; nothing is generated until the URL is requested.
+    """
+    if not image_path or (kind == "overlay" and _is_video(image_path)):
+        return None
+    snapped = snap_size(size, _default_size(kind))
+    version = _version(kind, _source(kind, image_path, snapped), snapped, detection)
+    if version is None:
+        return None
+    query = f"size={snapped}&v={version}" if size else f"v={version}"
+    return f"/media/complaints/{int(complaint_id)}/{kind}?{query}"
+
+
+def _render_thumbnail(source: str, size: int) -> Optional[bytes]:
+    abs_path = os.path.join(BASE_DIR, source)
+    if _is_video(source):
+        frame = utils.first_video_frame(abs_path)
+        return utils.frame_thumbnail(frame, size) if frame is not None else None
+    img, _ = utils.load_upright(abs_path, size)
+    return utils.encode_jpeg(img, 80)
+
+
+def _render_overlay(source: str, size: int, detectors: Dict[str, Any]) -> bytes:
+    from PIL import ImageDraw, ImageFont
+
+    img, (width, _) = utils.load_upright(os.path.join(BASE_DIR, source), size)
+    scale = img.width / float(width)
+    draw = ImageDraw.Draw(img)
+    font = ImageFont.load_default()
+    line = max(img.width // 400, 2)
+    for name, det in sorted(detectors.items()):
+        color = DETECTOR_COLORS.get(name, _DEFAULT_COLOR)
+        label = (det.get("detected_type") or name.replace("Detector", "")).replace("_", " ")
+        for box in det.get("boxes") or []:
+            x1, y1, x2, y2 = (float(v) * scale for v in box[:4])
+            draw.rectangle([x1, y1, x2, y2], outline=color, width=line)
+            text_w, text_h = draw.textbbox((0, 0), label, font=font)[2:]
+            top = max(y1 - text_h - 2 * line, 0)
+            draw.rectangle([x1, top, x1 + text_w + 2 * line, top + text_h + 2 * line], fill=color)
+            draw.text((x1 + line, top + line), label, fill=(255, 255, 255), font=font)
+    return utils.encode_jpeg(img, 85)
+
+
+def get_derivative(complaint_id: int, kind: str, image_path: str, size: Optional[int] = None,
+                   detection: Optional[Tuple[int, Any]] = None) -> Optional[Derivative]:
+    """
+    The requested derivative, generated and cached if needed.
+
+    Args:
+        complaint_id: Complaint the image belongs to
+        kind: "thumbnail" or "overlay"
+        image_path: The complaint's image_path
+        size: Longest side wanted, rounded up to one of SIZES
+        detection: (row id, per-detector boxes) of the latest stored detection, for overlays
+
+    Returns:
+        The derivative, or None if the source image is missing or cannot be decoded
+    """
+    if kind not in KINDS:
+        raise ValueError(f"unknown derivative kind: {kind}")
+    if kind == "overlay" and _is_video(image_path):
+        return None
+    size = snap_size(size, _default_size(kind))
+    source = _source(kind, image_path, size)
+    version = _version(kind, source, size, detection)
+    if version is None:
+        return None
+
+    # The thumbnail stored at upload already is the default thumbnail
+    if kind == "thumbnail" and size == UPLOAD_THUMBNAIL_SIDE:
+        stored = utils.existing_derivative(image_path, "thumbnail")
+        if stored:
+            return Derivative(Path(BASE_DIR) / stored, version)
+
+    cache = get_cache()
+    name = f"{int(complaint_id)}-{kind}-{version}.jpg"
+    path = cache.get(name)
+    if path is not None:
+        return Derivative(path, version)
+    try:
+        if kind == "thumbnail":
+            data = _render_thumbnail(source, size)
+        else:
+            data = _render_overlay(source, size, detection[1] if detection else {})
+    except Exception as e:
+        logger.warning(f"Could not render {kind} of complaint {complaint_id} from {source}: {e}")
+        return None
+    if not data:
+        return None
+    return Derivative(cache.put(name, data), version)
@@ -0,0 +1,185 @@
+"""
+Near-duplicate complaint images
+
+Keeps a multi-index hash table over the 64-bit perceptual hashes of original
+(non-duplicate) complaint images so a new upload can be matched against every
+earlier one by Hamming distance without a table scan.
+"""
+from typing import Dict, List, Optional, Tuple
+import logging
+import threading
+
+from backend import model
+from backend.config import AI_DUPLICATE_MAX_DISTANCE
+
+logger = logging.getLogger(__name__)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class MultiIndexHash:
+    """
+    Multi-index hashing over 64-bit hashes under Hamming distance.
+
+    The hash is split into max_distance + 1 disjoint bit ranges with one
+    exact-match table per range. By the pigeonhole principle any hash within
+    max_distance agrees exactly with the query on at least one range, so only
+    the few entries sharing a bucket need a full distance check.
+    """
+
+    def __init__(self, max_distance: int):
+        self.max_distance = max(int(max_distance), 0)
+        chunks = self.max_distance + 1
+        self._spans: List[Tuple[int, int]] = []
+        offset = 0
+        for i in range(chunks):
+            width = 64 // chunks + (1 if i < 64 % chunks else 0)
+            self._spans.append((offset, (1 << width) - 1))
+            offset += width
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in self._spans]
+        self._hashes: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def add(self, value: int, complaint_id: int) -> None:
+        if complaint_id in self._hashes:
+            return
+        self._hashes[complaint_id] = value
+        for table, (offset, mask) in zip(self._tables, self._spans):
+            table.setdefault((value >> offset) & mask, []).append(complaint_id)
+
+    def discard(self, complaint_id: int) -> None:
+        value = self._hashes.pop(complaint_id, None)
+        if value is None:
+            return
+        for table, (offset, mask) in zip(self._tables, self._spans):
+            bucket = table.get((value >> offset) & mask)
+            if bucket and complaint_id in bucket:
+                bucket.remove(complaint_id)
+
+    def search(self, value: int) -> List[Tuple[int, int]]:
+        """Return (distance, complaint_id) for every entry within max_distance, closest first."""
+        seen = set()
+        found = []
+        for table, (offset, mask) in zip(self._tables, self._spans):
+            for complaint_id in table.get((value >> offset) & mask, ()):
+                if complaint_id in seen:
+                    continue
+                seen.add(complaint_id)
+                d = hamming(value, self._hashes[complaint_id])
+                if d <= self.max_distance:
+                    found.append((d, complaint_id))
+        found.sort()
+        return found
+
+
+class DuplicateIndex:
+    """
+    Process-wide index of complaint image hashes, loaded from the database on
+    first use and topped up with complaints added since (by any process)
+    before every lookup.
+    """
+
+    def __init__(self, max_distance: int = AI_DUPLICATE_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self._table: Optional[MultiIndexHash] = None
+        self._loaded_through = 0
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> MultiIndexHash:
+        """Load hashes of complaints newer than the last one loaded. Call with the lock held."""
+        first_load = self._table is None
+        if first_load:
+            self._table = MultiIndexHash(self.max_distance)
+            self._loaded_through = 0
+        for complaint_id, phash in model.get_original_image_phashes(self._loaded_through):
+            self._loaded_through = complaint_id
+            try:
+                self._table.add(int(phash, 16), complaint_id)
+            except (TypeError, ValueError):
+                continue
+        if first_load:
+            logger.info(f"Duplicate index loaded with {len(self._table)} image hashes")
+        return self._table
+
+    def find_or_add(self, complaint_id: int, phash: str) -> Optional[Tuple[int, int]]:
+        """
+        Closest earlier complaint within max_distance as (complaint_id, distance);
+        if there is none, the complaint is added to the index as an original.
+
+        Only complaints with a lower id count as matches, so two near-identical
+        uploads handled at the same time, in one process or several, settle on
+        the same original instead of both becoming originals or duplicates of
+        each other.
+        """
+        value = int(phash, 16)
+        with self._lock:
+            table = self._refresh()
+            for distance, other_id in table.search(value):
+                if other_id < complaint_id:
+                    # The refresh may already have loaded this complaint as an original
+                    table.discard(complaint_id)
+                    return other_id, distance
+            table.add(value, complaint_id)
+        return None
+
+    def reset(self) -> None:
+        with self._lock:
+            self._table = None
+
+
+_index: Optional[DuplicateIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> DuplicateIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = DuplicateIndex()
+    return _index
+
+
+def reuse_duplicate_result(complaint_id: int, image_phash: Optional[str]) -> Dict[str, Optional[int]]:
+    """
+    Link a new complaint to an earlier near-duplicate and copy its AI result.
+
+    Returns:
+        {"duplicate_of": original id or None, "reused": 1 if the AI result was copied else 0}
+    """
+    result: Dict[str, Optional[int]] = {"duplicate_of": None, "reused": 0}
+    if not image_phash:
+        return result
+
+    match = get_index().find_or_add(complaint_id, image_phash)
+    if match is None:
+        return result
+
+    original_id, distance = match
+    original = model.get_complaint_with_ai_result(original_id)
+    if original and original.get("duplicate_of"):
+        # Linked as a duplicate by another process after this one indexed it
+        original_id = original["duplicate_of"]
+        original = model.get_complaint_with_ai_result(original_id)
+    logger.info(f"Complaint {complaint_id} is a near-duplicate of {original_id} (distance {distance})")
+    model.link_duplicate_complaint(complaint_id, original_id)
+    result["duplicate_of"] = original_id
+
+    if original and original.get("ai_result") and original.get("ai_confidence") is not None:
+        output = model.get_latest_detection_output(original_id) or {}
+        model.save_ai_detection(
+            complaint_id,
+            original.get("ai_detected_type"),
+            original.get("ai_confidence"),
+            original.get("ai_model_name"),
+            f"{original['ai_result']} (reused from CIVIC-{original_id})",
+            original.get("last_model_version"),
+            boxes=output.get("boxes"),
+            raw_output=output.get("raw_output"),
+        )
+        result["reused"] = 1
+    return result
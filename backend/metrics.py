@@ -0,0 +1,240 @@
+"""
+Metrics
+
+Process-wide counters, gauges and latency histograms rendered in the
+Prometheus text format for the /metrics endpoint, plus per-request stage
+timing. Code on the hot path wraps a stage in timed("name"); the duration
+goes into the stage histogram and, when a trace is active for the current
+request or job, into that trace so it can be logged, returned in a
+Server-Timing header or stored with the detection.
+
+Rendering only reports AI statistics for modules that are already
+imported, so scraping never loads the ML stack.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import logging
+import math
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers a fast cache hit up to a slow CPU inference on a large photo
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}{_labels(self.label_names, k)} {_number(v)}" for k, v in sorted(values.items())]
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observed values (seconds), with optional labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # Per label set: [count per bucket..., count in +Inf only], sum
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.label_names)
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            counts[index] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            counts = {k: list(v) for k, v in self._counts.items()}
+            sums = dict(self._sums)
+        lines = []
+        for key in sorted(counts):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts[key]):
+                cumulative += n
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(sums[key])}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "civiceye_stage_seconds", "Time spent in each stage of request handling and detection", ["stage"]
+)
+DETECTOR_SECONDS = Histogram(
+    "civiceye_detector_seconds", "Inference time per detector per image (shared passes count for each member)",
+    ["detector"]
+)
+DETECTOR_ERRORS = Counter(
+    "civiceye_detector_errors_total", "Detector runs that failed or missed their deadline", ["detector", "kind"]
+)
+HTTP_SECONDS = Histogram(
+    "civiceye_http_request_seconds", "HTTP request latency by endpoint", ["endpoint", "method", "status"]
+)
+
+_METRICS: List[Any] = [STAGE_SECONDS, DETECTOR_SECONDS, DETECTOR_ERRORS, HTTP_SECONDS]
+
+_trace: ContextVar[Optional[Dict[str, float]]] = ContextVar("civiceye_trace", default=None)
+
+
+def begin_trace() -> Any:
+    """Start collecting stage timings for the current request or job. Returns a token for end_trace()."""
+    return _trace.set({})
+
+
+def end_trace(token: Any) -> Dict[str, float]:
+    """Stop the trace started with `token` and return its stage timings in milliseconds."""
+    trace = _trace.get() or {}
+    _trace.reset(token)
+    return trace
+
+
+def current_trace() -> Optional[Dict[str, float]]:
+    return _trace.get()
+
+
+@contextmanager
+def timed(stage: str, timings: Optional[Dict[str, float]] = None) -> Iterator[None]:
+    """
+    Time a block as `stage`: observed in civiceye_stage_seconds and added (in
+    ms) to `timings` and to the active trace, if any.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        ms = elapsed * 1000
+        for target in (timings, _trace.get()):
+            if target is not None:
+                target[stage] = round(target.get(stage, 0.0) + ms, 3)
+
+
+def server_timing(timings: Dict[str, float]) -> str:
+    """Format stage timings as a Server-Timing header value."""
+    return ", ".join(f"{stage.replace('.', '-')};dur={ms:.1f}" for stage, ms in timings.items())
+
+
+def _gauge(name: str, help: str, values: Dict[LabelValues, float], label_names: Sequence[str] = (),
+           kind: str = "gauge") -> List[str]:
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    lines.extend(f"{name}{_labels(label_names, k)} {_number(v)}" for k, v in sorted(values.items()))
+    return lines
+
+
+def _collect_runtime() -> List[str]:
+    """Queue depths, cache and cascade statistics, read at scrape time."""
+    lines: List[str] = []
+    try:
+        from backend import model
+        jobs = model.count_ai_jobs_by_status()
+        lines += _gauge("civiceye_ai_jobs", "AI jobs in the durable queue by status",
+                        {(s,): jobs.get(s, 0) for s in ("queued", "running", "done", "failed")}, ["status"])
+    except Exception as e:
+        logger.warning(f"Could not count AI jobs for metrics: {e}")
+
+    batcher = sys.modules.get("backend.ai.batcher")
+    if batcher is not None and batcher.AI_MICROBATCH_ENABLED:
+        stats = batcher.get_batcher().stats()
+        lines += _gauge("civiceye_microbatch_queue_depth", "Requests waiting in the micro-batcher",
+                        {(): stats["queue_depth"]})
+
+    pool = sys.modules.get("backend.ai.inference_pool")
+    if pool is not None and pool._pool is not None:
+        stats = pool._pool.stats()
+        lines += _gauge("civiceye_inference_pool_inflight", "Requests in flight per inference worker process",
+                        {(str(w["index"]),): w["inflight"] for w in stats["workers"]}, ["worker"])
+        lines += _gauge("civiceye_inference_pool_restarts_total", "Inference worker processes replaced after dying",
+                        {(): stats["restarts"]}, kind="counter")
+
+    media = sys.modules.get("backend.derivatives")
+    if media is not None and media._cache is not None:
+        stats = media._cache.stats()
+        lines += _gauge("civiceye_derivative_cache_lookups_total", "Thumbnail/overlay cache lookups",
+                        {("hit",): stats["hits"], ("miss",): stats["misses"]}, ["result"], kind="counter")
+        if stats["bytes"] is not None:
+            lines += _gauge("civiceye_derivative_cache_bytes", "Size of the thumbnail/overlay cache",
+                            {(): stats["bytes"]})
+
+    manager = sys.modules.get("backend.ai.detector_manager")
+    if manager is not None:
+        cache = manager.result_cache_stats()
+        if cache.get("enabled"):
+            lines += _gauge("civiceye_result_cache_lookups_total", "Detection result cache lookups",
+                            {("hit",): cache["hits"], ("miss",): cache["misses"]}, ["result"], kind="counter")
+            lines += _gauge("civiceye_result_cache_hit_ratio", "Share of result cache lookups that hit",
+                            {(): cache["hit_rate"]})
+            if cache.get("entries") is not None:
+                lines += _gauge("civiceye_result_cache_entries", "Entries in the detection result cache",
+                                {(): cache["entries"]})
+        cascade = manager.cascade_stats()
+        lines += _gauge("civiceye_cascade_exits_total", "Cascaded runs by the stage they stopped at",
+                        {(stage,): n for stage, n in cascade["exits"].items()}, ["stage"], kind="counter")
+    return lines
+
+
+def render() -> str:
+    """Every metric in the Prometheus text exposition format (version 0.0.4)."""
+    lines: List[str] = []
+    for metric in _METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    lines.extend(_collect_runtime())
+    return "\n".join(lines) + "\n"
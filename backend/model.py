@@ -1,14 +1,109 @@
+import json
 import os
 import sqlite3
-from typing import Optional, List, Dict, Any
-from backend.config import SQLITE_DB_PATH
+import threading
+from typing import Optional, List, Dict, Any, Tuple
+from backend.config import (
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_CACHE_SIZE_KB,
+    SQLITE_DB_PATH,
+    SQLITE_MMAP_SIZE,
+    SQLITE_STATEMENT_CACHE,
+    SQLITE_SYNCHRONOUS,
+    SQLITE_WAL,
+)
+from backend.metrics import timed
 
-def get_connection() -> sqlite3.Connection:
-    conn = sqlite3.connect(SQLITE_DB_PATH)
+_SYNCHRONOUS_LEVELS = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+_local = threading.local()
+
+class _ReusedConnection(sqlite3.Connection):
+    """
+    A thread's shared connection. close() only releases it: the connection
+    stays open for the thread's next get_connection(), and once the last
+    holder releases it a transaction left open is rolled back, as closing
+    would have done. dispose() really closes it.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.db_path: Optional[str] = None
+        self.pid = os.getpid()
+        self.holders = 0
+
+    def close(self) -> None:
+        self.holders = max(self.holders - 1, 0)
+        if self.holders == 0:
+            self.release()
+
+    def release(self) -> None:
+        """Drop every hold, rolling back whatever a holder left uncommitted."""
+        self.holders = 0
+        if self.in_transaction:
+            self.rollback()
+
+    def dispose(self) -> None:
+        sqlite3.Connection.close(self)
+
+def _connect(path: str) -> _ReusedConnection:
+    conn = sqlite3.connect(
+        path,
+        timeout=SQLITE_BUSY_TIMEOUT_MS / 1000.0,
+        factory=_ReusedConnection,
+        cached_statements=SQLITE_STATEMENT_CACHE,
+    )
+    conn.db_path = path
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute(f"PRAGMA busy_timeout = {int(SQLITE_BUSY_TIMEOUT_MS)}")
+    if SQLITE_WAL:
+        # Persistent for the database file; readers and the writer no longer block each other
+        conn.execute("PRAGMA journal_mode = WAL")
+    synchronous = SQLITE_SYNCHRONOUS if SQLITE_SYNCHRONOUS in _SYNCHRONOUS_LEVELS else "NORMAL"
+    conn.execute(f"PRAGMA synchronous = {synchronous}")
+    # Negative cache_size is in KiB rather than pages
+    conn.execute(f"PRAGMA cache_size = {-int(SQLITE_CACHE_SIZE_KB)}")
+    conn.execute(f"PRAGMA mmap_size = {int(SQLITE_MMAP_SIZE)}")
+    conn.execute("PRAGMA temp_store = MEMORY")
     return conn
 
+def get_connection() -> sqlite3.Connection:
+    """
+    The calling thread's connection to SQLITE_DB_PATH, opened and tuned on
+    first use and reused afterwards, so its prepared statement cache carries
+    over between calls. Callers close() it when done as before, which only
+    releases it (see _ReusedConnection). A connection opened before a fork
+    or for another database path is replaced.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None and (conn.pid != os.getpid() or conn.db_path != SQLITE_DB_PATH):
+        if conn.pid == os.getpid():
+            conn.dispose()
+        conn = None
+    if conn is None:
+        conn = _connect(SQLITE_DB_PATH)
+        _local.conn = conn
+    conn.holders += 1
+    return conn
+
+def release_connection() -> None:
+    """
+    Release the calling thread's connection at the end of a request or job,
+    rolling back anything left uncommitted. It stays open for the thread's
+    next use.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None and conn.pid == os.getpid():
+        conn.release()
+
+def close_connection() -> None:
+    """Close the calling thread's connection, e.g. before the thread exits."""
+    conn = getattr(_local, "conn", None)
+    _local.conn = None
+    if conn is not None and conn.pid == os.getpid():
+        conn.dispose()
+
 def init_db(schema_path: Optional[str] = None) -> None:
     path = schema_path or os.path.join(os.path.dirname(os.path.abspath(os.path.join(__file__, ".."))), "database", "schema.sql")
     with open(path, "r", encoding="utf-8") as f:
@@ -30,7 +125,10 @@ def migrate_db() -> None:
     Migration-safe upgrades:
     - Add AI decision fields to complaints
     - Create ai_detections table (if not exists)
+    - Create ai_jobs table (if not exists)
     - Ensure complaint_type column exists
+    - Add perceptual hash / duplicate link columns to complaints
+    - Add model_version, latency_ms, stage_timings, boxes and raw_output to ai_detections
     """
     conn = get_connection()
     try:
@@ -61,6 +159,14 @@ def migrate_db() -> None:
             conn.execute("ALTER TABLE complaints ADD COLUMN ai_label TEXT")
         if not _column_exists(conn, "complaints", "ai_reviewed_at"):
             conn.execute("ALTER TABLE complaints ADD COLUMN ai_reviewed_at TIMESTAMP")
+        if not _column_exists(conn, "complaints", "image_phash"):
+            conn.execute("ALTER TABLE complaints ADD COLUMN image_phash TEXT")
+        if not _column_exists(conn, "complaints", "duplicate_of"):
+            conn.execute("ALTER TABLE complaints ADD COLUMN duplicate_of INTEGER REFERENCES complaints(id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_complaints_image_phash ON complaints(image_phash)")
+        # Per-user and admin complaint lists, newest first
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_complaints_user_created ON complaints(user_id, created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_complaints_created ON complaints(created_at)")
 
         # Create ai_detections table
         conn.execute(
@@ -71,12 +177,59 @@ def migrate_db() -> None:
                 detected_type TEXT,
                 confidence REAL,
                 model_name TEXT,
+                model_version TEXT,
+                latency_ms REAL,
+                stage_timings TEXT,
+                boxes TEXT,
+                raw_output BLOB,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY(complaint_id) REFERENCES complaints(id) ON DELETE CASCADE
             )
             """
         )
+        if not _column_exists(conn, "ai_detections", "model_version"):
+            conn.execute("ALTER TABLE ai_detections ADD COLUMN model_version TEXT")
+        if not _column_exists(conn, "ai_detections", "latency_ms"):
+            conn.execute("ALTER TABLE ai_detections ADD COLUMN latency_ms REAL")
+        if not _column_exists(conn, "ai_detections", "stage_timings"):
+            conn.execute("ALTER TABLE ai_detections ADD COLUMN stage_timings TEXT")
+        if not _column_exists(conn, "ai_detections", "boxes"):
+            conn.execute("ALTER TABLE ai_detections ADD COLUMN boxes TEXT")
+        if not _column_exists(conn, "ai_detections", "raw_output"):
+            conn.execute("ALTER TABLE ai_detections ADD COLUMN raw_output BLOB")
+        # Latest detection of a complaint is one backward step in this index (rowid breaks created_at ties)
+        conn.execute("DROP INDEX IF EXISTS idx_ai_detections_complaint")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ai_detections_complaint_created ON ai_detections(complaint_id, created_at)"
+        )
+
+        # Create ai_jobs table (durable queue for asynchronous AI detection)
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ai_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                complaint_id INTEGER NOT NULL,
+                image_path TEXT NOT NULL,
+                status TEXT CHECK(status IN ('queued','running','done','failed')) NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 3,
+                lease_owner TEXT,
+                lease_expires_at TIMESTAMP,
+                available_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                started_at TIMESTAMP,
+                finished_at TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY(complaint_id) REFERENCES complaints(id) ON DELETE CASCADE
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_ai_jobs_status_available ON ai_jobs(status, available_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_ai_jobs_complaint ON ai_jobs(complaint_id)")
         conn.commit()
+        # Gather planner statistics for new indexes; a no-op when nothing changed
+        conn.execute("PRAGMA optimize")
     finally:
         conn.close()
 
@@ -214,39 +367,116 @@ def save_ai_detection(
     confidence: Optional[float],
     model_name: Optional[str] = None,
     ai_result_text: Optional[str] = None,
+    model_version: Optional[str] = None,
+    latency_ms: Optional[float] = None,
+    stage_timings: Optional[Dict[str, float]] = None,
+    boxes: Optional[Dict[str, Any]] = None,
+    raw_output: Optional[bytes] = None,
 ) -> None:
     """
     Persist AI detection into ai_detections and update complaints summary fields.
     Sets ai_status to 'pending' for admin review.
+    model_version identifies the weights/config that produced the detection,
+    latency_ms is the detector's (or, for the final decision, the whole run's)
+    time and stage_timings the run's per-stage breakdown in ms. boxes, stored
+    with the final decision, maps each detector of the run to its
+    detected_type, confidence and boxes (see worker.detection_boxes);
+    raw_output, also stored with the final decision, is every detector's
+    packed boxes, scores and classes (see backend.ai.raw_store).
     """
-    conn = get_connection()
-    try:
-        # Insert detection record (history)
-        conn.execute(
-            "INSERT INTO ai_detections (complaint_id, detected_type, confidence, model_name) VALUES (?, ?, ?, ?)",
-            (complaint_id, detected_type, confidence, model_name),
-        )
-        # Update complaints with latest AI decision metadata
-        # Set ai_status to 'pending' so admin can review
-        conn.execute(
-            """
-            UPDATE complaints
-               SET ai_detected_type = ?,
-                   ai_confidence = ?,
-                   ai_model_name = ?,
-                   ai_status = 'pending',
-                   decision_source = 'AI',
-                   decision_timestamp = CURRENT_TIMESTAMP,
-                   ai_reviewed_at = CURRENT_TIMESTAMP,
-                   ai_result = COALESCE(?, ai_result),
-                   updated_at = CURRENT_TIMESTAMP
-             WHERE id = ?
-            """,
-            (detected_type, confidence, model_name, ai_result_text, complaint_id),
-        )
-        conn.commit()
-    finally:
-        conn.close()
+    with timed("save_ai_detection"):
+        conn = get_connection()
+        try:
+            # Insert detection record (history)
+            conn.execute(
+                """INSERT INTO ai_detections
+                   (complaint_id, detected_type, confidence, model_name, model_version, latency_ms, stage_timings,
+                    boxes, raw_output)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (complaint_id, detected_type, confidence, model_name, model_version, latency_ms,
+                 json.dumps(stage_timings) if stage_timings else None,
+                 json.dumps(boxes, separators=(",", ":")) if boxes is not None else None,
+                 raw_output),
+            )
+            # Update complaints with latest AI decision metadata
+            # Set ai_status to 'pending' so admin can review
+            conn.execute(
+                """
+                UPDATE complaints
+                   SET ai_detected_type = ?,
+                       ai_confidence = ?,
+                       ai_model_name = ?,
+                       ai_status = 'pending',
+                       decision_source = 'AI',
+                       decision_timestamp = CURRENT_TIMESTAMP,
+                       ai_reviewed_at = CURRENT_TIMESTAMP,
+                       ai_result = COALESCE(?, ai_result),
+                       updated_at = CURRENT_TIMESTAMP
+                 WHERE id = ?
+                """,
+                (detected_type, confidence, model_name, ai_result_text, complaint_id),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+def save_ai_runs(runs: List[Dict[str, Any]]) -> None:
+    """
+    Persist many detection runs in a single transaction, writing the same rows
+    as calling save_ai_detection for each detector result and then for the
+    final decision.
+
+    Each run is a dict with complaint_id, detections (one dict per detector
+    row: detected_type, confidence, model_name, model_version, latency_ms) and
+    final (the same keys plus ai_result_text, stage_timings, boxes and raw_output).
+    """
+    if not runs:
+        return
+    rows = []
+    finals = []
+    for run in runs:
+        final = run["final"]
+        for d in list(run["detections"]) + [final]:
+            rows.append((
+                run["complaint_id"], d.get("detected_type"), d.get("confidence"), d.get("model_name"),
+                d.get("model_version"), d.get("latency_ms"),
+                json.dumps(d["stage_timings"]) if d.get("stage_timings") else None,
+                json.dumps(d["boxes"], separators=(",", ":")) if d.get("boxes") is not None else None,
+                d.get("raw_output"),
+            ))
+        finals.append((
+            final.get("detected_type"), final.get("confidence"), final.get("model_name"),
+            final.get("ai_result_text"), run["complaint_id"],
+        ))
+    with timed("save_ai_runs"):
+        conn = get_connection()
+        try:
+            conn.executemany(
+                """INSERT INTO ai_detections
+                   (complaint_id, detected_type, confidence, model_name, model_version, latency_ms, stage_timings,
+                    boxes, raw_output)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                rows,
+            )
+            conn.executemany(
+                """
+                UPDATE complaints
+                   SET ai_detected_type = ?,
+                       ai_confidence = ?,
+                       ai_model_name = ?,
+                       ai_status = 'pending',
+                       decision_source = 'AI',
+                       decision_timestamp = CURRENT_TIMESTAMP,
+                       ai_reviewed_at = CURRENT_TIMESTAMP,
+                       ai_result = COALESCE(?, ai_result),
+                       updated_at = CURRENT_TIMESTAMP
+                 WHERE id = ?
+                """,
+                finals,
+            )
+            conn.commit()
+        finally:
+            conn.close()
 
 def save_complaint(
     user_id: int,
@@ -254,6 +484,7 @@ def save_complaint(
     address: Optional[str],
     description: Optional[str],
     complaint_type: Optional[str] = None,
+    image_phash: Optional[str] = None,
 ) -> int:
     """
     Save a new complaint with image, address, and description.
@@ -265,6 +496,7 @@ def save_complaint(
         address: Address/location of the complaint
         description: Description of the complaint
         complaint_type: Type of complaint (e.g., "garbage", "pothole")
+        image_phash: Perceptual hash of the image (hex), used for duplicate detection
         
     Returns:
         ID of the created complaint
@@ -273,9 +505,9 @@ def save_complaint(
     try:
         cur = conn.execute(
             """INSERT INTO complaints 
-               (user_id, complaint_type, image_path, address, description, status, created_at) 
-               VALUES (?, ?, ?, ?, ?, 'pending', CURRENT_TIMESTAMP)""",
-            (user_id, complaint_type, image_path, address, description),
+               (user_id, complaint_type, image_path, address, description, image_phash, status, created_at) 
+               VALUES (?, ?, ?, ?, ?, ?, 'pending', CURRENT_TIMESTAMP)""",
+            (user_id, complaint_type, image_path, address, description, image_phash),
         )
         conn.commit()
         return cur.lastrowid
@@ -285,17 +517,23 @@ def save_complaint(
 def get_complaint_with_ai_result(complaint_id: int) -> Optional[Dict[str, Any]]:
     """
     Return complaint details along with latest AI decision metadata and last detection record.
+    The last detection is found with one lookup in idx_ai_detections_complaint_created.
     """
     conn = get_connection()
     try:
         cur = conn.execute(
             """
             SELECT c.*,
-                   (SELECT detected_type FROM ai_detections d WHERE d.complaint_id = c.id ORDER BY d.created_at DESC LIMIT 1) AS last_detected_type,
-                   (SELECT confidence FROM ai_detections d WHERE d.complaint_id = c.id ORDER BY d.created_at DESC LIMIT 1) AS last_confidence,
-                   (SELECT model_name FROM ai_detections d WHERE d.complaint_id = c.id ORDER BY d.created_at DESC LIMIT 1) AS last_model_name,
-                   (SELECT created_at FROM ai_detections d WHERE d.complaint_id = c.id ORDER BY d.created_at DESC LIMIT 1) AS last_detection_at
+                   d.detected_type AS last_detected_type,
+                   d.confidence AS last_confidence,
+                   d.model_name AS last_model_name,
+                   d.model_version AS last_model_version,
+                   d.created_at AS last_detection_at
               FROM complaints c
+              LEFT JOIN ai_detections d
+                ON d.id = (SELECT id FROM ai_detections
+                            WHERE complaint_id = c.id
+                            ORDER BY created_at DESC, id DESC LIMIT 1)
              WHERE c.id = ?
             """,
             (complaint_id,),
@@ -305,6 +543,50 @@ def get_complaint_with_ai_result(complaint_id: int) -> Optional[Dict[str, Any]]:
     finally:
         conn.close()
 
+def get_complaint_image_path(complaint_id: int) -> Optional[str]:
+    """A complaint's image_path, or None if it has none or does not exist."""
+    conn = get_connection()
+    try:
+        row = conn.execute("SELECT image_path FROM complaints WHERE id = ?", (complaint_id,)).fetchone()
+        return row["image_path"] if row else None
+    finally:
+        conn.close()
+
+def get_latest_detection_boxes(complaint_id: int) -> Optional[Tuple[int, Dict[str, Any]]]:
+    """
+    The boxes stored with a complaint's latest detection run, as
+    (ai_detections row id, {detector: {detected_type, confidence, boxes}}),
+    or None if no run stored any.
+    """
+    conn = get_connection()
+    try:
+        row = conn.execute(
+            """SELECT id, boxes FROM ai_detections
+                WHERE complaint_id = ? AND boxes IS NOT NULL
+                ORDER BY created_at DESC, id DESC LIMIT 1""",
+            (complaint_id,),
+        ).fetchone()
+        return (int(row["id"]), json.loads(row["boxes"])) if row else None
+    finally:
+        conn.close()
+
+def get_latest_detection_output(complaint_id: int) -> Optional[Dict[str, Any]]:
+    """
+    The boxes (decoded) and raw_output stored with a complaint's latest
+    detection run, or None if no run stored any.
+    """
+    conn = get_connection()
+    try:
+        row = conn.execute(
+            """SELECT boxes, raw_output FROM ai_detections
+                WHERE complaint_id = ? AND boxes IS NOT NULL
+                ORDER BY created_at DESC, id DESC LIMIT 1""",
+            (complaint_id,),
+        ).fetchone()
+        return {"boxes": json.loads(row["boxes"]), "raw_output": row["raw_output"]} if row else None
+    finally:
+        conn.close()
+
 def update_ai_decision(
     complaint_id: int,
     status: str,
@@ -389,3 +671,276 @@ def update_complaint_ai_result(complaint_id: int, ai_result: str, status: Option
         return cur.rowcount > 0
     finally:
         conn.close()
+
+def enqueue_ai_job(complaint_id: int, image_path: str, max_attempts: int = 3) -> int:
+    """
+    Queue asynchronous AI detection for a complaint.
+    
+    Args:
+        complaint_id: ID of the complaint to run detection for
+        image_path: Image path relative to the project root
+        max_attempts: How many times the job may be claimed before it fails
+        
+    Returns:
+        ID of the created job
+    """
+    conn = get_connection()
+    try:
+        cur = conn.execute(
+            "INSERT INTO ai_jobs (complaint_id, image_path, max_attempts) VALUES (?, ?, ?)",
+            (complaint_id, image_path, max_attempts),
+        )
+        conn.commit()
+        return cur.lastrowid
+    finally:
+        conn.close()
+
+def claim_ai_job(worker_id: str, lease_seconds: int = 300) -> Optional[Dict[str, Any]]:
+    """
+    Atomically claim the oldest runnable job and lease it to a worker.
+    
+    Runnable jobs are queued jobs whose retry delay has passed and running
+    jobs whose lease expired (the worker died). Expired jobs that have used
+    up their attempts are marked failed instead.
+    
+    Returns:
+        The claimed job, or None if nothing is runnable
+    """
+    conn = get_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            """
+            UPDATE ai_jobs
+               SET status = 'failed',
+                   last_error = COALESCE(last_error, 'lease expired'),
+                   lease_owner = NULL,
+                   lease_expires_at = NULL,
+                   finished_at = CURRENT_TIMESTAMP,
+                   updated_at = CURRENT_TIMESTAMP
+             WHERE status = 'running'
+               AND lease_expires_at < CURRENT_TIMESTAMP
+               AND attempts >= max_attempts
+            """
+        )
+        row = conn.execute(
+            """
+            SELECT id FROM ai_jobs
+             WHERE (status = 'queued' AND available_at <= CURRENT_TIMESTAMP)
+                OR (status = 'running' AND lease_expires_at < CURRENT_TIMESTAMP)
+             ORDER BY id
+             LIMIT 1
+            """
+        ).fetchone()
+        if not row:
+            conn.commit()
+            return None
+        conn.execute(
+            """
+            UPDATE ai_jobs
+               SET status = 'running',
+                   attempts = attempts + 1,
+                   lease_owner = ?,
+                   lease_expires_at = datetime('now', ?),
+                   started_at = CURRENT_TIMESTAMP,
+                   updated_at = CURRENT_TIMESTAMP
+             WHERE id = ?
+            """,
+            (worker_id, f"{int(lease_seconds):+d} seconds", row["id"]),
+        )
+        job = conn.execute("SELECT * FROM ai_jobs WHERE id = ?", (row["id"],)).fetchone()
+        conn.commit()
+        return dict(job)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def renew_ai_job_lease(job_id: int, worker_id: str, lease_seconds: int = 300) -> bool:
+    """Extend a running job's lease. Returns False if the worker no longer owns it."""
+    conn = get_connection()
+    try:
+        cur = conn.execute(
+            """UPDATE ai_jobs
+                  SET lease_expires_at = datetime('now', ?), updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND lease_owner = ? AND status = 'running'""",
+            (f"{int(lease_seconds):+d} seconds", job_id, worker_id),
+        )
+        conn.commit()
+        return cur.rowcount > 0
+    finally:
+        conn.close()
+
+def complete_ai_job(job_id: int, worker_id: str) -> bool:
+    """Mark a job done. Returns False if the worker no longer owns it."""
+    conn = get_connection()
+    try:
+        cur = conn.execute(
+            """UPDATE ai_jobs
+                  SET status = 'done', lease_owner = NULL, lease_expires_at = NULL,
+                      last_error = NULL, finished_at = CURRENT_TIMESTAMP,
+                      updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND lease_owner = ? AND status = 'running'""",
+            (job_id, worker_id),
+        )
+        conn.commit()
+        return cur.rowcount > 0
+    finally:
+        conn.close()
+
+def fail_ai_job(job_id: int, worker_id: str, error: str, retry_delay_seconds: int = 30) -> bool:
+    """
+    Record a failed attempt. The job is re-queued after retry_delay_seconds
+    if it has attempts left, otherwise it is marked failed.
+    
+    Returns:
+        False if the worker no longer owns the job
+    """
+    conn = get_connection()
+    try:
+        cur = conn.execute(
+            """UPDATE ai_jobs
+                  SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END,
+                      available_at = datetime('now', ?),
+                      finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE CURRENT_TIMESTAMP END,
+                      lease_owner = NULL, lease_expires_at = NULL,
+                      last_error = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND lease_owner = ? AND status = 'running'""",
+            (f"{int(retry_delay_seconds):+d} seconds", error, job_id, worker_id),
+        )
+        conn.commit()
+        return cur.rowcount > 0
+    finally:
+        conn.close()
+
+def get_ai_job(job_id: int) -> Optional[Dict[str, Any]]:
+    conn = get_connection()
+    try:
+        row = conn.execute("SELECT * FROM ai_jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+def get_latest_ai_job(complaint_id: int) -> Optional[Dict[str, Any]]:
+    """Return the most recent AI job for a complaint, if any."""
+    conn = get_connection()
+    try:
+        row = conn.execute(
+            "SELECT * FROM ai_jobs WHERE complaint_id = ? ORDER BY id DESC LIMIT 1",
+            (complaint_id,),
+        ).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+def count_ai_jobs_by_status() -> Dict[str, int]:
+    conn = get_connection()
+    try:
+        cur = conn.execute("SELECT status, COUNT(*) AS n FROM ai_jobs GROUP BY status")
+        return {r["status"]: r["n"] for r in cur.fetchall()}
+    finally:
+        conn.close()
+
+def get_complaints_with_images(after_id: int = 0, limit: int = 500,
+                               include_reviewed: bool = False) -> List[Dict[str, Any]]:
+    """
+    Up to `limit` complaints that have an image, in id order after `after_id`
+    (keyset pagination: pass the last id of one page to get the next).
+    Complaints an admin decided on are left out unless include_reviewed.
+    """
+    conn = get_connection()
+    try:
+        cur = conn.execute(
+            """SELECT id, image_path, complaint_type, image_phash FROM complaints
+                WHERE id > ? AND image_path IS NOT NULL AND image_path != ''
+                  AND (? OR decision_source IS NOT 'Admin')
+                ORDER BY id LIMIT ?""",
+            (after_id, 1 if include_reviewed else 0, limit),
+        )
+        return [dict(r) for r in cur.fetchall()]
+    finally:
+        conn.close()
+
+def count_complaints_with_images(after_id: int = 0, include_reviewed: bool = False) -> int:
+    conn = get_connection()
+    try:
+        row = conn.execute(
+            """SELECT COUNT(*) AS n FROM complaints
+                WHERE id > ? AND image_path IS NOT NULL AND image_path != ''
+                  AND (? OR decision_source IS NOT 'Admin')""",
+            (after_id, 1 if include_reviewed else 0),
+        ).fetchone()
+        return int(row["n"])
+    finally:
+        conn.close()
+
+def get_stored_detection_runs(after_id: int = 0, limit: int = 500,
+                              include_reviewed: bool = False) -> List[Dict[str, Any]]:
+    """
+    The latest run of each complaint after `after_id` that kept its raw
+    detector output, in complaint id order (keyset pagination like
+    get_complaints_with_images): complaint_id, the final decision row's id,
+    detected_type, confidence, model_name, model_version and raw_output.
+    Complaints an admin decided on are left out unless include_reviewed.
+    """
+    conn = get_connection()
+    try:
+        cur = conn.execute(
+            """SELECT c.id AS complaint_id, d.id AS detection_id, d.detected_type, d.confidence, d.model_name,
+                      d.model_version, d.raw_output
+                 FROM complaints c
+                 JOIN ai_detections d
+                   ON d.id = (SELECT MAX(id) FROM ai_detections
+                               WHERE complaint_id = c.id AND boxes IS NOT NULL)
+                WHERE c.id > ? AND d.raw_output IS NOT NULL
+                  AND (? OR c.decision_source IS NOT 'Admin')
+                ORDER BY c.id LIMIT ?""",
+            (after_id, 1 if include_reviewed else 0, limit),
+        )
+        return [dict(r) for r in cur.fetchall()]
+    finally:
+        conn.close()
+
+def get_original_image_phashes(after_id: int = 0) -> List[Tuple[int, str]]:
+    """
+    Return (complaint_id, image_phash), in id order, for every hashed complaint
+    after `after_id` that is not itself a duplicate.
+    """
+    conn = get_connection()
+    try:
+        cur = conn.execute(
+            """SELECT id, image_phash FROM complaints
+                WHERE id > ? AND image_phash IS NOT NULL AND duplicate_of IS NULL
+                ORDER BY id""",
+            (after_id,),
+        )
+        return [(r["id"], r["image_phash"]) for r in cur.fetchall()]
+    finally:
+        conn.close()
+
+def update_image_phashes(updates: List[Tuple[int, Optional[str]]]) -> int:
+    """Set image_phash for (complaint_id, image_phash) pairs in one transaction. Returns the rows changed."""
+    conn = get_connection()
+    try:
+        cur = conn.executemany(
+            "UPDATE complaints SET image_phash = ? WHERE id = ? AND image_phash IS NOT ?",
+            [(phash, complaint_id, phash) for complaint_id, phash in updates],
+        )
+        conn.commit()
+        return cur.rowcount
+    finally:
+        conn.close()
+
+def link_duplicate_complaint(complaint_id: int, duplicate_of: int) -> bool:
+    """Mark a complaint as a near-duplicate of an earlier one."""
+    conn = get_connection()
+    try:
+        cur = conn.execute(
+            "UPDATE complaints SET duplicate_of = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (duplicate_of, complaint_id),
+        )
+        conn.commit()
+        return cur.rowcount > 0
+    finally:
+        conn.close()
@@ -0,0 +1,95 @@
+"""
+Perceptual Hash Re-hashing
+
+Recomputes the image_phash of every complaint from its original upload with
+utils.image_dhash (utils.video_dhash for videos), the one dHash the duplicate
+index compares. Hashes stored by earlier ingest code were taken with OpenCV
+from a downscaled copy and sit several bits away from the hash of the same
+photo, enough to miss a re-upload; run this once to bring them in line.
+
+Only hashes that change are written, a page at a time in one transaction
+each, so running it twice changes nothing the second time. Restart the web
+and job worker processes afterwards: their duplicate index holds the old
+hashes.
+
+Run from the project root:
+    python -m backend.rehash --dry-run
+    python -m backend.rehash
+"""
+from typing import List, Optional, Tuple
+import argparse
+import logging
+import os
+import sys
+import time
+
+from backend import model, utils
+from backend.config import BASE_DIR, VIDEO_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+# Complaints read from the database per keyset page
+_PAGE_SIZE = 500
+
+
+def original_phash(image_path: str) -> Optional[str]:
+    """dHash of a stored upload as ingest computes it, or None if the file is missing or unreadable."""
+    abs_path = os.path.join(BASE_DIR, image_path)
+    if not os.path.exists(abs_path):
+        return None
+    if image_path.rsplit(".", 1)[-1].lower() in VIDEO_EXTENSIONS:
+        return utils.video_dhash(abs_path)
+    return utils.image_dhash(abs_path)
+
+
+def rehash_all(dry_run: bool = False) -> Tuple[int, int, int]:
+    """
+    Recompute every complaint's image_phash.
+
+    Returns:
+        (complaints checked, hashes changed, files that could not be hashed)
+    """
+    checked = changed = unreadable = 0
+    started = time.perf_counter()
+    after_id = 0
+    while True:
+        rows = model.get_complaints_with_images(after_id, _PAGE_SIZE, include_reviewed=True)
+        if not rows:
+            break
+        after_id = rows[-1]["id"]
+        updates: List[Tuple[int, Optional[str]]] = []
+        for row in rows:
+            checked += 1
+            phash = original_phash(row["image_path"])
+            if phash is None:
+                # Keep what is stored rather than dropping the complaint from the index
+                unreadable += 1
+                continue
+            if phash != row["image_phash"]:
+                updates.append((row["id"], phash))
+        changed += len(updates)
+        if updates and not dry_run:
+            model.update_image_phashes(updates)
+
+    logger.info(f"Re-hashed {checked} complaints in {time.perf_counter() - started:.1f}s: "
+                f"{changed} {'would change' if dry_run else 'changed'}, {unreadable} unreadable")
+    return checked, changed, unreadable
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Recompute complaint image hashes used for duplicate detection")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without saving")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    model.init_db()
+    model.migrate_db()
+    rehash_all(dry_run=args.dry_run)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+Detection Re-scoring
+
+Recomputes every complaint's AI decision from the raw detector output stored
+with its latest run (see backend.ai.raw_store) instead of running the models
+again: after a confidence threshold change or an edit to a detector's
+postprocess() heuristics this takes seconds, where the backfill takes hours.
+
+Complaints whose decision changes get a new final detection row and updated
+summary fields, written a page at a time in one transaction each; the rest
+are left alone, so running it twice changes nothing the second time. Runs
+stored before raw output was kept have nothing to re-score from; backfill
+them once with --no-cache (cached results from before carry no scores).
+
+Run from the project root:
+    python -m backend.rescore --threshold 0.8 --dry-run
+    python -m backend.rescore --threshold 0.8
+"""
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import logging
+import sys
+import time
+
+from backend import model
+
+logger = logging.getLogger(__name__)
+
+# Stored runs read from the database per keyset page
+_PAGE_SIZE = 1000
+
+
+def _decision(best: Dict[str, Any]) -> Tuple[Optional[str], float]:
+    """(detected_type, confidence) as the final detection row stores them."""
+    label = best.get("detected_type") or "unknown"
+    if label == "unknown":
+        return None, 0.0
+    return label, float(best.get("confidence", 0.0) or 0.0)
+
+
+def _changed(row: Dict[str, Any], detected_type: Optional[str], confidence: float, model_name: Optional[str]) -> bool:
+    return (
+        row["detected_type"] != detected_type
+        or round(float(row["confidence"] or 0.0), 6) != round(confidence, 6)
+        or row["model_name"] != model_name
+    )
+
+
+def rescore_page(rows: List[Dict[str, Any]], scorers: Dict[str, Any], confidence_threshold: float,
+                 stats: Dict[str, Counter]) -> List[Dict[str, Any]]:
+    """
+    Re-score stored runs (rows from model.get_stored_detection_runs).
+
+    Returns:
+        Runs ready for model.save_ai_runs, for the complaints whose decision changed
+    """
+    from backend.ai.detector_manager import build_normal_output
+    from backend.ai.raw_store import rescore
+    from backend.worker import detection_boxes, format_ai_result_text
+
+    runs: List[Dict[str, Any]] = []
+    for row in rows:
+        stats["totals"]["complaints"] += 1
+        try:
+            dets, best = rescore(row["raw_output"], scorers, confidence_threshold)
+        except Exception as e:
+            logger.warning(f"Could not re-score complaint {row['complaint_id']}: {e}")
+            stats["totals"]["failed"] += 1
+            continue
+
+        for issue, found in build_normal_output(dets).items():
+            if issue != "confidence" and found:
+                stats["issues"][issue] += 1
+        detected_type, confidence = _decision(best)
+        stats["types"][detected_type or "none"] += 1
+        if not _changed(row, detected_type, confidence, best.get("detector_name")):
+            continue
+
+        stats["totals"]["changed"] += 1
+        stats["transitions"][f"{row['detected_type'] or 'none'} -> {detected_type or 'none'}"] += 1
+        runs.append({
+            "complaint_id": row["complaint_id"],
+            "detections": [],
+            "final": {
+                "detected_type": detected_type,
+                "confidence": confidence,
+                "model_name": best.get("detector_name"),
+                "model_version": best.get("model_version"),
+                "ai_result_text": format_ai_result_text(best),
+                "boxes": detection_boxes(dets),
+                # Still the output the decision was computed from
+                "raw_output": row["raw_output"],
+            },
+        })
+    return runs
+
+
+def rescore_all(confidence_threshold: float, dry_run: bool = False,
+                include_reviewed: bool = False) -> Dict[str, Counter]:
+    """
+    Re-score every complaint with stored raw output and save the changed decisions.
+
+    Returns:
+        Counters: totals (complaints, changed, failed), types (decisions by
+        detected type), issues (complaints build_normal_output flags, per issue)
+        and transitions ("old -> new" type of the changed decisions)
+    """
+    from backend.ai.raw_store import load_scorers
+
+    scorers = load_scorers()
+    logger.info(f"Re-scoring with {', '.join(sorted(scorers)) or 'no detectors'} "
+                f"at threshold {confidence_threshold}{' (dry run)' if dry_run else ''}")
+    stats: Dict[str, Counter] = {
+        "totals": Counter(), "types": Counter(), "issues": Counter(), "transitions": Counter()
+    }
+
+    started = time.perf_counter()
+    after_id = 0
+    while True:
+        rows = model.get_stored_detection_runs(after_id, _PAGE_SIZE, include_reviewed)
+        if not rows:
+            break
+        after_id = rows[-1]["complaint_id"]
+        runs = rescore_page(rows, scorers, confidence_threshold, stats)
+        if runs and not dry_run:
+            model.save_ai_runs(runs)
+
+    elapsed = time.perf_counter() - started
+    totals = stats["totals"]
+    logger.info(f"Re-scored {totals['complaints']} complaints in {elapsed:.2f}s: "
+                f"{totals['changed']} {'would change' if dry_run else 'changed'}, {totals['failed']} failed")
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Recompute AI decisions from stored raw detector output")
+    parser.add_argument("--threshold", type=float, default=0.9, help="confidence threshold for a detection")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without saving")
+    parser.add_argument("--include-reviewed", action="store_true",
+                        help="also re-score complaints an admin decided on (resets them to pending)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    model.init_db()
+    model.migrate_db()
+    stats = rescore_all(args.threshold, dry_run=args.dry_run, include_reviewed=args.include_reviewed)
+
+    lines = [(f"decision {t}", n) for t, n in stats["types"].most_common()]
+    lines += [(f"flagged {issue}", n) for issue, n in sorted(stats["issues"].items())]
+    lines += [(f"changed {transition}", n) for transition, n in stats["transitions"].most_common()]
+    for label, n in lines:
+        print(f"{label:<40}{n:>8}")
+    return 1 if stats["totals"]["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,27 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, g, request, jsonify, send_file, send_from_directory
 from flask_cors import CORS
 import os
 import sys
 import logging
+import time
 from pathlib import Path
 
 # Import backend modules
-from backend import model, auth, utils
-from backend.config import SECRET_KEY, POTHOLE_MODEL_PATH
-from backend.ai.detector_manager import run_all, run_all_for_api
+from backend import model, auth, utils, worker, duplicates, metrics, warmup, derivatives
+from backend.config import (
+    SECRET_KEY,
+    POTHOLE_MODEL_PATH,
+    AI_ASYNC_JOBS,
+    AI_DUPLICATE_DETECTION,
+    AI_EMBEDDED_WORKERS,
+    AI_JOB_MAX_ATTEMPTS,
+    AI_WARMUP,
+    SLOW_REQUEST_MS,
+    UPLOAD_MAX_BYTES,
+    UPLOAD_MAX_VIDEO_BYTES,
+)
+# backend.ai (OpenCV, ultralytics, torch) is imported inside the AI routes so
+# the app starts fast; the warmup thread imports and loads it in the background
 
 # Configure logging
 logging.basicConfig(
@@ -28,12 +41,104 @@ def create_app():
     app = Flask(__name__, template_folder=TEMPLATES_DIR, static_folder=STATIC_DIR)
     CORS(app)
     app.config["SECRET_KEY"] = SECRET_KEY
+    # Refuse oversized bodies before they are read; per-file limits are checked at ingest
+    app.config["MAX_CONTENT_LENGTH"] = max(UPLOAD_MAX_BYTES, UPLOAD_MAX_VIDEO_BYTES) + 1024 * 1024
     model.init_db()
     model.migrate_db()
     utils.ensure_upload_dir()
 
+    started_at = time.time()
+    warmup.get_warmup().start(enabled=AI_WARMUP)
+
+    if AI_ASYNC_JOBS and AI_EMBEDDED_WORKERS > 0:
+        worker.start_embedded_workers(AI_EMBEDDED_WORKERS)
+
+    def _start_ai_detection(complaint_id: int, upload, complaint_type=None):
+        """
+        Queue AI detection for a new complaint, or run it inline on the
+        already decoded upload when asynchronous jobs are disabled.
+        Returns the job id, if queued.
+        """
+        if AI_ASYNC_JOBS:
+            # Workers read the file, so it must be on disk before the job is visible
+            with metrics.timed("upload_persist"):
+                upload.wait_persisted()
+            with metrics.timed("ai_enqueue"):
+                job_id = model.enqueue_ai_job(complaint_id, upload.rel_path, AI_JOB_MAX_ATTEMPTS)
+                model.update_complaint_ai_result(complaint_id, "AI detection queued")
+            logger.info(f"Queued AI job {job_id} for complaint {complaint_id}")
+            return job_id
+        worker.run_detection_for_complaint(
+            complaint_id, upload.rel_path, image=upload.image, complaint_type=complaint_type
+        )
+        return None
+
+    def _check_duplicate(complaint_id: int, image_phash):
+        """Link near-duplicate uploads and reuse the earlier complaint's AI result."""
+        if not AI_DUPLICATE_DETECTION or not image_phash:
+            return {"duplicate_of": None, "reused": 0}
+        try:
+            with metrics.timed("duplicate_check"):
+                return duplicates.reuse_duplicate_result(complaint_id, image_phash)
+        except Exception as e:
+            logger.warning(f"Duplicate check failed for complaint {complaint_id}: {e}")
+            return {"duplicate_of": None, "reused": 0}
+
+    @app.before_request
+    def _begin_request_trace():
+        g.trace_token = metrics.begin_trace()
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def _end_request_trace(response):
+        """Record request latency, expose stage timings as Server-Timing and log slow requests."""
+        token = g.pop("trace_token", None)
+        if token is None:
+            return response
+        timings = metrics.end_trace(token)
+        elapsed = time.perf_counter() - g.pop("request_started")
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.HTTP_SECONDS.observe(elapsed, endpoint=endpoint, method=request.method, status=response.status_code)
+        if timings:
+            response.headers["Server-Timing"] = metrics.server_timing({**timings, "total": elapsed * 1000})
+            if elapsed * 1000 >= SLOW_REQUEST_MS:
+                stages = ", ".join(f"{stage}={ms:.0f}ms" for stage, ms in timings.items())
+                logger.warning(f"Slow request {request.method} {request.path}: {elapsed * 1000:.0f} ms ({stages})")
+        return response
+
+    @app.before_request
+    def _refuse_oversized_body():
+        # Checked up front: the complaint routes would turn the 413 raised while parsing the form into a 500
+        if request.content_length is not None and request.content_length > app.config["MAX_CONTENT_LENGTH"]:
+            return jsonify({"ok": False, "error": "Upload is too large"}), 413
+
+    @app.teardown_request
+    def _release_db_connection(exc):
+        # The thread keeps its connection for its next request; nothing uncommitted carries over
+        model.release_connection()
+
+    @app.errorhandler(413)
+    def _request_too_large(e):
+        return jsonify({"ok": False, "error": "Upload is too large"}), 413
+
     # --- Routes ---
 
+    @app.route("/metrics", methods=["GET"])
+    def prometheus_metrics():
+        """Prometheus scrape endpoint."""
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+    @app.route("/healthz", methods=["GET"])
+    def healthz():
+        """Liveness: the process is up and serving requests."""
+        return jsonify({"ok": True, "uptime_s": round(time.time() - started_at, 1)})
+
+    @app.route("/readyz", methods=["GET"])
+    def readyz():
+        """Readiness: 503 until the AI warmup has loaded and exercised every detector."""
+        status = warmup.get_warmup().status()
+        return jsonify({"ok": status["ready"], "warmup": status}), (200 if status["ready"] else 503)
+
     @app.route("/")
     def home():
         return send_from_directory(TEMPLATES_DIR, "login.html")
@@ -105,78 +210,48 @@ def create_app():
             
             # Handle image upload
             image_path = None
+            image_phash = None
+            upload = None
             if "image" in request.files:
                 file = request.files["image"]
                 if file and file.filename:
                     if not utils.allowed_file(file.filename):
                         return jsonify({"ok": False, "error": "Invalid file type"}), 400
-                    image_path = utils.save_upload(file, "complaint")
+                    try:
+                        with metrics.timed("upload_save"):
+                            upload = utils.ingest_upload(file, "complaint")
+                    except utils.UploadRejected as e:
+                        return jsonify({"ok": False, "error": str(e)}), e.status
+                    image_path, image_phash = upload.rel_path, upload.phash
             
             # Save complaint to database
-            complaint_id = model.save_complaint(
-                user_id=int(user_id),
-                image_path=image_path,
-                address=address,
-                description=description,
-                complaint_type=complaint_type
-            )
+            with metrics.timed("save_complaint"):
+                complaint_id = model.save_complaint(
+                    user_id=int(user_id),
+                    image_path=image_path,
+                    address=address,
+                    description=description,
+                    complaint_type=complaint_type,
+                    image_phash=image_phash
+                )
             
-            ai_result_text = None
+            job_id = None
+            duplicate = {"duplicate_of": None, "reused": 0}
             if image_path:
                 try:
-                    # Convert Path to string and properly join paths
-                    abs_image_path = str(ROOT_DIR / image_path)
-                    # Verify file exists before processing
-                    if not os.path.exists(abs_image_path):
-                        logger.error(f"Image file not found: {abs_image_path}")
-                        model.update_complaint_ai_result(complaint_id, f"AI Error: Image file not found at {abs_image_path}")
-                    else:
-                        logger.info(f"=== Triggering AI Detection for Complaint {complaint_id} ===")
-                        logger.info(f"Image path: {abs_image_path}")
-                        
-                        # Run all detectors sequentially
-                        dets, final = run_all(abs_image_path)
-                        
-                        # Save individual detector results
-                        for d in dets:
-                            det_type = d.get("detected_type")
-                            det_conf = d.get("confidence", 0.0)
-                            det_model = d.get("detector_name")
-                            if det_type or det_conf > 0:
-                                model.save_ai_detection(complaint_id, det_type, det_conf, det_model, None)
-                        
-                        # Get final decision
-                        label = final.get("detected_type") or "unknown"
-                        confidence = float(final.get("confidence", 0.0) or 0.0)
-                        error = final.get("error")
-                        
-                        # Format result text
-                        if error:
-                            if "model missing" in str(error).lower() or "no detectors available" in str(error).lower():
-                                ai_result_text = f"AI Models Missing - Please add model.pt files to detector folders"
-                            else:
-                                ai_result_text = f"AI Error: {error}"
-                        elif label == "unknown":
-                            ai_result_text = f"No detection (confidence below threshold or models missing)"
-                        else:
-                            ai_result_text = f"Detected: {label.replace('_', ' ').title()} ({round(confidence * 100, 1)}%)"
-                        
-                        # Save final detection result
-                        model.save_ai_detection(
-                            complaint_id, 
-                            label if label != "unknown" else None,
-                            confidence if label != "unknown" else 0.0,
-                            final.get("detector_name"),
-                            ai_result_text
-                        )
-                        
-                        logger.info(f"AI Detection complete: {label} ({confidence:.2%})")
-                        logger.info(f"=== AI Detection Complete for Complaint {complaint_id} ===")
+                    duplicate = _check_duplicate(complaint_id, image_phash)
+                    if not duplicate["reused"]:
+                        job_id = _start_ai_detection(complaint_id, upload, complaint_type)
                 except Exception as ai_e:
                     logger.error(f"AI processing error: {ai_e}", exc_info=True)
                     model.update_complaint_ai_result(complaint_id, f"AI Error: {str(ai_e)}")
             
-            return jsonify({"ok": True, "complaint_id": complaint_id})
+            return jsonify({
+                "ok": True,
+                "complaint_id": complaint_id,
+                "job_id": job_id,
+                "duplicate_of": duplicate["duplicate_of"],
+            })
             
         except Exception as e:
             logger.error(f"Complaint registration error: {e}", exc_info=True)
@@ -203,74 +278,45 @@ def create_app():
             if not address:
                 return jsonify({"ok": False, "error": "Missing address"}), 400
             image_path = None
+            image_phash = None
+            upload = None
             if "image" in request.files:
                 file = request.files["image"]
                 if file and file.filename:
                     if not utils.allowed_file(file.filename):
                         return jsonify({"ok": False, "error": "Invalid file type"}), 400
-                    image_path = utils.save_upload(file, "complaint")
-            complaint_id = model.save_complaint(
-                user_id=int(user_id),
-                image_path=image_path,
-                address=address,
-                description=description,
-                complaint_type=complaint_type
-            )
+                    try:
+                        with metrics.timed("upload_save"):
+                            upload = utils.ingest_upload(file, "complaint")
+                    except utils.UploadRejected as e:
+                        return jsonify({"ok": False, "error": str(e)}), e.status
+                    image_path, image_phash = upload.rel_path, upload.phash
+            with metrics.timed("save_complaint"):
+                complaint_id = model.save_complaint(
+                    user_id=int(user_id),
+                    image_path=image_path,
+                    address=address,
+                    description=description,
+                    complaint_type=complaint_type,
+                    image_phash=image_phash
+                )
             # Trigger AI detection automatically after image upload
+            job_id = None
+            duplicate = {"duplicate_of": None, "reused": 0}
             if image_path:
                 try:
-                    # Convert Path to string and properly join paths
-                    abs_image_path = str(ROOT_DIR / image_path)
-                    # Verify file exists before processing
-                    if not os.path.exists(abs_image_path):
-                        logger.error(f"Image file not found: {abs_image_path}")
-                        model.update_complaint_ai_result(complaint_id, f"AI Error: Image file not found at {abs_image_path}")
-                    else:
-                        logger.info(f"=== Triggering AI Detection for Complaint {complaint_id} ===")
-                        logger.info(f"Image path: {abs_image_path}")
-                        
-                        # Run all detectors sequentially
-                        dets, final = run_all(abs_image_path)
-                        
-                        # Save individual detector results
-                        for d in dets:
-                            det_type = d.get("detected_type")
-                            det_conf = d.get("confidence", 0.0)
-                            det_model = d.get("detector_name")
-                            if det_type or det_conf > 0:
-                                model.save_ai_detection(complaint_id, det_type, det_conf, det_model, None)
-                        
-                        # Get final decision
-                        label = final.get("detected_type") or "unknown"
-                        confidence = float(final.get("confidence", 0.0) or 0.0)
-                        error = final.get("error")
-                        
-                        # Format result text
-                        if error:
-                            if "model missing" in str(error).lower() or "no detectors available" in str(error).lower():
-                                ai_result_text = f"AI Models Missing - Please add model.pt files to detector folders"
-                            else:
-                                ai_result_text = f"AI Error: {error}"
-                        elif label == "unknown":
-                            ai_result_text = f"No detection (confidence below threshold or models missing)"
-                        else:
-                            ai_result_text = f"Detected: {label.replace('_', ' ').title()} ({round(confidence * 100, 1)}%)"
-                        
-                        # Save final detection result
-                        model.save_ai_detection(
-                            complaint_id, 
-                            label if label != "unknown" else None,
-                            confidence if label != "unknown" else 0.0,
-                            final.get("detector_name"),
-                            ai_result_text
-                        )
-                        
-                        logger.info(f"AI Detection complete: {label} ({confidence:.2%})")
-                        logger.info(f"=== AI Detection Complete for Complaint {complaint_id} ===")
+                    duplicate = _check_duplicate(complaint_id, image_phash)
+                    if not duplicate["reused"]:
+                        job_id = _start_ai_detection(complaint_id, upload, complaint_type)
                 except Exception as ai_e:
                     logger.error(f"AI processing error for complaint {complaint_id}: {ai_e}", exc_info=True)
                     model.update_complaint_ai_result(complaint_id, f"AI Error: {str(ai_e)}")
-            return jsonify({"ok": True, "complaint_id": complaint_id})
+            return jsonify({
+                "ok": True,
+                "complaint_id": complaint_id,
+                "job_id": job_id,
+                "duplicate_of": duplicate["duplicate_of"],
+            })
         except Exception as e:
             logger.error(f"Create complaint error: {e}", exc_info=True)
             return jsonify({"ok": False, "error": str(e)}), 500
@@ -295,6 +341,8 @@ def create_app():
     @app.route("/admin/complaints", methods=["GET"])
     def admin_complaints():
         items = model.get_all_complaints()
+        for item in items:
+            item["thumbnail_url"] = derivatives.media_url(item["id"], "thumbnail", item.get("image_path"))
         return jsonify({"ok": True, "items": items})
 
     @app.route("/admin/update_status", methods=["POST"])
@@ -313,6 +361,33 @@ def create_app():
         ok = model.update_complaint_status(int(complaint_id), status)
         return jsonify({"ok": ok})
 
+    @app.route("/media/complaints/<int:complaint_id>/<kind>", methods=["GET"])
+    def complaint_media(complaint_id: int, kind: str):
+        """
+        Thumbnail or detection overlay of a complaint's image (?size= longest
+        side), generated on first request and cached on disk. A URL carrying the
+        current version (?v=, see derivatives.media_url) never changes content,
+        so the browser may keep it for a year; other requests revalidate by ETag.
+        """
+        if kind not in derivatives.KINDS:
+            return jsonify({"ok": False, "error": "Not found"}), 404
+        image_path = model.get_complaint_image_path(complaint_id)
+        if not image_path:
+            return jsonify({"ok": False, "error": "No image"}), 404
+        detection = model.get_latest_detection_boxes(complaint_id) if kind == "overlay" else None
+        with metrics.timed(f"media_{kind}"):
+            media = derivatives.get_derivative(
+                complaint_id, kind, image_path, request.args.get("size", type=int), detection
+            )
+        if media is None:
+            return jsonify({"ok": False, "error": "Image not available"}), 404
+        response = send_file(media.path, mimetype="image/jpeg", etag=media.etag, conditional=True)
+        if request.args.get("v") == media.etag:
+            response.headers["Cache-Control"] = "private, max-age=31536000, immutable"
+        else:
+            response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
     # --- AI Decision APIs ---
     @app.route("/admin/complaint/<int:complaint_id>/ai-result", methods=["GET"])
     def get_ai_result(complaint_id: int):
@@ -327,55 +402,31 @@ def create_app():
         image_path = item.get("image_path")
         detections_list = []
         
-        if image_path and (not item.get("ai_detected_type") or item.get("ai_confidence") is None):
+        # A queued or running job will produce the result; don't run detection twice
+        job = model.get_latest_ai_job(complaint_id)
+        job_pending = bool(job and job["status"] in ("queued", "running"))
+        
+        if image_path and not job_pending and (not item.get("ai_detected_type") or item.get("ai_confidence") is None):
             try:
-                abs_image_path = str(ROOT_DIR / image_path)
+                abs_image_path = str(ROOT_DIR / utils.inference_image_path(image_path))
                 if os.path.exists(abs_image_path):
                     logger.info(f"Auto-triggering AI detection for complaint {complaint_id} (no previous result)")
-                    dets, final = run_all(abs_image_path)
+                    from backend.ai.batcher import run_all_queued
+                    with metrics.timed("ai_detection"):
+                        dets, final = run_all_queued(abs_image_path, complaint_type=item.get("complaint_type"))
                     
-                    # Save individual detector results and collect for response
+                    # Collect individual detector results for the response
                     for d in dets:
-                        det_type = d.get("detected_type")
-                        det_conf = d.get("confidence", 0.0)
-                        det_model = d.get("detector_name")
                         raw = d.get("raw", {})
-                        
                         detections_list.append({
-                            "detected_type": det_type,
-                            "confidence": det_conf,
-                            "detector_name": det_model,
+                            "detected_type": d.get("detected_type"),
+                            "confidence": d.get("confidence", 0.0),
+                            "detector_name": d.get("detector_name"),
                             "label": raw.get("label"),  # What object was actually detected
                             "raw_detections": raw.get("raw_detections", 0)
                         })
-                        
-                        if det_type or det_conf > 0:
-                            model.save_ai_detection(complaint_id, det_type, det_conf, det_model, None)
-                    
-                    # Get final decision
-                    label = final.get("detected_type") or "unknown"
-                    confidence = float(final.get("confidence", 0.0) or 0.0)
-                    error = final.get("error")
-                    
-                    # Format result text
-                    if error:
-                        if "model missing" in str(error).lower() or "no detectors available" in str(error).lower():
-                            ai_result_text = f"AI Models Missing - Please add model.pt files to detector folders"
-                        else:
-                            ai_result_text = f"AI Error: {error}"
-                    elif label == "unknown":
-                        ai_result_text = f"No detection (confidence below threshold or models missing)"
-                    else:
-                        ai_result_text = f"Detected: {label.replace('_', ' ').title()} ({round(confidence * 100, 1)}%)"
                     
-                    # Save final detection result
-                    model.save_ai_detection(
-                        complaint_id, 
-                        label if label != "unknown" else None,
-                        confidence if label != "unknown" else 0.0,
-                        final.get("detector_name"),
-                        ai_result_text
-                    )
+                    worker.save_detection_results(complaint_id, dets, final)
                     
                     # Refresh item from database
                     item = model.get_complaint_with_ai_result(complaint_id)
@@ -386,6 +437,11 @@ def create_app():
         # Add detections to response if available
         if detections_list:
             item["detections"] = detections_list
+        if job_pending:
+            item["job"] = job
+        item["overlay_url"] = derivatives.media_url(
+            complaint_id, "overlay", item.get("image_path"), detection=model.get_latest_detection_boxes(complaint_id)
+        )
         
         return jsonify({"ok": True, "item": item})
 
@@ -437,17 +493,59 @@ def create_app():
         item = model.get_complaint_with_ai_result(int(complaint_id))
         if not item:
             return jsonify({"ok": False, "error": "Not found"}), 404
-        return jsonify({"ok": True, "item": item})
+        job = model.get_latest_ai_job(int(complaint_id))
+        return jsonify({"ok": True, "item": item, "job": job})
+
+    def _save_run_all_result(complaint_id: int, dets, final) -> str:
+        ai_result_text = worker.save_detection_results(complaint_id, dets, final)
+        label = final.get("detected_type")
+        confidence = float(final.get("confidence", 0.0) or 0.0)
+        if label and confidence > 0:
+            model.update_complaint_ai_info(complaint_id, True, label, confidence)
+        else:
+            model.update_complaint_ai_info(complaint_id, False, None, 0.0)
+        return ai_result_text
+
+    def _api_run_all_batch(complaint_ids):
+        """Re-run detection for several complaints with batched inference."""
+        results = {}
+        pending = []
+        for cid in complaint_ids:
+            item = model.get_complaint_with_ai_result(int(cid))
+            if not item:
+                results[str(cid)] = {"ok": False, "error": "Not found"}
+            elif not item.get("image_path"):
+                results[str(cid)] = {"ok": False, "error": "No image"}
+            else:
+                pending.append((int(cid), str(ROOT_DIR / utils.inference_image_path(item["image_path"]))))
+        try:
+            from backend.ai.detector_manager import run_all_batch
+            outputs = run_all_batch([path for _, path in pending])
+            for (cid, path), (dets, final) in zip(pending, outputs):
+                if final.get("error") == "image not found":
+                    results[str(cid)] = {"ok": False, "error": f"Image file not found at {path}"}
+                    continue
+                _save_run_all_result(cid, dets, final)
+                results[str(cid)] = {"ok": True, "final": final, "detections": dets}
+            return jsonify({"ok": True, "results": results})
+        except Exception as e:
+            logger.error(f"Batch run-all error: {e}", exc_info=True)
+            return jsonify({"ok": False, "error": str(e)}), 500
 
     @app.route("/api/detect/run-all", methods=["POST"])
     def api_run_all():
         data = request.get_json() or {}
         complaint_id = data.get("complaint_id")
+        complaint_ids = data.get("complaint_ids")
         admin_id = data.get("admin_id")
-        if not complaint_id:
+        if not complaint_id and not complaint_ids:
             return jsonify({"ok": False, "error": "Missing complaint_id"}), 400
         if admin_id and not auth.is_admin(int(admin_id)):
             return jsonify({"ok": False, "error": "Forbidden"}), 403
+        if complaint_ids:
+            if not isinstance(complaint_ids, list):
+                return jsonify({"ok": False, "error": "complaint_ids must be a list"}), 400
+            return _api_run_all_batch(complaint_ids)
         item = model.get_complaint_with_ai_result(int(complaint_id))
         if not item:
             return jsonify({"ok": False, "error": "Not found"}), 404
@@ -456,24 +554,15 @@ def create_app():
             return jsonify({"ok": False, "error": "No image"}), 400
         try:
             # Convert Path to string and properly join paths
-            abs_image_path = str(ROOT_DIR / image_path)
+            abs_image_path = str(ROOT_DIR / utils.inference_image_path(image_path))
             # Verify file exists before processing
             if not os.path.exists(abs_image_path):
                 logger.error(f"Image file not found: {abs_image_path}")
                 return jsonify({"ok": False, "error": f"Image file not found at {abs_image_path}"}), 400
             logger.info(f"Processing AI detection for image: {abs_image_path}")
-            dets, final = run_all(abs_image_path)
-            for d in dets:
-                model.save_ai_detection(int(complaint_id), d.get("detected_type"), d.get("confidence"), d.get("detector_name"), None)
-            label = final.get("detected_type") or "unknown"
-            confidence = float(final.get("confidence", 0.0))
-            ai_result_text = f"Detected: {label.replace('_', ' ').title()} ({round(confidence * 100, 1)}%)"
-            model.save_ai_detection(int(complaint_id), label, confidence, final.get("detector_name"), ai_result_text)
-            if confidence > 0:
-                model.update_complaint_ai_info(int(complaint_id), True, label, confidence)
-            else:
-                model.update_complaint_ai_info(int(complaint_id), False, None, 0.0)
-            model.update_complaint_ai_result(int(complaint_id), ai_result_text)
+            from backend.ai.detector_manager import run_all
+            dets, final = run_all(abs_image_path, complaint_type=item.get("complaint_type"))
+            _save_run_all_result(int(complaint_id), dets, final)
             return jsonify({"ok": True, "final": final, "detections": dets})
         except Exception as e:
             logger.error(f"Run-all error: {e}", exc_info=True)
@@ -495,28 +584,34 @@ def create_app():
         if not image_path:
             return jsonify({"ok": False, "error": "No image"}), 400
         # Convert Path to string and properly join paths
-        abs_image_path = str(ROOT_DIR / image_path)
+        abs_image_path = str(ROOT_DIR / utils.inference_image_path(image_path))
         # Verify file exists before processing
         if not os.path.exists(abs_image_path):
             logger.error(f"Image file not found: {abs_image_path}")
             return jsonify({"ok": False, "error": f"Image file not found at {abs_image_path}"}), 400
         logger.info(f"Processing AI detection for image: {abs_image_path}")
+        from backend.ai.detector_manager import run_all_for_api
         res = run_all_for_api(abs_image_path)
         dets = res.get("detections", [])
         final = res.get("final", {})
-        for d in dets:
-            model.save_ai_detection(int(complaint_id), d.get("detected_type"), d.get("confidence"), d.get("detector_name"), None)
-        label = final.get("detected_type") or "unknown"
-        confidence = float(final.get("confidence", 0.0))
-        ai_result_text = f"Detected: {label.replace('_', ' ').title()} ({round(confidence * 100, 1)}%)"
-        model.save_ai_detection(int(complaint_id), label, confidence, final.get("detector_name"), ai_result_text)
-        if confidence > 0:
-            model.update_complaint_ai_info(int(complaint_id), True, label, confidence)
-        else:
-            model.update_complaint_ai_info(int(complaint_id), False, None, 0.0)
-        model.update_complaint_ai_result(int(complaint_id), ai_result_text)
+        _save_run_all_result(int(complaint_id), dets, final)
         return jsonify({"ok": True, "result": res.get("result"), "final": final, "detections": dets})
 
+    @app.route("/api/ai/detectors", methods=["GET"])
+    def api_detector_stats():
+        from backend.ai.batcher import batcher_stats
+        from backend.ai.detector_manager import cascade_stats, detector_stats, result_cache_stats
+        from backend.ai.inference_pool import inference_pool_stats
+        return jsonify({
+            "ok": True,
+            "detectors": detector_stats(),
+            "batcher": batcher_stats(),
+            "inference_pool": inference_pool_stats(),
+            "cache": result_cache_stats(),
+            "cascade": cascade_stats(),
+            "warmup": warmup.get_warmup().status(),
+        })
+
     return app
 
 if __name__ == "__main__":
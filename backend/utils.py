@@ -1,10 +1,21 @@
+import io
 import os
 import uuid
-from typing import Set, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, BinaryIO, Dict, List, Set, Optional, Tuple
 from werkzeug.utils import secure_filename
-from backend.config import UPLOAD_FOLDER
+from backend.config import (
+    BASE_DIR,
+    UPLOAD_DERIVATIVE_SIDE,
+    UPLOAD_FOLDER,
+    UPLOAD_MAX_BYTES,
+    UPLOAD_MAX_PIXELS,
+    UPLOAD_MAX_VIDEO_BYTES,
+    UPLOAD_THUMBNAIL_SIDE,
+    VIDEO_EXTENSIONS,
+)
 
-ALLOWED_EXTENSIONS: Set[str] = {"png", "jpg", "jpeg", "gif", "mp4"}
+ALLOWED_EXTENSIONS: Set[str] = {"png", "jpg", "jpeg", "gif", "mp4", "mov"}
 
 def allowed_file(filename: str) -> bool:
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -12,12 +23,314 @@ def allowed_file(filename: str) -> bool:
 def ensure_upload_dir() -> None:
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Formats PIL may report for the allowed image extensions (MPO: multi-picture JPEGs from phone cameras)
+IMAGE_FORMATS: Set[str] = {"JPEG", "MPO", "PNG", "GIF"}
+
+# Derivatives are stored next to the original as <name><suffix>
+DERIVATIVE_SUFFIXES: Dict[str, str] = {"inference": ".inference.jpg", "thumbnail": ".thumb.jpg"}
+
+_CHUNK_SIZE = 1024 * 1024
+
+class UploadRejected(ValueError):
+    """An upload refused at ingest; `status` is the HTTP status to answer with."""
+    
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
 def save_upload(file_storage, prefix: Optional[str] = "complaint") -> str:
+    """Ingest an upload (see ingest_upload) and wait until it is on disk. Returns its relative path."""
+    upload = ingest_upload(file_storage, prefix)
+    upload.wait_persisted()
+    return upload.rel_path
+
+def derivative_path(rel_path: str, kind: str) -> str:
+    """Where the `kind` ("inference" or "thumbnail") derivative of an upload is stored, relative to the project root."""
+    return os.path.splitext(rel_path)[0] + DERIVATIVE_SUFFIXES[kind]
+
+def existing_derivative(rel_path: Optional[str], kind: str) -> Optional[str]:
+    """derivative_path() if that file exists; uploads from before derivatives were stored have none."""
+    if not rel_path:
+        return None
+    path = derivative_path(rel_path, kind)
+    return path if os.path.exists(os.path.join(BASE_DIR, path)) else None
+
+def inference_image_path(rel_path: str) -> str:
+    """The file detectors should read for an upload: its inference derivative, or the original if it has none."""
+    return existing_derivative(rel_path, "inference") or rel_path
+
+def _dhash(img: Any) -> str:
+    """
+    The one dHash implementation every stored hash comes from: greyscale,
+    LANCZOS-shrunk to 9x8 with PIL, each pixel compared to its right neighbour.
+    """
+    from PIL import Image
+    pixels = list(img.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (1 if left > right else 0)
+    return f"{bits:016x}"
+
+def image_dhash(source: Any) -> Optional[str]:
+    """
+    64-bit difference hash of an image (path or encoded bytes) as 16 hex
+    chars, or None for files that cannot be decoded as images (e.g. videos).
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    try:
+        with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as img:
+            return _dhash(img)
+    except Exception:
+        return None
+
+def array_dhash(img: Any) -> Optional[str]:
+    """dHash of a decoded BGR (or grey) array, computed like image_dhash on the same pixels."""
+    try:
+        from PIL import Image
+        # PIL expects RGB; a reversed view is not contiguous, so copy
+        return _dhash(Image.fromarray(img[..., ::-1].copy() if img.ndim == 3 else img))
+    except Exception:
+        return None
+
+def first_video_frame(abs_path: str) -> Any:
+    """The first frame of a video as a BGR array, or None if it cannot be read."""
+    try:
+        import cv2
+    except ImportError:
+        return None
+    cap = cv2.VideoCapture(abs_path)
+    try:
+        ok, frame = cap.read()
+    finally:
+        cap.release()
+    return frame if ok else None
+
+def video_dhash(abs_path: str) -> Optional[str]:
+    """dHash of a video's first frame (see array_dhash), or None if it cannot be read."""
+    frame = first_video_frame(abs_path)
+    return array_dhash(frame) if frame is not None else None
+
+def probe_image(data: bytes) -> Tuple[str, int, int]:
+    """
+    Read an encoded image's format and size from its header, without decoding the pixels.
+    
+    Raises:
+        UploadRejected: Not an allowed image format, or more than UPLOAD_MAX_PIXELS pixels
+    
+    Returns:
+        (format, width, height)
+    """
+    from PIL import Image
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            fmt, (width, height) = img.format, img.size
+    except Image.DecompressionBombError:
+        raise UploadRejected("Image dimensions are too large")
+    except Exception:
+        raise UploadRejected("File is not a valid image")
+    if fmt not in IMAGE_FORMATS:
+        raise UploadRejected(f"Unsupported image format: {fmt}")
+    if width * height > UPLOAD_MAX_PIXELS:
+        raise UploadRejected(
+            f"Image is too large ({width}x{height}, limit {UPLOAD_MAX_PIXELS / 1e6:.0f} megapixels)", 413
+        )
+    return fmt, width, height
+
+# EXIF orientations that rotate the image by 90 degrees, swapping width and height
+_TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+def load_upright(source: Any, max_side: int) -> Tuple[Any, Tuple[int, int]]:
+    """
+    Decode an image (path or encoded bytes) at reduced size, turned upright per
+    its EXIF orientation. Only the first frame of an animated GIF is used.
+    
+    JPEGs are decoded with DCT scaling (Image.draft) straight to the smallest
+    size that still covers max_side, so a large photo is never expanded in
+    memory at full resolution.
+    
+    Returns:
+        (RGB PIL image with longest side at most max_side, upright full-resolution (width, height))
+    """
+    from PIL import Image, ImageOps
+    with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as src:
+        width, height = src.size
+        if src.getexif().get(0x0112) in _TRANSPOSED_ORIENTATIONS:
+            width, height = height, width
+        src.draft("RGB", (max_side, max_side))
+        img = ImageOps.exif_transpose(src).convert("RGB")
+    img.thumbnail((max_side, max_side), Image.LANCZOS)
+    return img, (width, height)
+
+def encode_jpeg(img: Any, quality: int) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality, optimize=True)
+    return buf.getvalue()
+
+def make_derivatives(data: bytes, max_side: int = UPLOAD_DERIVATIVE_SIDE,
+                     thumb_side: int = UPLOAD_THUMBNAIL_SIDE) -> Tuple[bytes, bytes]:
+    """
+    Encode an image's inference derivative and thumbnail as JPEG, both
+    upright (see load_upright) and without metadata.
+    
+    Returns:
+        (inference derivative, thumbnail) JPEG bytes
+    """
+    from PIL import Image
+    img, _ = load_upright(data, max_side)
+    derivative = encode_jpeg(img, 90)
+    img.thumbnail((thumb_side, thumb_side), Image.LANCZOS)
+    return derivative, encode_jpeg(img, 80)
+
+def frame_thumbnail(frame: Any, thumb_side: int = UPLOAD_THUMBNAIL_SIDE) -> Optional[bytes]:
+    """JPEG thumbnail of a decoded BGR frame (e.g. a video's first frame), or None if it cannot be encoded."""
+    try:
+        import cv2
+        h, w = frame.shape[:2]
+        scale = min(thumb_side / float(max(h, w)), 1.0)
+        small = cv2.resize(frame, (max(int(w * scale), 1), max(int(h * scale), 1)), interpolation=cv2.INTER_AREA)
+        ok, buf = cv2.imencode(".jpg", small, [cv2.IMWRITE_JPEG_QUALITY, 80])
+    except Exception:
+        return None
+    return buf.tobytes() if ok else None
+
+# Background writer so request threads don't wait on disk before inference
+_persist_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="upload-writer")
+
+def _write_file(abs_path: str, data: bytes) -> None:
+    tmp_path = abs_path + ".part"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, abs_path)
+
+def _write_files(files: List[Tuple[str, bytes]]) -> None:
+    for abs_path, data in files:
+        _write_file(abs_path, data)
+
+def _read_limited(stream: BinaryIO, limit: int) -> bytes:
+    """Read a stream in chunks, refusing it as soon as it exceeds `limit` bytes."""
+    buf = bytearray()
+    while True:
+        chunk = stream.read(_CHUNK_SIZE)
+        if not chunk:
+            return bytes(buf)
+        buf += chunk
+        if len(buf) > limit:
+            raise UploadRejected(f"File is too large (limit {limit // 2 ** 20} MiB)", 413)
+
+def _save_limited(stream: BinaryIO, abs_path: str, limit: int) -> None:
+    """Copy a stream to abs_path in chunks; nothing is left behind if it exceeds `limit` bytes."""
+    tmp_path = abs_path + ".part"
+    written = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            while True:
+                chunk = stream.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > limit:
+                    raise UploadRejected(f"File is too large (limit {limit // 2 ** 20} MiB)", 413)
+                f.write(chunk)
+        os.replace(tmp_path, abs_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class IngestedUpload:
+    """
+    An upload decoded once in memory while its files are written to disk in
+    the background.
+    
+    Attributes:
+        rel_path: Path of the original relative to the project root, as stored in the database
+        abs_path: Absolute path the original is written to
+        phash: Perceptual hash (hex) or None
+        image: PreparedImage of the inference derivative, or None if the upload is not a decodable image
+        persisted: Future that completes once every file is on disk
+        inference_rel_path: Relative path of the inference derivative, None for videos
+        thumbnail_rel_path: Relative path of the thumbnail, None if none could be made
+    """
+    
+    def __init__(self, rel_path: str, abs_path: str, phash: Optional[str], image: Any, persisted: Future,
+                 inference_rel_path: Optional[str] = None, thumbnail_rel_path: Optional[str] = None):
+        self.rel_path = rel_path
+        self.abs_path = abs_path
+        self.phash = phash
+        self.image = image
+        self.persisted = persisted
+        self.inference_rel_path = inference_rel_path
+        self.thumbnail_rel_path = thumbnail_rel_path
+    
+    def wait_persisted(self, timeout: Optional[float] = None) -> None:
+        """Block until the files are on disk; re-raises any write error."""
+        self.persisted.result(timeout)
+
+def ingest_upload(file_storage, prefix: Optional[str] = "complaint") -> IngestedUpload:
+    """
+    Read an upload once, in bounded memory, and prepare it for storage and inference.
+    
+    Images are read up to UPLOAD_MAX_BYTES and probed from their header, so
+    oversized files, non-images and decompression bombs are refused before
+    any pixels are decoded. Accepted images are decoded once at reduced size
+    and stored as the untouched original plus an upright inference derivative
+    and thumbnail (see make_derivatives); detection runs on the derivative.
+    Videos are streamed to disk up to UPLOAD_MAX_VIDEO_BYTES and get a
+    thumbnail of their first frame.
+    
+    Raises:
+        UploadRejected: The upload is too large or not a usable image
+    """
     ensure_upload_dir()
     ext = file_storage.filename.rsplit(".", 1)[1].lower()
     name = f"{prefix}_{uuid.uuid4().hex}.{ext}"
     fname = secure_filename(name)
     abs_path = os.path.join(UPLOAD_FOLDER, fname)
-    file_storage.save(abs_path)
     rel_path = os.path.join("frontend", "uploads", fname)
-    return rel_path
+    thumbnail_rel_path = derivative_path(rel_path, "thumbnail")
+    
+    if ext in VIDEO_EXTENSIONS:
+        # Stream videos straight to disk; detection samples frames from the file
+        _save_limited(file_storage.stream, abs_path, UPLOAD_MAX_VIDEO_BYTES)
+        frame = first_video_frame(abs_path)
+        thumbnail = frame_thumbnail(frame) if frame is not None else None
+        if thumbnail:
+            _write_file(os.path.join(BASE_DIR, thumbnail_rel_path), thumbnail)
+        persisted: Future = Future()
+        persisted.set_result(None)
+        return IngestedUpload(
+            rel_path, abs_path, array_dhash(frame) if frame is not None else None, None, persisted,
+            thumbnail_rel_path=thumbnail_rel_path if thumbnail else None
+        )
+    
+    data = _read_limited(file_storage.stream, UPLOAD_MAX_BYTES)
+    probe_image(data)
+    try:
+        derivative, thumbnail = make_derivatives(data)
+    except Exception as e:
+        raise UploadRejected(f"Image could not be decoded: {e}")
+    inference_rel_path = derivative_path(rel_path, "inference")
+    inference_abs_path = os.path.join(BASE_DIR, inference_rel_path)
+    
+    image = None
+    try:
+        from backend.ai.ingest import decode_image_bytes
+        image = decode_image_bytes(derivative, path=inference_abs_path)
+    except Exception:
+        image = None
+    
+    persisted = _persist_executor.submit(_write_files, [
+        (abs_path, data),
+        (inference_abs_path, derivative),
+        (os.path.join(BASE_DIR, thumbnail_rel_path), thumbnail),
+    ])
+    # Hash the untouched original, not the derivative, so the hash matches
+    # ones stored before derivatives existed and backend.rehash
+    phash = image_dhash(data)
+    return IngestedUpload(rel_path, abs_path, phash, image, persisted, inference_rel_path, thumbnail_rel_path)
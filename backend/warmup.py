@@ -0,0 +1,184 @@
+"""
+Model Warmup
+
+Imports the ML stack, loads every detector and runs one dummy inference per
+detector in a background thread, so the first real complaint after a start
+does not pay for imports, weight loading and first-inference setup. With
+AI_INFERENCE_PROCESSES set it starts the inference worker processes instead,
+which load and warm their own detectors. The state recorded here backs the
+/healthz and /readyz endpoints; reading it never imports the ML stack.
+"""
+from typing import Any, Dict, Optional
+import importlib
+import logging
+import threading
+import time
+
+from backend.config import AI_INFERENCE_MAX_SIDE, AI_INFERENCE_PROCESSES, AI_INFERENCE_START_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+
+class Warmup:
+    """
+    Background warmup and its per-detector progress.
+
+    States: "pending" until start(), then "running", then "ready" (every
+    detector was tried, even if some failed or have no model) or "failed"
+    (the ML stack itself could not be imported), or "skipped" if warmup is
+    disabled.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = "pending"
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+        self._import_ms: Optional[float] = None
+        self._error: Optional[str] = None
+        self._detectors: Dict[str, Dict[str, Any]] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, enabled: bool = True) -> None:
+        """Start warming up in a daemon thread; with enabled=False mark the process ready at once."""
+        with self._lock:
+            if self._state != "pending":
+                return
+            self._started_at = time.time()
+            if not enabled:
+                self._state = "skipped"
+                self._finished_at = self._started_at
+                return
+            self._state = "running"
+        self._thread = threading.Thread(target=self._run, name="ai-warmup", daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until warmup finished. Returns whether it did."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.ready
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return self._state in ("ready", "skipped")
+
+    def _set_detector(self, name: str, **fields: Any) -> None:
+        with self._lock:
+            self._detectors.setdefault(name, {"state": "pending"}).update(fields)
+
+    def _run(self) -> None:
+        started = time.perf_counter()
+        try:
+            importlib.import_module("backend.ai.detector_manager")
+        except Exception as e:
+            logger.error(f"AI warmup could not import the ML stack: {e}", exc_info=True)
+            with self._lock:
+                self._state = "failed"
+                self._error = str(e)
+                self._finished_at = time.time()
+            return
+        with self._lock:
+            self._import_ms = round((time.perf_counter() - started) * 1000, 2)
+
+        if AI_INFERENCE_PROCESSES > 0:
+            # Detection runs in the worker processes; warm those, not this process
+            self._warm_pool()
+        else:
+            self._warm_local()
+
+        with self._lock:
+            self._state = "ready"
+            self._finished_at = time.time()
+        logger.info(f"AI warmup finished in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    def _warm_pool(self) -> None:
+        from backend.ai.inference_pool import get_inference_pool
+
+        pool = get_inference_pool()
+        for n in range(pool.processes):
+            self._set_detector(f"worker-{n}", state="loading")
+        pool.wait_ready(AI_INFERENCE_START_TIMEOUT)
+        for worker in pool.stats()["workers"]:
+            if not worker["ready"]:
+                self._set_detector(f"worker-{worker['index']}", state="failed", error="worker not ready")
+                continue
+            errors = worker.get("warmup_errors") or {}
+            self._set_detector(
+                f"worker-{worker['index']}",
+                state="failed" if errors else "ready",
+                pid=worker.get("pid"),
+                load_ms=worker.get("load_ms"),
+                error="; ".join(f"{name}: {e}" for name, e in errors.items()) or None
+            )
+
+    def _warm_local(self) -> None:
+        import numpy as np
+        from backend.ai.detector_manager import _inference_lock
+        from backend.ai.registry import get_registry
+
+        registry = get_registry()
+        names = registry.discover()
+        for name in names:
+            self._set_detector(name)
+
+        # A blank frame at inference size exercises the same graph as real uploads
+        dummy = np.zeros((AI_INFERENCE_MAX_SIDE, AI_INFERENCE_MAX_SIDE, 3), dtype=np.uint8)
+        for name in names:
+            self._set_detector(name, state="loading")
+            t0 = time.perf_counter()
+            try:
+                detector, _ = registry.get(name)
+            except Exception as e:
+                detector = None
+                self._set_detector(name, error=str(e))
+            load_ms = round((time.perf_counter() - t0) * 1000, 2)
+            if detector is None:
+                self._set_detector(name, state="failed", load_ms=load_ms)
+                continue
+            if getattr(detector, "model", None) is None:
+                self._set_detector(name, state="no_model", load_ms=load_ms, error="model missing")
+                continue
+
+            self._set_detector(name, state="warming", load_ms=load_ms)
+            t0 = time.perf_counter()
+            try:
+                with _inference_lock(detector):
+                    result = detector.detect(dummy) or {}
+                error = result.get("error")
+            except Exception as e:
+                error = str(e)
+            self._set_detector(
+                name,
+                state="failed" if error else "ready",
+                warmup_ms=round((time.perf_counter() - t0) * 1000, 2),
+                error=error
+            )
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            detectors = {name: dict(d) for name, d in self._detectors.items()}
+            status = {
+                "state": self._state,
+                "ready": self._state in ("ready", "skipped"),
+                "started_at": self._started_at,
+                "finished_at": self._finished_at,
+                "duration_ms": (
+                    round((self._finished_at - self._started_at) * 1000, 2)
+                    if self._started_at and self._finished_at else None
+                ),
+                "import_ms": self._import_ms,
+                "error": self._error,
+            }
+        status["detectors"] = detectors
+        status["degraded"] = sorted(n for n, d in detectors.items() if d.get("state") in ("failed", "no_model"))
+        return status
+
+
+_warmup = Warmup()
+
+
+def get_warmup() -> Warmup:
+    """The process-wide Warmup."""
+    return _warmup
@@ -0,0 +1,283 @@
+"""
+Asynchronous AI Detection Worker
+
+Claims jobs from the ai_jobs table, runs all detectors on the complaint image
+and stores the results through model.save_ai_detection. Jobs are leased, so a
+job held by a worker that dies is picked up again once the lease expires.
+
+Run standalone worker processes with:
+    python -m backend.worker --processes 2
+"""
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import argparse
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+
+from backend import model, utils
+from backend.metrics import timed
+from backend.config import (
+    AI_JOB_LEASE_SECONDS,
+    AI_JOB_POLL_INTERVAL,
+    AI_JOB_RETRY_DELAY,
+)
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent.parent
+
+
+def format_ai_result_text(final: Dict[str, Any]) -> str:
+    """Human readable summary of run_all's final decision."""
+    label = final.get("detected_type") or "unknown"
+    confidence = float(final.get("confidence", 0.0) or 0.0)
+    error = final.get("error")
+
+    if error:
+        if "model missing" in str(error).lower() or "no detectors available" in str(error).lower():
+            return "AI Models Missing - Please add model.pt files to detector folders"
+        return f"AI Error: {error}"
+    if label == "unknown":
+        return "No detection (confidence below threshold or models missing)"
+    return f"Detected: {label.replace('_', ' ').title()} ({round(confidence * 100, 1)}%)"
+
+
+def detection_boxes(dets: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Each detector's result from run_all in the form stored with the final
+    decision (model.save_ai_detection's boxes): detected_type, confidence and
+    boxes rounded to a tenth of a pixel, in the coordinates of the image
+    detection ran on.
+    """
+    stored: Dict[str, Any] = {}
+    for d in dets:
+        raw = d.get("raw") or {}
+        if not d.get("detector_name") or not isinstance(raw, dict):
+            continue
+        stored[d["detector_name"]] = {
+            "detected_type": d.get("detected_type"),
+            "confidence": d.get("confidence", 0.0),
+            "boxes": [[round(float(v), 1) for v in box[:4]] for box in raw.get("boxes") or []],
+        }
+    return stored
+
+
+def detection_raw_output(dets: List[Dict[str, Any]]) -> Optional[bytes]:
+    """
+    Each detector's boxes, scores and classes from run_all, packed for
+    model.save_ai_detection's raw_output so the run can be re-scored later
+    without inference (see backend.ai.raw_store).
+    """
+    from backend.ai.raw_store import pack
+    try:
+        return pack(dets)
+    except Exception as e:
+        logger.warning(f"Could not pack raw detector output: {e}")
+        return None
+
+
+def run_detection_for_complaint(complaint_id: int, image_path: str, image: Any = None,
+                               complaint_type: Optional[str] = None) -> str:
+    """
+    Run all detectors on a complaint's image and persist the results.
+
+    Args:
+        complaint_id: ID of the complaint
+        image_path: Image path relative to the project root
+        image: Already decoded PreparedImage for this upload, if available
+        complaint_type: Type the user claimed, looked up from the complaint if omitted
+
+    Returns:
+        The AI result text stored on the complaint
+
+    Raises:
+        FileNotFoundError: The image is not on disk (the error is also stored on the complaint)
+    """
+    # Imported here so processes that never run detection skip the ML stack
+    from backend.ai.batcher import run_all_queued
+
+    abs_image_path = str(ROOT_DIR / utils.inference_image_path(image_path))
+    if image is None and not os.path.exists(abs_image_path):
+        logger.error(f"Image file not found: {abs_image_path}")
+        model.update_complaint_ai_result(complaint_id, f"AI Error: Image file not found at {abs_image_path}")
+        raise FileNotFoundError(f"Image file not found at {abs_image_path}")
+
+    logger.info(f"=== Triggering AI Detection for Complaint {complaint_id} ===")
+    logger.info(f"Image path: {abs_image_path}")
+
+    if complaint_type is None:
+        complaint = model.get_complaint_with_ai_result(complaint_id)
+        complaint_type = complaint.get("complaint_type") if complaint else None
+
+    with timed("ai_detection"):
+        dets, final = run_all_queued(image if image is not None else abs_image_path, complaint_type=complaint_type)
+
+    ai_result_text = save_detection_results(complaint_id, dets, final)
+    logger.info(f"AI Detection complete: {final.get('detected_type') or 'unknown'} "
+                f"({float(final.get('confidence', 0.0) or 0.0):.2%})")
+    logger.info(f"=== AI Detection Complete for Complaint {complaint_id} ===")
+    return ai_result_text
+
+
+def save_detection_results(complaint_id: int, dets: List[Dict[str, Any]], final: Dict[str, Any]) -> str:
+    """
+    Persist a run_all result for a complaint: a row per detector that found
+    something, then the final decision with its boxes and raw output.
+
+    Returns:
+        The AI result text stored on the complaint
+    """
+    for d in dets:
+        det_type = d.get("detected_type")
+        det_conf = d.get("confidence", 0.0)
+        det_model = d.get("detector_name")
+        if det_type or det_conf > 0:
+            model.save_ai_detection(
+                complaint_id, det_type, det_conf, det_model, None, d.get("model_version"), d.get("latency_ms")
+            )
+
+    label = final.get("detected_type") or "unknown"
+    confidence = float(final.get("confidence", 0.0) or 0.0)
+    ai_result_text = format_ai_result_text(final)
+
+    # Save final detection result
+    model.save_ai_detection(
+        complaint_id,
+        label if label != "unknown" else None,
+        confidence if label != "unknown" else 0.0,
+        final.get("detector_name"),
+        ai_result_text,
+        final.get("model_version"),
+        (final.get("timings_ms") or {}).get("total"),
+        final.get("timings_ms"),
+        detection_boxes(dets),
+        detection_raw_output(dets)
+    )
+    return ai_result_text
+
+
+class JobWorker:
+    """
+    Polls the ai_jobs queue and processes one job at a time.
+
+    While a job runs, a heartbeat thread keeps renewing its lease so long
+    inferences are not mistaken for dead workers.
+    """
+
+    def __init__(self, worker_id: Optional[str] = None, lease_seconds: int = AI_JOB_LEASE_SECONDS,
+                 poll_interval: float = AI_JOB_POLL_INTERVAL, retry_delay: int = AI_JOB_RETRY_DELAY):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self._stopped = threading.Event()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def run_once(self) -> bool:
+        """Claim and process a single job. Returns False if the queue was empty."""
+        job = model.claim_ai_job(self.worker_id, self.lease_seconds)
+        if not job:
+            return False
+
+        job_id = job["id"]
+        logger.info(f"Worker {self.worker_id} claimed AI job {job_id} (attempt {job['attempts']})")
+        heartbeat_stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job_id, heartbeat_stop), daemon=True)
+        heartbeat.start()
+        try:
+            with timed("ai_job"):
+                run_detection_for_complaint(job["complaint_id"], job["image_path"])
+            model.complete_ai_job(job_id, self.worker_id)
+        except Exception as e:
+            logger.error(f"AI job {job_id} failed: {e}", exc_info=True)
+            model.fail_ai_job(job_id, self.worker_id, str(e), self.retry_delay)
+            refreshed = model.get_ai_job(job_id)
+            if refreshed and refreshed["status"] == "failed":
+                model.update_complaint_ai_result(job["complaint_id"], f"AI Error: {str(e)}")
+        finally:
+            heartbeat_stop.set()
+            model.release_connection()
+        return True
+
+    def run_forever(self) -> None:
+        logger.info(f"AI job worker {self.worker_id} started")
+        while not self._stopped.is_set():
+            try:
+                if not self.run_once():
+                    self._stopped.wait(self.poll_interval)
+            except Exception as e:
+                # e.g. database locked; back off and keep going
+                logger.error(f"AI job worker {self.worker_id} error: {e}", exc_info=True)
+                self._stopped.wait(self.poll_interval)
+        model.close_connection()
+
+    def _heartbeat(self, job_id: int, stop: threading.Event) -> None:
+        interval = max(self.lease_seconds / 3.0, 1.0)
+        try:
+            while not stop.wait(interval):
+                try:
+                    if not model.renew_ai_job_lease(job_id, self.worker_id, self.lease_seconds):
+                        return
+                except Exception as e:
+                    logger.warning(f"Could not renew lease for AI job {job_id}: {e}")
+        finally:
+            # The thread ends with the job; don't leave its connection to the garbage collector
+            model.close_connection()
+
+
+def start_embedded_workers(count: int) -> List[JobWorker]:
+    """Start `count` worker threads inside the current (web) process."""
+    workers = []
+    for _ in range(max(int(count), 0)):
+        worker = JobWorker()
+        threading.Thread(target=worker.run_forever, name=f"ai-job-{worker.worker_id}", daemon=True).start()
+        workers.append(worker)
+    return workers
+
+
+def _process_main() -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    JobWorker().run_forever()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run CivicEye AI detection job workers")
+    parser.add_argument("--processes", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--restart-delay", type=float, default=5.0, help="seconds before replacing a dead worker")
+    args = parser.parse_args(argv)
+
+    model.init_db()
+    model.migrate_db()
+
+    if args.processes <= 1:
+        _process_main()
+        return
+
+    procs: List[multiprocessing.Process] = []
+    try:
+        while True:
+            procs = [p for p in procs if p.is_alive()]
+            while len(procs) < args.processes:
+                p = multiprocessing.Process(target=_process_main, name="ai-job-worker", daemon=False)
+                p.start()
+                procs.append(p)
+            time.sleep(args.restart_delay)
+    except KeyboardInterrupt:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -26,6 +26,9 @@ CREATE TABLE IF NOT EXISTS complaints (
     decision_source TEXT CHECK(decision_source IN ('AI','Admin')),
     decision_timestamp TIMESTAMP,
     ai_model_name TEXT,
+    -- Perceptual hash of the image and link to the earlier complaint it duplicates
+    image_phash TEXT,
+    duplicate_of INTEGER REFERENCES complaints(id),
     -- Legacy fields for backward compatibility
     category TEXT CHECK(category IN ('pothole','garbage','water_leakage','other')) DEFAULT 'other',
     location TEXT,
@@ -42,6 +45,38 @@ CREATE TABLE IF NOT EXISTS ai_detections (
     detected_type TEXT,
     confidence REAL,
     model_name TEXT,
+    model_version TEXT,
+    latency_ms REAL,
+    stage_timings TEXT,
+    -- Per-detector boxes of the run, stored with its final decision (JSON)
+    boxes TEXT,
+    -- Every detector's boxes, scores and classes, packed (see backend/ai/raw_store.py)
+    raw_output BLOB,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY(complaint_id) REFERENCES complaints(id) ON DELETE CASCADE
 );
+
+-- Durable queue for asynchronous AI detection (claimed by workers under a lease)
+CREATE TABLE IF NOT EXISTS ai_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    complaint_id INTEGER NOT NULL,
+    image_path TEXT NOT NULL,
+    status TEXT CHECK(status IN ('queued','running','done','failed')) NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    lease_owner TEXT,
+    lease_expires_at TIMESTAMP,
+    available_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY(complaint_id) REFERENCES complaints(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_ai_jobs_status_available ON ai_jobs(status, available_at);
+CREATE INDEX IF NOT EXISTS idx_ai_jobs_complaint ON ai_jobs(complaint_id);
+CREATE INDEX IF NOT EXISTS idx_ai_detections_complaint_created ON ai_detections(complaint_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_complaints_user_created ON complaints(user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_complaints_created ON complaints(created_at);
@@ -20,14 +20,14 @@ function loadAdminTable() {
 
       data.items.forEach((c) => {
         const row = document.createElement("tr");
-        // Use image_path from DB, or fallback
-        const imgUrl = c.image_path ? "/" + c.image_path : "./assets/login-art.png";
+        // Prefer the cached thumbnail, then the original, then a fallback
+        const imgUrl = c.thumbnail_url || (c.image_path ? "/" + c.image_path : "./assets/login-art.png");
         // Calculate score percentage if confidence exists
         const score = c.ai_confidence ? Math.round(c.ai_confidence * 100) : 0;
         
         row.innerHTML = `
-          <td><img src="${imgUrl}" width="50" style="object-fit:cover; aspect-ratio:1" /></td>
-          <td>CIVIC-${c.id} <br><small>(${c.complaint_type || 'General'})</small></td>
+          <td><img src="${imgUrl}" width="50" loading="lazy" style="object-fit:cover; aspect-ratio:1" /></td>
+          <td>CIVIC-${c.id} <br><small>(${c.complaint_type || 'General'})</small>${c.duplicate_of ? `<br><small>Duplicate of CIVIC-${c.duplicate_of}</small>` : ""}</td>
           <td>${c.address || c.location || 'N/A'}</td>
           <td>
             <select class="status-select" id="status-${c.id}" onchange="updateStatus('${c.id}')">
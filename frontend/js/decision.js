@@ -31,8 +31,8 @@ function renderDecision(item) {
   const ts = item.decision_timestamp || item.last_detection_at || item.created_at || "";
   document.getElementById("timestamp").textContent = ts ? new Date(ts).toLocaleString() : "";
   
-  // Display the actual uploaded image
-  const img = item.image_path ? `/${item.image_path}` : "./assets/AI DECISION.png";
+  // Display the uploaded image with the detected boxes drawn on it, or the original
+  const img = item.overlay_url || (item.image_path ? `/${item.image_path}` : "./assets/AI DECISION.png");
   document.getElementById("image-preview").src = img;
   document.getElementById("image-preview").onerror = function() {
     this.src = "./assets/AI DECISION.png";